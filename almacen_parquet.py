@@ -0,0 +1,224 @@
+"""Almacén columnar de titulares en Parquet, particionado por mes.
+
+El scraper añade en cada ejecución un fichero con los titulares nuevos (solo se
+añade, nunca se reescribe), así que el dataset guarda todo el histórico y los
+análisis pueden trabajar sin MySQL. `fuente` y `escala` van codificadas con
+diccionario (en disco ocupan un índice por fila) y las particiones
+`mes=AAAA-MM` permiten saltarse meses enteros al filtrar por fecha.
+
+La lectura usa proyección de columnas, filtros empujados al escaneo (por
+partición y por estadísticas de cada row group) y ficheros mapeados en memoria.
+
+Uso: python almacen_parquet.py [--exportar] [--compactar] [--resumen]
+"""
+import argparse
+import datetime
+import logging
+import os
+import uuid
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+import base_datos
+
+RAIZ = os.getenv("NOTICIAS_PARQUET", os.path.join(os.path.dirname(__file__), "noticias_parquet"))
+SIN_FECHA = "sin-fecha"       # partición de los titulares sin fecha válida
+TAMANO_LOTE = 50_000          # filas por lote al exportar desde la base de datos
+
+ESQUEMA = pa.schema([
+    ("fecha", pa.date32()),
+    ("fuente", pa.dictionary(pa.int16(), pa.string())),
+    ("escala", pa.int8()),
+    ("titular", pa.string()),
+    ("enlace", pa.string()),
+    ("hash_noticia", pa.string()),
+    ("publicado", pa.timestamp("s", tz="UTC")),  # los ficheros anteriores no la tienen: se lee como nula
+])
+PARTICION = pa.schema([("mes", pa.string())])  # directorios mes=AAAA-MM, estilo hive
+
+
+def _fecha(valor):
+    """date a partir de un date o texto "AAAA-MM-DD"; None si falta o no es válida"""
+    if isinstance(valor, datetime.date):
+        return valor
+    try:
+        return datetime.date.fromisoformat(str(valor)[:10])
+    except ValueError:
+        return None
+
+
+def _instante(valor):
+    """datetime UTC a partir de un datetime (de MySQL, sin zona) o texto "AAAA-MM-DD HH:MM:SS" """
+    if valor is None:
+        return None
+    if not isinstance(valor, datetime.datetime):
+        valor = datetime.datetime.fromisoformat(str(valor))
+    return valor.replace(tzinfo=datetime.timezone.utc) if valor.tzinfo is None else valor
+
+
+def _tabla(filas):
+    """Tabla Arrow desde filas (fecha, fuente, escala, titular, enlace, hash_noticia[, publicado])"""
+    columnas = list(zip(*filas)) if filas else [[] for _ in ESQUEMA]
+    publicados = columnas[6] if len(columnas) > 6 else [None] * len(columnas[0])
+    return pa.table({
+        "fecha": pa.array([_fecha(f) for f in columnas[0]], pa.date32()),
+        "fuente": pa.array(columnas[1], pa.string()).dictionary_encode().cast(ESQUEMA.field("fuente").type),
+        "escala": pa.array([None if e is None else int(e) for e in columnas[2]], pa.int8()),
+        "titular": pa.array(columnas[3], pa.string()),
+        "enlace": pa.array(columnas[4], pa.string()),
+        "hash_noticia": pa.array(columnas[5], pa.string()),
+        "publicado": pa.array([_instante(p) for p in publicados], ESQUEMA.field("publicado").type),
+    }, schema=ESQUEMA)
+
+
+def anadir(filas, raiz=RAIZ):
+    """Añade filas al dataset: un fichero nuevo por cada mes que aparece en ellas"""
+    if not filas:
+        return 0
+    datos = _tabla(filas)
+    meses = pc.if_else(pc.is_null(datos["fecha"]), SIN_FECHA, pc.strftime(datos["fecha"], "%Y-%m"))
+    sufijo = f"{datetime.datetime.now():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+    for mes in pc.unique(meses).to_pylist():
+        directorio = os.path.join(raiz, f"mes={mes}")
+        os.makedirs(directorio, exist_ok=True)
+        parte = datos.filter(pc.equal(meses, mes)).sort_by([("fecha", "ascending"), ("escala", "ascending")])
+        tmp = os.path.join(directorio, f".part-{sufijo}.parquet.tmp")
+        # Escritura atómica: un lector nunca ve un fichero a medias
+        pq.write_table(parte, tmp, compression="zstd", use_dictionary=True)
+        os.replace(tmp, os.path.join(directorio, f"part-{sufijo}.parquet"))
+    return datos.num_rows
+
+
+def dataset(raiz=RAIZ):
+    """Dataset de Arrow sobre el directorio, con los ficheros mapeados en memoria"""
+    # pyarrow.dataset arrastra pandas: solo se importa para leer, no al añadir desde el scraper
+    import pyarrow.dataset as ds
+    from pyarrow import fs
+
+    return ds.dataset(raiz, format="parquet", partitioning=ds.partitioning(PARTICION, flavor="hive"),
+                      schema=ESQUEMA.append(pa.field("mes", pa.string())),
+                      filesystem=fs.LocalFileSystem(use_mmap=True),
+                      exclude_invalid_files=True, ignore_prefixes=[".", "_"])
+
+
+def existe(raiz=RAIZ):
+    return os.path.isdir(raiz) and any(n.startswith("mes=") for n in os.listdir(raiz))
+
+
+def filtro(escalas=None, fuentes=None, desde=None, hasta=None):
+    """Expresión de filtro equivalente a base_datos.filtros_sql, o None sin filtros.
+
+    Las condiciones de fecha se repiten sobre la partición `mes` para que los
+    meses fuera de rango ni se abran.
+    """
+    condiciones = []
+    if escalas:
+        condiciones.append(pc.field("escala").isin([int(e) for e in escalas]))
+    if fuentes:
+        condiciones.append(pc.field("fuente").isin(list(fuentes)))
+    if desde:
+        desde = _fecha(desde)
+        condiciones += [pc.field("mes") >= f"{desde:%Y-%m}", pc.field("fecha") >= desde]
+    if hasta:
+        hasta = _fecha(hasta)
+        condiciones += [pc.field("mes") <= f"{hasta:%Y-%m}", pc.field("fecha") <= hasta]
+    expresion = None
+    for condicion in condiciones:
+        expresion = condicion if expresion is None else expresion & condicion
+    return expresion
+
+
+def tabla(columnas=None, raiz=RAIZ, **filtros):
+    """Tabla Arrow con solo las `columnas` pedidas y las filas que cumplen los filtros"""
+    return dataset(raiz).to_table(columns=columnas, filter=filtro(**filtros))
+
+
+def cargar(columnas=None, raiz=RAIZ, **filtros):
+    """DataFrame de pandas (fuente como categoría) con proyección y filtros empujados al escaneo"""
+    # self_destruct libera cada columna de Arrow en cuanto pasa a pandas: pico de memoria menor
+    return tabla(columnas, raiz, **filtros).to_pandas(self_destruct=True, split_blocks=True, date_as_object=False)
+
+
+def lotes(columnas=None, raiz=RAIZ, **filtros):
+    """Recorre el dataset en RecordBatches, sin cargarlo entero en memoria"""
+    return dataset(raiz).to_batches(columns=columnas, filter=filtro(**filtros))
+
+
+def conteo_por(columnas, raiz=RAIZ, **filtros):
+    """Número de titulares agrupando por `columnas`, calculado en Arrow sin pasar por pandas"""
+    # Cada fichero trae su propio diccionario de `fuente`: hay que unificarlos antes de agrupar
+    datos = tabla(list(columnas), raiz, **filtros).unify_dictionaries()
+    agrupado = datos.group_by(list(columnas)).aggregate([([], "count_all")])
+    return agrupado.rename_columns([*columnas, "titulares"]).to_pandas().sort_values(list(columnas))
+
+
+def _claves(hashes):
+    """Primeros 64 bits de cada hash_noticia (sha1 en hexadecimal) como enteros; 0 si falta"""
+    return np.fromiter((int(h[:16], 16) if h else 0 for h in hashes), dtype=np.uint64, count=len(hashes))
+
+
+def _claves_guardadas(raiz=RAIZ):
+    """Array ordenado con las claves (_claves) de los titulares que ya están en el dataset"""
+    if not existe(raiz):
+        return np.empty(0, dtype=np.uint64)
+    claves = [_claves(lote.column(0).to_pylist()) for lote in lotes(["hash_noticia"], raiz)]
+    return np.unique(np.concatenate(claves)) if claves else np.empty(0, dtype=np.uint64)
+
+
+def exportar(raiz=RAIZ, tamano_lote=TAMANO_LOTE):
+    """Vuelca `titulares` al dataset, saltándose los titulares que ya están en él.
+
+    Sirve para estrenarlo con el histórico aunque el scraper ya haya empezado
+    a añadir titulares. Los que ya están se reconocen por hash_noticia (8 bytes
+    por titular en un array ordenado, no un set de cadenas).
+    """
+    guardadas = _claves_guardadas(raiz)
+    query = "SELECT fecha, fuente, escala, titular, enlace, hash_noticia, publicado FROM titulares ORDER BY id"
+    total = saltados = 0
+    for filas in base_datos.iterar_lotes(query, tamano=tamano_lote):
+        if len(guardadas):
+            claves = _claves([fila[5] for fila in filas])
+            posiciones = np.minimum(np.searchsorted(guardadas, claves), len(guardadas) - 1)
+            ya_estan = guardadas[posiciones] == claves
+            saltados += int(ya_estan.sum())
+            filas = [fila for fila, esta in zip(filas, ya_estan) if not esta]
+        total += anadir(filas, raiz)
+    logging.info(f"📦 Exportados {total} titulares a {raiz} ({saltados} ya estaban).")
+    return total
+
+
+def compactar(raiz=RAIZ):
+    """Une los ficheros de cada mes en uno solo (el scraper deja uno por ejecución y mes)"""
+    for nombre in sorted(os.listdir(raiz)):
+        directorio = os.path.join(raiz, nombre)
+        partes = sorted(f for f in os.listdir(directorio) if f.endswith(".parquet"))
+        if len(partes) < 2:
+            continue
+        unida = pa.concat_tables(pq.read_table(os.path.join(directorio, p), schema=ESQUEMA) for p in partes)
+        sufijo = f"{datetime.datetime.now():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+        tmp = os.path.join(directorio, f".compacto-{sufijo}.parquet.tmp")
+        pq.write_table(unida.sort_by([("fecha", "ascending"), ("escala", "ascending")]), tmp,
+                       compression="zstd", use_dictionary=True)
+        os.replace(tmp, os.path.join(directorio, f"part-{sufijo}.parquet"))
+        for parte in partes:
+            os.remove(os.path.join(directorio, parte))
+        logging.info(f"🗜️ {nombre}: {len(partes)} ficheros compactados en uno.")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Almacén Parquet de titulares")
+    parser.add_argument("--exportar", action="store_true", help="vuelca la tabla titulares al dataset")
+    parser.add_argument("--compactar", action="store_true", help="une los ficheros de cada mes")
+    parser.add_argument("--resumen", action="store_true", help="titulares por mes y escala")
+    args = parser.parse_args()
+
+    if args.exportar:
+        exportar()
+    if args.compactar:
+        compactar()
+    if args.resumen:
+        print(conteo_por(["mes", "escala"]).to_string(index=False))
@@ -1,50 +1,53 @@
-import mysql.connector
-from getpass import getpass  # Para ocultar la contraseña al escribir
-
-# Configuración en variables (podrías mover esto a un archivo .env)
-DB_CONFIG = {
-    "host": "localhost",
-    "user": "root",
-    # "password": "MYSQL420",  # No recomendado tenerla hardcodeada
-    "database": "proyecto_noticias",
-    "charset": "utf8mb4",  # Mejor soporte para caracteres especiales
-}
-
-try:
-    # Obtener contraseña de forma segura
-    DB_CONFIG["password"] = getpass("Ingresa tu contraseña de MySQL: ")
-    
-    # Conectar a MySQL usando with statement para manejo automático de conexión
-    with mysql.connector.connect(**DB_CONFIG) as conexion:
-        with conexion.cursor() as cursor:
-            
-            # Consulta más legible con f-strings
-            query = """
-                SELECT 
-                    fuente AS Medio, 
-                    COUNT(*) AS Cantidad
-                FROM titulares
-                GROUP BY fuente
-                ORDER BY Cantidad DESC;
-            """
-            
-            cursor.execute(query)
-            resultados = cursor.fetchall()
-
-            # Encabezado con formato mejorado
-            print("\n📰 Análisis de titulares por medio de comunicación")
-            print("-" * 45)
-            for medio, cantidad in resultados:
-                print(f"▪ {medio.ljust(25)}: {str(cantidad).rjust(4)} titulares")
-            print("-" * 45)
-            
-except mysql.connector.Error as err:
-    print(f"🚨 Error de MySQL: {err}")
-    
-except Exception as e:
-    print(f"⚠️ Error inesperado: {e}")
-
-finally:
-    # El with statement ya cierra la conexión automáticamente
-    if 'conexion' in locals() and conexion.is_connected():
-        print("\n✅ Conexión cerrada exitosamente")
\ No newline at end of file
+import argparse
+import base_datos  # Conexión compartida (MySQL con pool o SQLite)
+import metricas  # --metricas / --profile
+import resumen_titulares  # Recuentos precalculados por fuente, escala y día
+
+SIN_FUENTE = "(sin fuente)"  # etiqueta de los titulares con fuente NULL
+
+def titulares_por_medio(cursor):
+    """Lista de (medio, cantidad) de más a menos titulares"""
+    # Crea y rellena el resumen la primera vez que se usa; después son unas pocas filas por medio y día
+    resumen_titulares.asegurar_tabla(cursor)
+    return resumen_titulares.por_fuente(cursor)
+
+def titulares_por_medio_parquet():
+    """Como titulares_por_medio, leyendo el almacén Parquet"""
+    import almacen_parquet  # Solo lee las columnas y particiones necesarias
+    conteo = almacen_parquet.conteo_por(["fuente"]).sort_values("titulares", ascending=False)
+    return list(zip(conteo["fuente"], conteo["titulares"]))
+
+def imprimir(resultados):
+    # Encabezado con formato mejorado
+    print("\n📰 Análisis de titulares por medio de comunicación")
+    print("-" * 45)
+    for medio, cantidad in resultados:
+        # NULL en la base de datos (None) o en Parquet (NaN en pandas)
+        medio = medio if isinstance(medio, str) else SIN_FUENTE
+        print(f"▪ {medio.ljust(25)}: {str(cantidad).rjust(4)} titulares")
+    print("-" * 45)
+
+def main(argv=None):
+    args_parser = argparse.ArgumentParser(description="Titulares por medio de comunicación")
+    args_parser.add_argument("--parquet", action="store_true",
+                             help="lee el almacén Parquet en lugar de la base de datos (modo sin conexión)")
+    metricas.anadir_argumentos(args_parser)
+    args = args_parser.parse_args(argv)
+    metricas.iniciar(args)
+
+    try:
+        if args.parquet:
+            imprimir(titulares_por_medio_parquet())
+        else:
+            # La conexión vuelve al pool automáticamente al salir del with
+            with base_datos.transaccion() as cursor:
+                imprimir(titulares_por_medio(cursor))
+
+    except base_datos.ERRORES as err:
+        print(f"🚨 Error de base de datos: {err}")
+
+    except Exception as e:
+        print(f"⚠️ Error inesperado: {e}")
+
+if __name__ == "__main__":
+    main()
@@ -1,82 +1,85 @@
-import mysql.connector
-import re
-from collections import Counter
-from getpass import getpass
-from unicodedata import normalize  # Nueva importación para manejar acentos
+import argparse
+import heapq
+from collections import Counter, defaultdict
+import base_datos  # Conexión compartida (MySQL con pool o SQLite)
+import indice_terminos  # Frecuencias precalculadas en term_counts
+import resumen_titulares  # Recuentos precalculados por fuente, escala y día
+import conteo_paralelo  # Recuento map-reduce sobre todo el archivo
+import metricas  # --metricas / --profile
+from tokenizador import contar_palabras
 
-# Ampliar lista de stopwords y mover a archivo aparte (mejor mantenimiento)
-STOPWORDS = {
-    # Español
-    "el", "la", "los", "las", "de", "del", "en", "y", "un", "una",
-    "con", "por", "para", "a", "al", "que", "es", "más", "su", "sus",
-    "como", "se", "ha", "han", "no", "lo", "o", "este", "esta", "sin",
-    
-    # Inglés
-    "the", "and", "of", "in", "to", "a", "on", "for", "with", "at", 
-    "from", "by", "an", "is", "as", "it", "that", "this", "was", "be",
-    "are", "but", "not", "or", "have", "has", "had", "their", "its", 
-    "they", "them", "his", "her", "he", "she", "we", "you", "i", "who"
-}
+def contar_desde_parquet():
+    """Palabras y titulares por escala leyendo solo escala y titular del almacén Parquet"""
+    import almacen_parquet
 
+    conteos, titulares = defaultdict(Counter), Counter()
+    for lote in almacen_parquet.lotes(["escala", "titular"]):
+        for escala, grupo in lote.to_pandas().groupby("escala"):
+            contar_palabras(grupo["titular"], conteos[int(escala)])
+            titulares[int(escala)] += len(grupo)
+    # Mismo orden que el índice: más frecuentes primero y, a igualdad, alfabético
+    palabras = {escala: heapq.nsmallest(10, conteo.items(), key=lambda par: (-par[1], par[0]))
+                for escala, conteo in conteos.items()}
+    return palabras, dict(titulares)
 
-DB_CONFIG = {
-    "host": "localhost",
-    "user": "root",
-    "database": "proyecto_noticias",
-    "charset": "utf8mb4",
-}
+def main(argv=None):
+    args_parser = argparse.ArgumentParser(description="Palabras más usadas por escala ideológica")
+    args_parser.add_argument("--procesos", type=int, metavar="N",
+                             help="recuenta desde titulares con N procesos en lugar de leer term_counts "
+                                  "(p. ej. tras cambiar el tokenizador o las stopwords)")
+    args_parser.add_argument("--parquet", action="store_true",
+                             help="lee el almacén Parquet en lugar de la base de datos (modo sin conexión)")
+    args_parser.add_argument("--entradillas", action="store_true",
+                             help="cuenta las palabras de las entradillas de los artículos (ver enriquecimiento.py)")
+    metricas.anadir_argumentos(args_parser)
+    args = args_parser.parse_args(argv)
+    metricas.iniciar(args)
 
-def limpiar_texto(texto):
-    """Normaliza y limpia el texto eliminando caracteres especiales"""
-    texto = normalize('NFKD', texto).encode('ASCII', 'ignore').decode('ASCII')
-    return re.sub(r'[^\w\s]', '', texto.lower())
+    try:
+        textos = "entradillas" if args.entradillas else "titulares"
+        if args.parquet:
+            conteo_palabras, titulares_por_escala = contar_desde_parquet()
+        elif args.entradillas:
+            import enriquecimiento  # Solo con esta opción: carga aiohttp y BeautifulSoup
 
-try:
-    # Validación básica de contraseña
-    if not (password := getpass("Ingresa tu contraseña de MySQL: ")):
-        raise ValueError("La contraseña no puede estar vacía")
-    
-    DB_CONFIG["password"] = password
-    
-    with mysql.connector.connect(**DB_CONFIG) as conexion:
-        with conexion.cursor() as cursor:
-            
-            # Consulta más eficiente filtrando nulos
-            query = """
-                SELECT escala, titular 
-                FROM titulares 
-                WHERE escala IS NOT NULL AND titular IS NOT NULL;
-            """
-            cursor.execute(query)
-            resultados = cursor.fetchall()
+            with base_datos.transaccion() as cursor:
+                enriquecimiento.asegurar_tabla(cursor)
+                conteo_palabras, titulares_por_escala = enriquecimiento.palabras_por_escala(cursor, limite=10)
+        else:
+            if args.procesos:
+                # Map-reduce por rangos de id: cada proceso tokeniza su parte y se suman los Counters
+                conteo_palabras = conteo_paralelo.top_por_escala(conteo_paralelo.contar(args.procesos), limite=10)
 
-            # Detectar escalas dinámicamente
-            escalas_unicas = {escala for escala, _ in resultados}
-            conteo_palabras = {escala: Counter() for escala in escalas_unicas}
+            with base_datos.transaccion() as cursor:
+                if not args.procesos:
+                    # Crea y rellena el índice la primera vez que se usa
+                    indice_terminos.asegurar_tabla(cursor)
 
-            for escala, titular in resultados:
-                palabras = re.findall(r'\b[a-záéíóúñ]+\b', limpiar_texto(titular), re.IGNORECASE)
-                palabras_filtradas = [p for p in palabras if p not in STOPWORDS and len(p) > 2]
-                
-                conteo_palabras[escala].update(palabras_filtradas)
+                    # Palabras más frecuentes por escala, directamente del índice
+                    conteo_palabras = indice_terminos.top_por_escala(cursor, limite=10)
 
-            # Mostrar resultados con formato mejorado
-            print("\n📊 Palabras más usadas por escala ideológica:")
-            for escala in sorted(conteo_palabras.keys()):
-                print(f"\n🔵 Escala {escala} ({len(resultados)} titulares):")
-                if not conteo_palabras[escala]:
-                    print("   Sin palabras relevantes")
-                    continue
-                    
-                for palabra, frecuencia in conteo_palabras[escala].most_common(10):
-                    print(f"   ▫ {palabra.ljust(18)} → {str(frecuencia).zfill(2)} apariciones")
+                # Número de titulares por escala, del resumen por fuente, escala y día
+                resumen_titulares.asegurar_tabla(cursor)
+                titulares_por_escala = resumen_titulares.por_escala(cursor)
 
-except mysql.connector.Error as err:
-    print(f"🚨 Error de MySQL: {err}")
+        # Mostrar resultados con formato mejorado
+        print("\n📊 Palabras más usadas por escala ideológica:")
+        for escala in sorted(titulares_por_escala):
+            print(f"\n🔵 Escala {escala} ({titulares_por_escala[escala]} {textos}):")
+            if not conteo_palabras.get(escala):
+                print("   Sin palabras relevantes")
+                continue
 
-except Exception as e:
-    print(f"⚠️ Error crítico: {str(e).capitalize()}")
+            for palabra, frecuencia in conteo_palabras[escala]:
+                print(f"   ▫ {palabra.ljust(18)} → {str(frecuencia).zfill(2)} apariciones")
 
-finally:
-    if 'conexion' in locals() and conexion.is_connected():
-        conexion.close()
\ No newline at end of file
+    except base_datos.ERRORES as err:
+        print(f"🚨 Error de base de datos: {err}")
+
+    except Exception as e:
+        print(f"⚠️ Error crítico: {str(e).capitalize()}")
+
+
+# Con --procesos los procesos hijos importan este módulo: solo se ejecuta como script
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,347 @@
+"""Acceso compartido a la base de datos de titulares.
+
+Todos los scripts obtienen sus conexiones de aquí en lugar de copiar su propio
+`DB_CONFIG`. Con MySQL se usa un único `MySQLConnectionPool` por proceso; con
+`NOTICIAS_DB=sqlite` las herramientas funcionan sobre un fichero SQLite local,
+sin servidor MySQL. La primera conexión de cada proceso aplica las migraciones
+pendientes del esquema (esquema.py).
+"""
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from getpass import getpass
+
+# Backend: "mysql" (por defecto) o "sqlite"
+BACKEND = os.getenv("NOTICIAS_DB", "mysql").lower()
+
+mysql = None
+if BACKEND != "sqlite":  # con SQLite no se paga la importación del conector (~60 ms)
+    try:
+        import mysql.connector
+        from mysql.connector import errorcode, pooling
+        from mysql.connector.constants import ClientFlag
+        from mysql.connector.errors import PoolError
+    except ImportError:  # solo hace falta con el backend MySQL
+        mysql = None
+SQLITE_PATH = os.getenv("NOTICIAS_SQLITE", os.path.join(os.path.dirname(__file__), "noticias.db"))
+
+DB_CONFIG = {
+    "host": os.getenv("MYSQL_HOST", "localhost"),
+    "user": os.getenv("MYSQL_USER", "root"),
+    "database": os.getenv("MYSQL_DATABASE", "proyecto_noticias"),
+    "charset": "utf8mb4",
+    "connect_timeout": 5,
+    # Sin FOUND_ROWS, rowcount solo cuenta las filas realmente modificadas
+    "client_flags": [-ClientFlag.FOUND_ROWS] if mysql else [],
+}
+
+POOL_SIZE = int(os.getenv("MYSQL_POOL_SIZE", "5"))
+ESPERA_POOL = 10        # segundos máximos esperando una conexión libre del pool
+REINTENTOS_PING = 3     # reconexiones al detectar una conexión caducada
+
+# Errores de cualquiera de los dos backends, para usar en `except base_datos.ERRORES`
+ERRORES = (sqlite3.Error,) + ((mysql.connector.Error,) if mysql else ())
+
+_pool = None
+_pool_lock = threading.Lock()
+_sqlite_listo = False
+_esquema_listo = False
+_esquema_lock = threading.Lock()
+
+def es_sqlite():
+    return BACKEND == "sqlite"
+
+
+def configurar(**opciones):
+    """Sobrescribe opciones de conexión (p. ej. la contraseña desde st.secrets).
+
+    Debe llamarse antes de la primera conexión; después el pool ya está creado.
+    """
+    DB_CONFIG.update({k: v for k, v in opciones.items() if v is not None})
+
+
+def _password():
+    """Contraseña de MySQL: variable de entorno o, si hay terminal, se pregunta una vez"""
+    if "password" not in DB_CONFIG:
+        password = os.getenv("MYSQL_PASSWORD")
+        if password is None and os.isatty(0):
+            password = getpass("🔐 Ingresa tu contraseña de MySQL: ")
+        DB_CONFIG["password"] = password or ""
+    return DB_CONFIG["password"]
+
+
+def configuracion():
+    """Copia de las opciones de conexión completas, p. ej. para configurar procesos hijos"""
+    if not es_sqlite():
+        _password()
+    return dict(DB_CONFIG)
+
+
+def huella():
+    """Identificador corto de la base de datos configurada (backend y ubicación), p. ej. para nombrar cachés"""
+    if es_sqlite():
+        origen = os.path.abspath(SQLITE_PATH)
+    else:
+        origen = f"{DB_CONFIG['host']}:{DB_CONFIG.get('port', 3306)}/{DB_CONFIG['database']}"
+    return f"{BACKEND}-{hashlib.sha1(origen.encode('utf-8')).hexdigest()[:12]}"
+
+
+def obtener_pool():
+    """Pool de conexiones MySQL compartido por todo el proceso (se crea al primer uso)"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            if mysql is None:
+                raise RuntimeError("mysql-connector-python no está instalado; usa NOTICIAS_DB=sqlite")
+            _password()
+            _pool = pooling.MySQLConnectionPool(
+                pool_name="noticias", pool_size=POOL_SIZE, pool_reset_session=True, **DB_CONFIG)
+        return _pool
+
+
+def _conexion_mysql():
+    """Saca una conexión del pool, esperando si está agotado, y comprueba que siga viva"""
+    limite = time.monotonic() + ESPERA_POOL
+    while True:
+        try:
+            conn = obtener_pool().get_connection()
+            break
+        except PoolError:
+            if time.monotonic() > limite:
+                raise
+            time.sleep(0.05)
+    try:
+        # Las conexiones del pool pueden haber caducado (wait_timeout del servidor)
+        conn.ping(reconnect=True, attempts=REINTENTOS_PING, delay=1)
+    except mysql.connector.Error:
+        conn.close()
+        raise
+    return conn
+
+
+class CursorSQLite:
+    """Cursor SQLite con la interfaz que usan los scripts (parámetros %s y dictionary=True)"""
+
+    def __init__(self, cursor, dictionary=False):
+        self._cursor = cursor
+        self._dictionary = dictionary
+
+    @staticmethod
+    def _adaptar(query):
+        return re.sub(r"%s", "?", query)
+
+    def execute(self, query, params=()):
+        self._cursor.execute(self._adaptar(query), tuple(params or ()))
+        return self
+
+    def executemany(self, query, filas):
+        self._cursor.executemany(self._adaptar(query), filas)
+        return self
+
+    def _fila(self, fila):
+        if fila is None or not self._dictionary:
+            return fila
+        return dict(zip((c[0] for c in self._cursor.description), fila))
+
+    def fetchone(self):
+        return self._fila(self._cursor.fetchone())
+
+    def fetchmany(self, size=1000):
+        return [self._fila(f) for f in self._cursor.fetchmany(size)]
+
+    def fetchall(self):
+        return [self._fila(f) for f in self._cursor.fetchall()]
+
+    def __iter__(self):
+        return (self._fila(f) for f in self._cursor)
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def close(self):
+        self._cursor.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ConexionSQLite:
+    """Conexión SQLite con la misma forma que una conexión de mysql.connector"""
+
+    def __init__(self, path):
+        # Sin transacciones implícitas del módulo sqlite3: las abre transaccion() con BEGIN,
+        # y así un SAVEPOINT anida dentro de ella en lugar de abrir (y su RELEASE cerrar) otra
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+
+    def cursor(self, dictionary=False, **_):
+        return CursorSQLite(self._conn.cursor(), dictionary=dictionary)
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def close(self):
+        self._conn.close()
+
+    def is_connected(self):
+        try:
+            self._conn.execute("SELECT 1")
+            return True
+        except sqlite3.ProgrammingError:
+            return False
+
+
+def _conexion_sqlite():
+    global _sqlite_listo
+    conn = ConexionSQLite(SQLITE_PATH)
+    if not _sqlite_listo:
+        conn._conn.execute("PRAGMA journal_mode=WAL")
+        _sqlite_listo = True
+    return conn
+
+
+def _preparar_esquema(conn):
+    """Con la primera conexión de cada proceso se aplican las migraciones pendientes (esquema.py)"""
+    global _esquema_listo
+    with _esquema_lock:
+        if not _esquema_listo:
+            import esquema  # importa este módulo: aquí ya está cargado
+            esquema.migrar(conn)
+            _esquema_listo = True
+
+
+@contextmanager
+def conexion():
+    """Conexión del backend configurado; al salir vuelve al pool (o se cierra en SQLite)"""
+    conn = _conexion_sqlite() if es_sqlite() else _conexion_mysql()
+    try:
+        if not _esquema_listo:
+            _preparar_esquema(conn)
+        yield conn
+    finally:
+        conn.close()
+
+
+@contextmanager
+def transaccion(escritura=False):
+    """Cursor dentro de una única transacción: commit al salir, rollback si hay error.
+
+    Con SQLite, `escritura=True` toma el bloqueo de escritura al empezar
+    (BEGIN IMMEDIATE): una transacción que lee y después escribe no falla con
+    "database is locked" si otro proceso escribe entre medias, sino que espera.
+    """
+    with conexion() as conn:
+        cursor = conn.cursor()
+        try:
+            if es_sqlite():
+                cursor.execute("BEGIN IMMEDIATE" if escritura else "BEGIN")
+            yield cursor
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+
+def comprobar_conexion():
+    """Health check: lanza una excepción de `ERRORES` si la base de datos no responde"""
+    with conexion() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT 1")
+            cursor.fetchall()
+
+
+def existe_tabla(cursor, nombre):
+    """True si la tabla `nombre` ya existe en la base de datos"""
+    if es_sqlite():
+        cursor.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = %s", (nombre,))
+    else:
+        cursor.execute("""
+            SELECT COUNT(*) FROM information_schema.tables
+            WHERE table_schema = DATABASE() AND table_name = %s
+        """, (nombre,))
+    return bool(cursor.fetchone()[0])
+
+
+def existe_columna(cursor, tabla, columna):
+    """True si la tabla `tabla` ya tiene la columna `columna`"""
+    if es_sqlite():
+        cursor.execute(f"SELECT COUNT(*) FROM pragma_table_info('{tabla}') WHERE name = %s", (columna,))
+    else:
+        cursor.execute("""
+            SELECT COUNT(*) FROM information_schema.columns
+            WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s
+        """, (tabla, columna))
+    return bool(cursor.fetchone()[0])
+
+
+def filtros_sql(escalas=None, fuentes=None, desde=None, hasta=None, condiciones=()):
+    """Cláusula WHERE parametrizada para los filtros habituales.
+
+    Devuelve (" WHERE ...", params), o ("", []) si no hay ningún filtro.
+    `condiciones` añade condiciones fijas sin parámetros.
+    """
+    partes, params = list(condiciones), []
+    if escalas:
+        partes.append(f"escala IN ({', '.join(['%s'] * len(escalas))})")
+        params.extend(int(e) for e in escalas)
+    if fuentes:
+        partes.append(f"fuente IN ({', '.join(['%s'] * len(fuentes))})")
+        params.extend(fuentes)
+    if desde:
+        partes.append("fecha >= %s")
+        params.append(desde)
+    if hasta:
+        partes.append("fecha <= %s")
+        params.append(hasta)
+    return (" WHERE " + " AND ".join(partes) if partes else ""), params
+
+
+def iterar_lotes(query, params=None, tamano=5000):
+    """Recorre el resultado de una consulta en lotes de `tamano` filas.
+
+    En MySQL el cursor no tiene buffer (el servidor va enviando las filas), así
+    que la memoria no depende del tamaño de la tabla.
+    """
+    with conexion() as conn:
+        with conn.cursor(buffered=False) as cursor:
+            cursor.execute(query, params or ())
+            while filas := cursor.fetchmany(tamano):
+                yield filas
+
+
+def dataframe(query, params=None):
+    """Ejecuta una consulta y devuelve un DataFrame de pandas"""
+    import pandas as pd
+
+    with conexion() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(query, params or ())
+            columnas = [c[0] for c in cursor.description]
+            return pd.DataFrame(cursor.fetchall(), columns=columnas)
+
+
+def describir_error(err):
+    """Mensaje legible para los errores de conexión más habituales"""
+    errno = getattr(err, "errno", None)
+    if mysql and errno == errorcode.ER_ACCESS_DENIED_ERROR:
+        return "Error de autenticación en la base de datos"
+    if mysql and errno == errorcode.ER_BAD_DB_ERROR:
+        return "Base de datos no encontrada"
+    return f"Error de conexión: {err}"
+
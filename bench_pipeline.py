@@ -0,0 +1,378 @@
+"""Benchmark de extremo a extremo: scrape → inserción → agregados → gráficos.
+
+Genera un corpus sintético de titulares (10k, 1M o 10M filas) en una base de
+datos de usar y tirar y feeds RSS sintéticos para los ocho `MEDIOS`, servidos
+desde un servidor HTTP local (sin tocar las URLs reales). Mide cada etapa por
+separado y guarda los resultados en JSON, con el mismo formato en cada
+ejecución, para poder compararlos:
+
+    python bench_pipeline.py --filas 1m --json bench/1m.json
+    python bench_pipeline.py --filas 1m --comparar bench/1m.json
+
+Por defecto usa SQLite en un directorio temporal. Con `--backend mysql` usa
+la conexión de MYSQL_* y **vacía la tabla titulares**: apunta MYSQL_DATABASE
+a una base de datos de pruebas.
+
+Los scripts se miden como subprocesos (incluye arrancar Python); el gráfico
+de palabras se guarda en el directorio temporal (`--salida`), así que no
+sustituye el PNG que haya junto al script.
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from xml.sax.saxutils import escape
+
+import numpy as np
+
+from bench_tokenizador import VOCABULARIO
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+SUFIJOS = {"k": 1_000, "m": 1_000_000}
+TAMANO_LOTE = 50_000          # filas por executemany al cargar el corpus
+ENTRADAS_FEED = 50            # entradas por feed sintético
+DIAS_CORPUS = 3 * 365         # el corpus se reparte en los últimos tres años
+PALABRAS_SINTETICAS = 5000    # vocabulario inventado además del de bench_tokenizador
+UMBRAL_REGRESION = 1.2        # más de un 20 % más lento que la referencia se marca...
+MARGEN_REGRESION = 0.1        # ...si además son al menos 0,1 s más (las etapas cortas tienen ruido)
+VERSION_FORMATO = 1
+
+SILABAS = "ka lo vi ser tam nor pre dan mis gra ul bor tek fin ros che lav dim".split()
+
+
+def tamano(texto):
+    """Número de filas a partir de "10k", "1m", "10m" o un entero"""
+    texto = texto.strip().lower()
+    try:
+        if texto[-1:] in SUFIJOS:
+            return int(float(texto[:-1]) * SUFIJOS[texto[-1]])
+        return int(texto)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"tamaño no válido: {texto}") from None
+
+
+def vocabulario(rng):
+    """Palabras reales del tema más palabras inventadas, con frecuencias de Zipf"""
+    inventadas = {"".join(rng.choice(SILABAS, rng.integers(2, 4))) for _ in range(PALABRAS_SINTETICAS)}
+    palabras = np.array(list(dict.fromkeys(VOCABULARIO + sorted(inventadas))))
+    pesos = 1 / np.arange(1, len(palabras) + 1) ** 1.1
+    return palabras, pesos / pesos.sum()
+
+
+@lru_cache(maxsize=1)
+def vocabulario_fijo():
+    """El vocabulario de los feeds y artículos sintéticos (siempre la misma semilla)"""
+    return vocabulario(np.random.default_rng(42))
+
+
+def titulares_sinteticos(rng, palabras, pesos, n, escala):
+    """`n` titulares de 6 a 13 palabras; cada escala favorece una parte del vocabulario"""
+    sesgo = pesos.copy()
+    sesgo[escala::8] *= 4
+    sesgo /= sesgo.sum()
+    largos = rng.integers(6, 14, n)
+    elegidas = palabras[rng.choice(len(palabras), largos.sum(), p=sesgo)]
+    cortes = np.cumsum(largos)[:-1]
+    return [" ".join(trozo).capitalize() for trozo in np.split(elegidas, cortes)]
+
+
+def filas_corpus(n, medios, semilla=42):
+    """Genera las filas (fecha, fuente, escala, titular, enlace, hash_noticia, publicado) por lotes"""
+    rng = np.random.default_rng(semilla)
+    palabras, pesos = vocabulario(rng)
+    hoy = datetime.now(timezone.utc).date()
+    for inicio in range(0, n, TAMANO_LOTE):
+        tamano = min(TAMANO_LOTE, n - inicio)
+        medio_de = rng.integers(0, len(medios), tamano)
+        dias = rng.integers(0, DIAS_CORPUS, tamano)
+        lote = []
+        for indice, medio in enumerate(medios):
+            posiciones = np.flatnonzero(medio_de == indice)
+            textos = titulares_sinteticos(rng, palabras, pesos, len(posiciones), medio["escala"])
+            for posicion, titular in zip(posiciones, textos):
+                i = inicio + int(posicion)
+                enlace = f"https://bench.invalid/{indice}/{i}"
+                dia = (hoy - timedelta(days=int(dias[posicion]))).isoformat()
+                lote.append((dia, medio["nombre"], medio["escala"], titular, enlace,
+                             hashlib.sha1(f"bench:{i}".encode()).hexdigest(), f"{dia} 12:00:00"))
+        yield lote
+
+
+def feed_rss(medio, entradas, semilla, base):
+    """XML RSS 2.0 sintético con `entradas` noticias nuevas del medio, enlazadas a artículos en `base`"""
+    rng = np.random.default_rng(semilla)
+    palabras, pesos = vocabulario_fijo()
+    ahora = datetime.now(timezone.utc)
+    items = []
+    for i, titular in enumerate(titulares_sinteticos(rng, palabras, pesos, entradas, medio["escala"])):
+        enlace = f"{base}/articulo/{semilla}/{medio['escala']}/{i}"
+        items.append(f"<item><title>{escape(titular)}</title><link>{enlace}</link>"
+                     f"<guid>{enlace}</guid>"
+                     f"<pubDate>{format_datetime(ahora - timedelta(minutes=7 * i))}</pubDate></item>")
+    return (f'<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel>'
+            f"<title>{escape(medio['nombre'])}</title><link>https://bench.invalid/</link>"
+            f"<description>bench</description>{''.join(items)}</channel></rss>").encode("utf-8")
+
+
+def pagina_articulo(ruta):
+    """HTML sintético de un artículo, siempre el mismo para la misma ruta"""
+    rng = np.random.default_rng(int(hashlib.sha1(ruta.encode()).hexdigest()[:8], 16))
+    palabras, pesos = vocabulario_fijo()
+    entradilla, *parrafos = titulares_sinteticos(rng, palabras, pesos, 6, int(rng.integers(1, 9)))
+    menu = '<a href="/">menú</a>' * 40
+    cuerpo = "".join(f"<p>{escape(parrafo)}.</p>" for parrafo in parrafos * 10)
+    return (f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>{escape(entradilla)}</title>'
+            f'<meta property="og:description" content="{escape(entradilla)}.">'
+            f"</head><body><nav>{menu}</nav><article>{cuerpo}</article></body></html>").encode("utf-8")
+
+
+def servir_feeds(feeds):
+    """Servidor HTTP local en un hilo que devuelve cada feed en /<n> y artículos en /articulo/...
+
+    `feeds` se consulta en cada petición: se puede rellenar después de
+    arrancar el servidor, cuando ya se conoce su URL. Devuelve (servidor, url_base).
+    """
+
+    class Manejador(BaseHTTPRequestHandler):
+        def do_GET(self):
+            ruta = self.path.strip("/")
+            if ruta.startswith("articulo/"):
+                cuerpo, tipo = pagina_articulo(ruta), "text/html; charset=utf-8"
+            else:
+                cuerpo, tipo = feeds.get(ruta), "application/rss+xml"
+            if cuerpo is None:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", tipo)
+            self.send_header("Content-Length", str(len(cuerpo)))
+            self.end_headers()
+            self.wfile.write(cuerpo)
+
+        def log_message(self, *args):
+            pass
+
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), Manejador)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor, f"http://127.0.0.1:{servidor.server_address[1]}"
+
+
+class Cronometro:
+    """Acumula las etapas medidas como diccionarios listos para el JSON"""
+
+    def __init__(self):
+        self.etapas = []
+
+    def medir(self, nombre, funcion, *args, filas=None, **kwargs):
+        print(f"⏳ {nombre}...", flush=True)
+        inicio = time.perf_counter()
+        resultado = funcion(*args, **kwargs)
+        segundos = time.perf_counter() - inicio
+        etapa = {"etapa": nombre, "segundos": round(segundos, 4)}
+        if filas:
+            etapa["filas"] = filas
+            etapa["filas_por_segundo"] = round(filas / segundos)
+        self.etapas.append(etapa)
+        print(f"   ✔ {segundos:8.2f} s", flush=True)
+        return resultado
+
+
+def preparar_entorno(args, temporal):
+    """Variables de entorno de la ejecución; deben fijarse antes de importar base_datos"""
+    os.environ["NOTICIAS_DB"] = args.backend
+    os.environ["NOTICIAS_PARQUET"] = os.path.join(temporal, "parquet")
+    os.environ["MPLBACKEND"] = "Agg"
+    if args.backend == "sqlite":
+        os.environ["NOTICIAS_SQLITE"] = os.path.join(temporal, "bench.db")
+
+
+def vaciar(base_datos):
+    """Deja la base de datos MySQL sin titulares ni índices derivados (SQLite ya empieza vacía)"""
+    with base_datos.transaccion() as cursor:
+        for tabla in ("lsh_bandas", "historias", "term_counts", "resumen_titulares", "entradillas"):
+            if base_datos.existe_tabla(cursor, tabla):
+                cursor.execute(f"DROP TABLE {tabla}")
+        cursor.execute("DELETE FROM titulares")
+    # Los scripts se lanzan como subprocesos: que no vuelvan a pedir la contraseña
+    os.environ["MYSQL_PASSWORD"] = base_datos.configuracion()["password"]
+
+
+def cargar_corpus(base_datos, consulta, n, medios):
+    import esquema
+
+    with base_datos.transaccion() as cursor:
+        esquema.registrar_fuentes(cursor, [(medio["nombre"], medio["escala"]) for medio in medios])
+    for lote in filas_corpus(n, medios):
+        with base_datos.transaccion() as cursor:
+            cursor.executemany(consulta, lote)
+
+
+def comprobar_rankings(rankings, escalas):
+    """Falla si algún método de distintivos deja sin términos a alguna escala del corpus"""
+    vacias = [f"{metodo} (escala {escala})" for metodo, ranking in rankings.items()
+              for escala in sorted(escalas) if not ranking.get(escala)]
+    if vacias:
+        raise RuntimeError(f"Rankings de distintivos vacíos: {', '.join(vacias)}")
+
+
+def ejecutar_script(script, *argumentos):
+    salida = subprocess.run([sys.executable, os.path.join(DIRECTORIO, script), *argumentos],
+                            cwd=DIRECTORIO, capture_output=True, text=True)
+    if salida.returncode:
+        raise RuntimeError(f"{script} terminó con código {salida.returncode}:\n{salida.stderr[-2000:]}")
+
+
+def commit_actual():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=DIRECTORIO,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def comparar(actual, referencia, umbral=UMBRAL_REGRESION):
+    """Imprime la relación de tiempos por etapa; devuelve las etapas que empeoran más de `umbral`"""
+    anteriores = {e["etapa"]: e["segundos"] for e in referencia["etapas"]}
+    regresiones = []
+    print(f"\n📈 Comparación con {referencia.get('commit') or 'referencia'} ({referencia.get('fecha')}):")
+    for etapa in actual["etapas"]:
+        anterior = anteriores.get(etapa["etapa"])
+        if not anterior:
+            continue
+        relacion = etapa["segundos"] / anterior
+        significativa = abs(etapa["segundos"] - anterior) >= MARGEN_REGRESION
+        peor = relacion > umbral and significativa
+        marca = "🔺" if peor else "🔻" if relacion < 1 / umbral and significativa else "▪"
+        print(f"{marca} {etapa['etapa'].ljust(28)}: {anterior:8.2f} s → {etapa['segundos']:8.2f} s  (x{relacion:.2f})")
+        if peor:
+            regresiones.append(etapa["etapa"])
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--filas", type=tamano, default="10k",
+                        help="tamaño del corpus sintético: 10k, 1m, 10m o un número")
+    parser.add_argument("--backend", choices=["sqlite", "mysql"], default="sqlite")
+    parser.add_argument("--entradas", type=int, default=ENTRADAS_FEED, help="entradas por feed sintético")
+    parser.add_argument("--procesos", type=int, default=os.cpu_count() or 1,
+                        help="procesos del recuento paralelo")
+    parser.add_argument("--sin-historias", action="store_true",
+                        help="crea vacías las tablas de historias en lugar de agrupar todo el corpus "
+                             "(la reconstrucción MinHash es la etapa más larga)")
+    parser.add_argument("--json", help="guarda los resultados en este fichero")
+    parser.add_argument("--comparar", metavar="JSON", help="resultados anteriores con los que comparar")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    with tempfile.TemporaryDirectory(prefix="bench_noticias_") as temporal:
+        preparar_entorno(args, temporal)
+        # Los módulos leen el entorno al importarse
+        import base_datos
+        import busqueda
+        import conteo_paralelo
+        import distintivos
+        import duplicados
+        import enriquecimiento
+        import indice_terminos
+        import metricas
+        import resumen_titulares
+        import scraper
+
+        n = args.filas
+        crono = Cronometro()
+        if args.backend == "mysql":
+            vaciar(base_datos)
+
+        crono.medir("carga_corpus", cargar_corpus, base_datos, scraper.consulta_insercion(),
+                    n, scraper.MEDIOS, filas=n)
+        # Cada índice derivado por separado; asegurar_esquema del scraper ya los encuentra creados
+        with base_datos.transaccion() as cursor:
+            crono.medir("indice_terminos", indice_terminos.asegurar_tabla, cursor, filas=n)
+            crono.medir("resumen_titulares", resumen_titulares.asegurar_tabla, cursor, filas=n)
+            crono.medir("indice_texto", busqueda.asegurar_indice, cursor, filas=n)
+            duplicados.asegurar_tablas(cursor)
+        if not args.sin_historias:
+            crono.medir("historias_minhash", duplicados.reconstruir, filas=n)
+
+        # Scrape contra los feeds locales: descarga, parseo, inserción e índices incrementales
+        feeds = {}
+        servidor, base = servir_feeds(feeds)
+        feeds.update({str(i): feed_rss(medio, args.entradas, int(time.time()) + i, base)
+                      for i, medio in enumerate(scraper.MEDIOS)})
+        medios = [dict(medio, rss=f"{base}/{i}") for i, medio in enumerate(scraper.MEDIOS)]
+        scraper.output_path = os.path.join(temporal, "noticias_medios.csv")
+        scraper.estado_path = os.path.join(temporal, "estado_feeds.json")
+        try:
+            crono.medir("scrape", scraper.scrapear, medios, filas=len(medios) * args.entradas)
+            # Entradillas de lo recién scrapeado (los artículos también los sirve el servidor local);
+            # todo va al mismo host, así que sin intervalo por dominio. La segunda pasada sale de la caché.
+            cache = enriquecimiento.CacheArticulos(os.path.join(temporal, "cache_articulos"))
+            crono.medir("entradillas", enriquecimiento.enriquecer, len(medios) * args.entradas,
+                        intervalo=0, cache=cache, filas=len(medios) * args.entradas)
+            crono.medir("entradillas_cache", enriquecimiento.enriquecer, len(medios) * args.entradas,
+                        intervalo=0, cache=cache, reextraer=True, filas=len(medios) * args.entradas)
+        finally:
+            servidor.shutdown()
+
+        with base_datos.transaccion() as cursor:
+            crono.medir("top_palabras_indice", indice_terminos.top_por_escala, cursor, limite=10)
+            rankings = {metodo: crono.medir(f"distintivos_{metodo.replace('-', '_')}", distintivos.top_por_escala,
+                                            cursor, metodo, 10)
+                        for metodo in distintivos.METODOS}
+        comprobar_rankings(rankings, {medio["escala"] for medio in scraper.MEDIOS})
+        with base_datos.transaccion() as cursor:
+            crono.medir("titulares_por_medio", resumen_titulares.por_fuente, cursor)
+        crono.medir("recuento_directo", conteo_paralelo.contar, 1, filas=n)
+        if args.procesos > 1:
+            crono.medir(f"recuento_{args.procesos}_procesos", conteo_paralelo.contar, args.procesos, filas=n)
+
+        crono.medir("script_analisis_basico", ejecutar_script, "analisis_basico.py")
+        crono.medir("script_analisis_palabras", ejecutar_script, "analisis_palabras.py")
+        crono.medir("script_grafico_palabras", ejecutar_script, "grafico_palabras_escala.py",
+                    "--salida", os.path.join(temporal, "grafico_palabras_escala.png"))
+
+        resultado = {
+            "formato": VERSION_FORMATO,
+            "fecha": datetime.now().isoformat(timespec="seconds"),
+            "commit": commit_actual(),
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "cpus": os.cpu_count(),
+            "backend": args.backend,
+            "filas": n,
+            "entradas_por_feed": args.entradas,
+            "sin_historias": args.sin_historias,
+            "etapas": crono.etapas,
+            "metricas": metricas.instantanea(),
+        }
+
+    if args.json:
+        os.makedirs(os.path.dirname(os.path.abspath(args.json)), exist_ok=True)
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(resultado, file, ensure_ascii=False, indent=2)
+        print(f"✅ Resultados guardados en {args.json}")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as file:
+            referencia = json.load(file)
+        if (referencia.get("filas"), referencia.get("backend"), referencia.get("sin_historias", False)) \
+                != (n, args.backend, args.sin_historias):
+            print("⚠️ La referencia usa otro tamaño o backend; los tiempos no son comparables.")
+        if comparar(resultado, referencia):
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Benchmark del tokenizador: tokens por segundo sobre un corpus sintético.
+
+Uso: python bench_tokenizador.py [--titulares 1000000] [--repeticiones 3] [--json salida.json]
+"""
+import argparse
+import json
+import random
+import re
+import time
+from collections import Counter
+from unicodedata import normalize
+
+import tokenizador
+
+VOCABULARIO = (
+    "Russia Ukraine Kyiv Moscow Zelensky Putin drone attack missile strike grain deal "
+    "talks peace sanctions NATO troops front Zaporizhzhia nuclear plant energy gas "
+    "Ucrania Rusia ataque guerra negociaciones país según acuerdo frontera misiles "
+    "the of in to on for with says after over amid more new war UN EU U.S."
+).split()
+SIGNOS = ["", "", "", ",", ":", "?", "'s", "’s", " —", " -", ";", "!"]
+
+
+def corpus_sintetico(n, semilla=42):
+    """Lista de `n` titulares aleatorios con acentos, signos, números y apóstrofos"""
+    rnd = random.Random(semilla)
+    titulares = []
+    for _ in range(n):
+        palabras = [rnd.choice(VOCABULARIO) + rnd.choice(SIGNOS) for _ in range(rnd.randint(6, 14))]
+        if rnd.random() < 0.3:
+            palabras.insert(rnd.randrange(len(palabras)), str(rnd.randint(1, 2025)))
+        titulares.append(" ".join(palabras))
+    return titulares
+
+
+# Implementaciones anteriores, para comparar
+STOPWORDS_ANTERIOR = tokenizador.STOPWORDS_EN | tokenizador.STOPWORDS_ES
+
+
+def anterior_analisis_palabras(titulares):
+    conteo = Counter()
+    for titular in titulares:
+        texto = normalize('NFKD', titular).encode('ASCII', 'ignore').decode('ASCII')
+        texto = re.sub(r'[^\w\s]', '', texto.lower())
+        palabras = re.findall(r'\b[a-záéíóúñ]+\b', texto, re.IGNORECASE)
+        conteo.update(p for p in palabras if p not in STOPWORDS_ANTERIOR and len(p) > 2)
+    return conteo
+
+
+def anterior_dashboard(titulares):
+    texto = re.sub(r"[^a-zA-Z\s']", '', " ".join(titulares).lower())
+    texto = re.sub(r"\s+", ' ', texto).strip()
+    return Counter(p for p in texto.split() if p not in STOPWORDS_ANTERIOR and len(p) > 3)
+
+
+def por_titular(titulares):
+    conteo = Counter()
+    for titular in titulares:
+        conteo.update(tokenizador.tokenizar(titular))
+    return conteo
+
+
+def lote(titulares):
+    return tokenizador.contar_palabras(titulares)
+
+
+CASOS = {
+    "anterior (analisis_palabras)": anterior_analisis_palabras,
+    "anterior (dashboard)": anterior_dashboard,
+    "tokenizar por titular": por_titular,
+    "contar_palabras en lote": lote,
+}
+
+
+def medir(funcion, titulares, repeticiones):
+    """Mejor tiempo de `repeticiones` ejecuciones y número de tokens contados"""
+    mejor, tokens = float("inf"), 0
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        conteo = funcion(titulares)
+        mejor = min(mejor, time.perf_counter() - inicio)
+        tokens = sum(conteo.values())
+    return mejor, tokens
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--titulares", type=int, default=1_000_000)
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--json", help="guarda los resultados en este fichero")
+    args = parser.parse_args()
+
+    print(f"🧪 Generando {args.titulares:,} titulares sintéticos...")
+    titulares = corpus_sintetico(args.titulares)
+
+    resultados = []
+    for nombre, funcion in CASOS.items():
+        segundos, tokens = medir(funcion, titulares, args.repeticiones)
+        resultados.append({
+            "caso": nombre,
+            "titulares": args.titulares,
+            "segundos": round(segundos, 4),
+            "tokens": tokens,
+            "tokens_por_segundo": round(tokens / segundos),
+            "titulares_por_segundo": round(args.titulares / segundos),
+        })
+        print(f"▪ {nombre.ljust(30)}: {segundos:7.2f} s  {tokens / segundos:>12,.0f} tokens/s")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(resultados, file, ensure_ascii=False, indent=2)
+        print(f"✅ Resultados guardados en {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""Búsqueda de texto completo en los titulares.
+
+Usa el índice nativo de cada backend, que se mantiene solo al insertar:
+- MySQL: índice FULLTEXT sobre `titular` (MATCH ... AGAINST en modo booleano).
+- SQLite: tabla virtual FTS5 con contenido externo, sincronizada por triggers,
+  y ranking BM25.
+
+La consulta del usuario se normaliza con el mismo `limpiar_texto` que el resto
+del proyecto (minúsculas, sin acentos ni signos); el texto entre comillas se
+busca como frase y cada palabra suelta también encuentra sus prolongaciones
+("sanction" -> "sanctions").
+
+Uso: python busqueda.py "grain deal" zaporizhzhia
+"""
+import argparse
+import logging
+import re
+
+import base_datos
+from tokenizador import limpiar_texto
+
+TAMANO_PAGINA = 50
+
+ESQUEMA_SQLITE = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS titulares_fts USING fts5(
+        titular, content='titulares', content_rowid='id', tokenize='unicode61 remove_diacritics 2')""",
+    """CREATE TRIGGER IF NOT EXISTS titulares_fts_ai AFTER INSERT ON titulares BEGIN
+        INSERT INTO titulares_fts(rowid, titular) VALUES (new.id, new.titular);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS titulares_fts_ad AFTER DELETE ON titulares BEGIN
+        INSERT INTO titulares_fts(titulares_fts, rowid, titular) VALUES ('delete', old.id, old.titular);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS titulares_fts_au AFTER UPDATE OF titular ON titulares BEGIN
+        INSERT INTO titulares_fts(titulares_fts, rowid, titular) VALUES ('delete', old.id, old.titular);
+        INSERT INTO titulares_fts(rowid, titular) VALUES (new.id, new.titular);
+    END""",
+]
+
+RE_TERMINOS = re.compile(r'"([^"]*)"|(\S+)')
+
+
+def asegurar_indice(cursor):
+    """Crea el índice de texto completo si no existe (y lo rellena con lo ya guardado)"""
+    if base_datos.es_sqlite():
+        if base_datos.existe_tabla(cursor, "titulares_fts"):
+            return False
+        logging.info("🛠️ Creando índice FTS5 de titulares...")
+        for sentencia in ESQUEMA_SQLITE:
+            cursor.execute(sentencia)
+        cursor.execute("INSERT INTO titulares_fts(titulares_fts) VALUES ('rebuild')")
+        return True
+
+    cursor.execute("""
+        SELECT COUNT(*) FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = 'titulares' AND index_name = 'ft_titulares_titular'
+    """)
+    if cursor.fetchone()[0]:
+        return False
+    logging.info("🛠️ Creando índice FULLTEXT de titulares (puede tardar con mucho histórico)...")
+    cursor.execute("ALTER TABLE titulares ADD FULLTEXT INDEX ft_titulares_titular (titular)")
+    return True
+
+
+def terminos(texto):
+    """Lista de (palabras, es_frase) normalizadas a partir de lo que escribe el usuario"""
+    resultado = []
+    for frase, palabra in RE_TERMINOS.findall(texto or ""):
+        if frase:
+            palabras = limpiar_texto(frase).split()
+            if palabras:
+                resultado.append((palabras, True))
+        else:
+            resultado.extend(([p], False) for p in limpiar_texto(palabra).split())
+    return resultado
+
+
+def consulta_fts(texto):
+    """Consulta en la sintaxis del backend (todas las palabras y frases obligatorias), o None"""
+    partes = []
+    for palabras, es_frase in terminos(texto):
+        # limpiar_texto solo deja letras y apóstrofos: no pueden colarse operadores
+        palabras = " ".join(p.replace("'", " ") for p in palabras).split()
+        if es_frase or len(palabras) > 1:  # "russia's" se busca como la frase "russia s"
+            partes.append(f'"{" ".join(palabras)}"')
+        elif not palabras:
+            continue
+        elif base_datos.es_sqlite():
+            partes.append(f'"{palabras[0]}"*')
+        else:
+            partes.append(f"{palabras[0]}*")
+    if not partes:
+        return None
+    if base_datos.es_sqlite():
+        return " AND ".join(partes)
+    return " ".join(f"+{p}" for p in partes)
+
+
+def _condicion():
+    if base_datos.es_sqlite():
+        return "titulares_fts MATCH %s"
+    return "MATCH(titular) AGAINST (%s IN BOOLEAN MODE)"
+
+
+def _desde_indice(where):
+    if base_datos.es_sqlite():
+        return f"titulares_fts JOIN titulares ON titulares.id = titulares_fts.rowid{where}"
+    return f"titulares{where}"
+
+
+def buscar(cursor, texto, pagina=0, tamano=TAMANO_PAGINA, **filtros):
+    """Página `pagina` (desde 0) de resultados ordenados por relevancia.
+
+    Devuelve (filas, hay_mas); cada fila es (id, fecha, fuente, escala, titular,
+    enlace, puntuacion). Los filtros son los de base_datos.filtros_sql.
+    """
+    consulta = consulta_fts(texto)
+    if consulta is None:
+        return [], False
+    where, params = base_datos.filtros_sql(**filtros, condiciones=(_condicion(),))
+    if base_datos.es_sqlite():
+        # bm25 es negativo: cuanto menor, más relevante
+        puntuacion, params = "-bm25(titulares_fts)", [consulta] + params
+    else:
+        puntuacion, params = _condicion(), [consulta, consulta] + params
+    cursor.execute(f"""
+        SELECT titulares.id, fecha, fuente, escala, titulares.titular, enlace, {puntuacion} AS puntuacion
+        FROM {_desde_indice(where)}
+        ORDER BY puntuacion DESC, titulares.id DESC
+        LIMIT {int(tamano) + 1} OFFSET {int(pagina) * int(tamano)}
+    """, params)
+    filas = cursor.fetchall()
+    return filas[:tamano], len(filas) > tamano
+
+
+def coincidencias_por_escala(cursor, texto, **filtros):
+    """Diccionario escala -> número de titulares que coinciden con la búsqueda"""
+    consulta = consulta_fts(texto)
+    if consulta is None:
+        return {}
+    where, params = base_datos.filtros_sql(**filtros, condiciones=(_condicion(),))
+    cursor.execute(f"""
+        SELECT escala, COUNT(*) FROM {_desde_indice(where)}
+        GROUP BY escala ORDER BY escala
+    """, [consulta] + params)
+    return {int(e): int(n) for e, n in cursor.fetchall() if e is not None}
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Búsqueda de texto completo en los titulares")
+    parser.add_argument("texto", nargs="+", help='palabras o "frases entre comillas"')
+    parser.add_argument("--limite", type=int, default=10)
+    args = parser.parse_args()
+    texto = " ".join(f'"{t}"' if " " in t else t for t in args.texto)
+
+    with base_datos.transaccion() as cursor:
+        asegurar_indice(cursor)
+        por_escala = coincidencias_por_escala(cursor, texto)
+        filas, _ = buscar(cursor, texto, tamano=args.limite)
+    print(f"\n🔎 {sum(por_escala.values())} titulares para {texto}: "
+          + ", ".join(f"escala {e}: {n}" for e, n in por_escala.items()))
+    for _, fecha, fuente, escala, titular, _, puntuacion in filas:
+        print(f"   ▫ [{escala}] {fecha} {fuente}: {titular} ({puntuacion:.2f})")
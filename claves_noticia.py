@@ -0,0 +1,30 @@
+"""Clave de deduplicación de las noticias (columna `hash_noticia`).
+
+Sin dependencias fuera de la biblioteca estándar: la usan el scraper al
+insertar y la migración que rellena `hash_noticia` en las tablas antiguas
+(esquema.py), que se ejecuta en la primera conexión de cualquier herramienta.
+"""
+import hashlib
+import re
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+PARAMETROS_SEGUIMIENTO = re.compile(r"^(utm_|fbclid$|gclid$|at_medium$|at_campaign$)")
+
+
+def normalizar_enlace(enlace):
+    """Normaliza una URL para que las variantes de la misma noticia coincidan"""
+    partes = urlsplit(enlace.strip())
+    query = urlencode([(k, v) for k, v in parse_qsl(partes.query)
+                       if not PARAMETROS_SEGUIMIENTO.match(k)])
+    ruta = partes.path.rstrip("/")
+    # Se ignora el esquema: http y https apuntan a la misma noticia
+    return f"{partes.netloc.lower()}{ruta}" + (f"?{query}" if query else "")
+
+
+def hash_noticia(titular, enlace):
+    """Clave de deduplicación: enlace normalizado o, si no hay, el titular normalizado"""
+    if enlace and enlace != "Sin enlace":
+        clave = "url:" + normalizar_enlace(enlace)
+    else:
+        clave = "tit:" + " ".join((titular or "").casefold().split())
+    return hashlib.sha1(clave.encode("utf-8")).hexdigest()
@@ -0,0 +1,110 @@
+"""Recuento de palabras en paralelo (map-reduce) sobre todo el archivo de titulares.
+
+Para reprocesar el histórico tras cambiar el tokenizador o las stopwords, la
+tabla `titulares` se parte en rangos de `id`; cada proceso de un
+`ProcessPoolExecutor` abre su propia conexión, lee su rango en lotes, tokeniza
+y devuelve un Counter, y el proceso principal los suma. Hay más rangos que
+procesos para que ninguno se quede esperando al más lento.
+
+Niveles de recuento:
+- "escala": Counter de (escala, term), para rankings por escala.
+- "indice": Counter de (escala, fuente, fecha, term), el formato de term_counts.
+"""
+import heapq
+import multiprocessing
+import os
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import base_datos
+import metricas
+from tokenizador import contar_palabras, tokenizar
+
+TAMANO_LOTE = 5000        # filas por fetchmany dentro de cada rango
+RANGOS_POR_PROCESO = 4    # reparto más fino que el nº de procesos para equilibrar la carga
+
+CONSULTA_RANGO = """
+    SELECT fecha, fuente, escala, titular FROM titulares
+    WHERE id BETWEEN %s AND %s
+    AND escala IS NOT NULL AND fuente IS NOT NULL AND fecha IS NOT NULL AND titular IS NOT NULL
+"""
+
+
+def procesos_por_defecto():
+    return os.cpu_count() or 1
+
+
+def rangos_id(partes):
+    """Divide [MIN(id), MAX(id)] en `partes` rangos cerrados de tamaño parecido"""
+    with base_datos.conexion() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT MIN(id), MAX(id) FROM titulares")
+            minimo, maximo = cursor.fetchone()
+    if minimo is None:
+        return []
+    paso = max(1, -(-(maximo - minimo + 1) // partes))
+    return [(inicio, min(inicio + paso - 1, maximo)) for inicio in range(minimo, maximo + 1, paso)]
+
+
+def _contar_filas(filas, nivel, conteo):
+    if nivel == "indice":
+        for fecha, fuente, escala, titular in filas:
+            for term in tokenizar(titular):
+                conteo[(int(escala), fuente, fecha, term)] += 1
+        return
+    por_escala = defaultdict(list)
+    for _, _, escala, titular in filas:
+        por_escala[int(escala)].append(titular)
+    for escala, titulares in por_escala.items():
+        for term, veces in contar_palabras(titulares).items():
+            conteo[(escala, term)] += veces
+
+
+def contar_rango(rango, nivel="escala", tamano_lote=TAMANO_LOTE):
+    """Map: recuento de un rango de ids, leído en lotes por una conexión propia"""
+    conteo = Counter()
+    with base_datos.conexion() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(CONSULTA_RANGO, rango)
+            while filas := cursor.fetchmany(tamano_lote):
+                _contar_filas(filas, nivel, conteo)
+    return conteo
+
+
+def _inicializar(config):
+    # Con "spawn" cada proceso arranca limpio (sin el pool del padre); solo necesita
+    # la configuración de conexión, incluida la contraseña ya pedida
+    base_datos.configurar(**config)
+
+
+@metricas.cronometrado("recuento_paralelo")
+def contar(procesos=None, nivel="escala", tamano_lote=TAMANO_LOTE):
+    """Reduce: suma los Counters de todos los rangos (en paralelo si `procesos` > 1)"""
+    procesos = procesos or procesos_por_defecto()
+    rangos = rangos_id(procesos * RANGOS_POR_PROCESO if procesos > 1 else 1)
+    total = Counter()
+    if procesos == 1:
+        for rango in rangos:
+            total.update(contar_rango(rango, nivel, tamano_lote))
+        return total
+
+    with ProcessPoolExecutor(max_workers=procesos,
+                             mp_context=multiprocessing.get_context("spawn"),
+                             initializer=_inicializar, initargs=(base_datos.configuracion(),)) as pool:
+        futuros = [pool.submit(contar_rango, rango, nivel, tamano_lote) for rango in rangos]
+        for futuro in as_completed(futuros):
+            total.update(futuro.result())
+    return total
+
+
+def top_por_escala(conteo, limite=10):
+    """Diccionario escala -> [(term, total)] desde un Counter de nivel "escala".
+
+    Mismo orden que indice_terminos.top_por_escala: más frecuentes primero y,
+    a igualdad, alfabético.
+    """
+    por_escala = defaultdict(list)
+    for (escala, term), veces in conteo.items():
+        por_escala[escala].append((term, veces))
+    return {escala: heapq.nsmallest(limite, terminos, key=lambda par: (-par[1], par[0]))
+            for escala, terminos in sorted(por_escala.items())}
@@ -1,12 +1,17 @@
 import streamlit as st
-import mysql.connector
 import pandas as pd
-from mysql.connector import errorcode
 import matplotlib.pyplot as plt
 import seaborn as sns
-from collections import Counter
-import re
+import io
 import os
+import base_datos  # Conexión compartida (MySQL con pool o SQLite)
+import indice_terminos  # Frecuencias precalculadas en term_counts
+import resumen_titulares  # Recuentos precalculados por fuente, escala y día
+import tendencias  # Series temporales de términos por escala
+import distintivos  # Ranking de términos característicos (log-odds / TF-IDF)
+import almacen_parquet  # Histórico columnar, legible sin base de datos
+import busqueda  # Índice de texto completo (FULLTEXT / FTS5)
+import metricas  # Tiempo de renderizado (se vuelca a NOTICIAS_METRICAS si está definida)
 
 # Configuración inicial
 st.set_page_config(
@@ -27,70 +32,112 @@ PALETA_ESCALAS = {
     5: '#d62728', 6: '#9467bd', 7: '#8c564b', 8: '#e377c2'
 }
 
-# Stopwords optimizadas
-STOPWORDS = frozenset({
-    "the", "and", "of", "in", "to", "a", "on", "for", "with", "at",
-    "from", "by", "an", "is", "as", "it", "that", "this", "was", "be",
-    "are", "but", "or", "have", "has", "had", "their", "its", "they",
-    "them", "his", "her", "he", "she", "we", "you", "i", "who", "what",
-    "which", "will", "can", "all", "not", "been", "were", "also", "more",
-    "after", "one", "new", "about", "would", "could", "just", "into",
-    "over", "than", "when", "out", "up", "no", "so", "if", "do", "did",
-    "may", "me", "us", "our", "because", "it's", "they're", "we're", 
-    "that's", "don't", "isn't", "you're", "i'm", "he's", "she's"
-})
-
-@st.cache_resource(ttl=3600, show_spinner="Conectando a la base de datos...")
+@st.cache_resource(show_spinner="Conectando a la base de datos...")
 def init_connection():
-    """Pool de conexiones persistente con manejo de errores"""
+    """Configura el pool compartido una sola vez por proceso y comprueba que responde"""
     try:
-        return mysql.connector.connect(
-            host="localhost",
-            user="root",
-            password=st.secrets.get("MYSQL_PASSWORD", os.getenv("MYSQL_PASSWORD", "")),
-            database="proyecto_noticias",
-            charset="utf8mb4",
-            pool_size=3,
-            pool_name="news_pool",
-            connect_timeout=5
-        )
-    except mysql.connector.Error as err:
-        if err.errno == errorcode.ER_ACCESS_DENIED_ERROR:
-            st.error("Error de autenticación en la base de datos")
-        elif err.errno == errorcode.ER_BAD_DB_ERROR:
-            st.error("Base de datos no encontrada")
-        else:
-            st.error(f"Error de conexión: {err}")
+        password = st.secrets.get("MYSQL_PASSWORD")
+    except Exception:  # sin secrets.toml, st.secrets lanza en lugar de devolver None
+        password = None
+    base_datos.configurar(password=password or os.getenv("MYSQL_PASSWORD", ""))
+    try:
+        base_datos.comprobar_conexion()
+    except base_datos.ERRORES as err:
+        st.error(base_datos.describir_error(err))
         st.stop()
 
-@st.cache_data(ttl=600, show_spinner="Cargando datos...")
-def cargar_datos():
-    """Carga optimizada con manejo de errores"""
-    query = """
-        SELECT escala, titular 
-        FROM titulares 
-        WHERE escala IS NOT NULL 
-        AND titular IS NOT NULL
-        AND LENGTH(titular) > 10
-    """
+@st.cache_data(ttl=60, show_spinner=False)
+def version_datos():
+    """Huella barata de la tabla: cambia cada vez que el scraper inserta titulares"""
+    init_connection()
+    with base_datos.transaccion() as cursor:
+        # Crea y rellena el resumen la primera vez; el scraper lo mantiene al insertar
+        resumen_titulares.asegurar_tabla(cursor)
+        cursor.execute("SELECT SUM(titulares), MAX(fecha) FROM resumen_titulares")
+        return tuple(str(valor) for valor in cursor.fetchone())
+
+TAMANO_PAGINA = 50  # titulares por página de la tabla
+PROPORCION_RECORRIDO = 0.01  # fracción de titulares a partir de la cual la página recorre la clave primaria
+
+# Excluye titulares vacíos o demasiado cortos, igual que antes hacía el filtro en pandas.
+# `longitud` es una columna guardada e indexada (esquema.py): LENGTH(titular) no podría usar índices
+CONDICIONES_TITULAR = ("escala IS NOT NULL", f"longitud > {resumen_titulares.LONGITUD_MINIMA}")
+
+def consultar(query, params=()):
+    """Ejecuta una consulta de solo lectura y devuelve todas las filas"""
+    init_connection()
     try:
-        conn = init_connection()
-        return pd.read_sql(query, conn)
-    except mysql.connector.Error as err:
+        with base_datos.conexion() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(query, params)
+                return cursor.fetchall()
+    except base_datos.ERRORES as err:
         st.error(f"Error en consulta SQL: {err}")
         st.stop()
-    finally:
-        if 'conn' in locals() and conn.is_connected():
-            conn.close()
 
-def limpiar_texto(texto):
-    """Limpieza optimizada con manejo de contracciones"""
-    texto = re.sub(r"[^a-zA-Z\s']", '', texto.lower())
-    return re.sub(r"\s+", ' ', texto).strip()
+@st.cache_data(max_entries=2, show_spinner=False)
+def opciones_filtros(version):
+    """Escalas, fuentes y rango de fechas disponibles (sin cargar titulares)"""
+    escalas = [int(e) for (e,) in consultar(
+        "SELECT DISTINCT escala FROM resumen_titulares WHERE escala IS NOT NULL ORDER BY escala")]
+    fuentes = [f for (f,) in consultar(
+        "SELECT nombre FROM fuentes ORDER BY nombre")]
+    (minima, maxima), = consultar(
+        "SELECT MIN(fecha), MAX(fecha) FROM resumen_titulares WHERE fecha IS NOT NULL")
+    return escalas, fuentes, minima, maxima
+
+@st.cache_data(max_entries=32, show_spinner="Contando titulares...")
+def conteo_por_escala(version, filtros):
+    """Titulares por escala con los filtros aplicados, sumando el resumen por fuente, escala y día"""
+    init_connection()
+    with base_datos.conexion() as conn:
+        with conn.cursor() as cursor:
+            # Solo los titulares largos, los mismos que lista la tabla (CONDICIONES_TITULAR)
+            conteo = resumen_titulares.por_escala(cursor, solo_largos=True, **dict(filtros))
+    return pd.Series(conteo, dtype="int64")
+
+@st.cache_data(max_entries=32, show_spinner="Calculando frecuencias...")
+def palabras_por_escala(version, filtros, metodo="frecuencia"):
+    """Palabras de cada escala según `metodo`, calculadas desde el índice term_counts"""
+    init_connection()
+    with base_datos.transaccion() as cursor:
+        indice_terminos.asegurar_tabla(cursor)
+        if metodo == "frecuencia":
+            return indice_terminos.top_por_escala(cursor, limite=10, **dict(filtros))
+        return distintivos.top_por_escala(cursor, metodo, limite=10, **dict(filtros))
 
-def generar_grafico_conteo(df):
+@st.cache_data(max_entries=256, show_spinner=False)
+def pagina_titulares(version, filtros, despues_de=None, tamano=TAMANO_PAGINA, proporcion=1.0):
+    """Una página de titulares con paginación por clave (keyset) sobre `id`.
+
+    En lugar de OFFSET, cada página empieza justo después del último id de la
+    anterior, así que el coste no crece con el número de página. Devuelve el
+    DataFrame de la página y si quedan más filas.
+
+    `proporcion` es la fracción de titulares que cumple los filtros. Si no es
+    pequeña, la página recorre la clave primaria desde el id más alto: lee
+    unas `tamano / proporcion` filas y no ordena nada. Con filtros muy
+    estrechos sale más barato el índice de los filtros y ordenar lo que deja.
+    """
+    condiciones = CONDICIONES_TITULAR + (("id < %s",) if despues_de is not None else ())
+    where, params = base_datos.filtros_sql(**dict(filtros), condiciones=condiciones)
+    if despues_de is not None:
+        # El parámetro del id va antes que los de los filtros, como su condición
+        params = [int(despues_de)] + params
+    tabla = "titulares"
+    if proporcion >= PROPORCION_RECORRIDO:
+        tabla = "titulares NOT INDEXED" if base_datos.es_sqlite() else "titulares FORCE INDEX (PRIMARY)"
+    filas = consultar(f"""
+        SELECT id, fecha, fuente, escala, titular
+        FROM {tabla}{where}
+        ORDER BY id DESC
+        LIMIT {int(tamano) + 1}
+    """, params)
+    df = pd.DataFrame(filas[:tamano], columns=["id", "fecha", "fuente", "escala", "titular"])
+    return df, len(filas) > tamano
+
+def generar_grafico_conteo(conteo):
     """Genera gráfico de barras para conteo de titulares"""
-    conteo = df["escala"].value_counts().sort_index()
     fig, ax = plt.subplots(figsize=(10, 5))
     colors = [PALETA_ESCALAS.get(e, "#888") for e in conteo.index]
     sns.barplot(x=conteo.index, y=conteo.values, palette=colors, ax=ax)
@@ -99,64 +146,233 @@ def generar_grafico_conteo(df):
     ax.bar_label(ax.containers[0], label_type='edge', padding=3)
     return fig
 
-def generar_grafico_palabras(df, escala):
-    """Genera gráfico de palabras frecuentes para una escala específica"""
-    titulares_escala = df[df["escala"] == escala]["titular"].str.cat(sep=' ')
-    palabras = [p for p in limpiar_texto(titulares_escala).split() 
-               if p not in STOPWORDS and len(p) > 3]
-    
-    if not palabras:
-        return None
-    
-    conteo_palabras = Counter(palabras).most_common(10)
+@st.cache_data(max_entries=64, show_spinner=False)
+def grafico_palabras_png(version, filtros, metodo, escala, conteo_palabras):
+    """Gráfico de palabras de una escala, renderizado una vez por versión, filtros y método"""
     palabras, frecuencias = zip(*conteo_palabras)
-    
-    fig, ax = plt.subplots(figsize=(8, 3))
-    ax.barh(palabras, frecuencias, color=PALETA_ESCALAS.get(escala, "#666"))
-    ax.set_title(f"Escala {escala} - Palabras más frecuentes", pad=15)
-    ax.invert_yaxis()
-    ax.bar_label(ax.containers[0], label_type='edge', padding=3)
-    return fig
 
-# Carga de datos
-with st.spinner("📦 Cargando dataset de noticias..."):
-    df = cargar_datos()
-    if df.empty:
-        st.warning("⚠️ No se encontraron datos válidos")
-        st.stop()
+    with metricas.cronometro("render", grafico="palabras_dashboard"):
+        fig, ax = plt.subplots(figsize=(8, 3))
+        ax.barh(palabras, frecuencias, color=PALETA_ESCALAS.get(escala, "#666"))
+        titulo = "Palabras más frecuentes" if metodo == "frecuencia" else f"Palabras distintivas ({distintivos.METODOS[metodo]})"
+        ax.set_title(f"Escala {escala} - {titulo}", pad=15)
+        ax.invert_yaxis()
+        ax.bar_label(ax.containers[0], label_type='edge', padding=3,
+                     fmt="%d" if metodo == "frecuencia" else "%.2f")
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format="png", bbox_inches="tight")
+        plt.close(fig)
+    if os.getenv("NOTICIAS_METRICAS"):
+        metricas.exportar(os.getenv("NOTICIAS_METRICAS"))
+    return buffer.getvalue()
+
+@st.cache_data(max_entries=2, show_spinner="Actualizando tendencias...")
+def datos_tendencias(version):
+    """Recuentos diarios por escala; la caché en disco solo añade los días nuevos"""
+    init_connection()
+    return tendencias.actualizar_cache()
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def serie_tendencias(version, escala, frecuencia):
+    return tendencias.matriz_terminos(datos_tendencias(version), escala, frecuencia)
+
+def mostrar_tendencias(version, escalas):
+    """Pestaña de tendencias: términos emergentes y su evolución en el tiempo"""
+    col_escala, col_frecuencia, col_ventana = st.columns(3)
+    escala = col_escala.selectbox("Escala:", options=[None] + escalas,
+                                  format_func=lambda e: "Todas" if e is None else f"Escala {e}")
+    frecuencia = col_frecuencia.radio("Agregación:", options=list(tendencias.FRECUENCIAS),
+                                      format_func=tendencias.FRECUENCIAS.get, horizontal=True)
+    ventana = col_ventana.slider("Media móvil (periodos):", 1, 14 if frecuencia == "D" else 8, 1)
+
+    serie = serie_tendencias(version, escala, frecuencia)
+    if serie.matriz.shape[0] < 3:
+        st.info("Hacen falta al menos tres periodos con titulares para ver tendencias.")
+        return
+
+    col_reciente, col_base = st.columns(2)
+    maximo = serie.matriz.shape[0] - 1
+    reciente = col_reciente.slider("Periodos recientes:", 1, maximo, min(7 if frecuencia == "D" else 2, maximo))
+    base = col_base.slider("Periodos de referencia:", 1, maximo, min(28 if frecuencia == "D" else 8, maximo))
+
+    emergentes = tendencias.terminos_emergentes(serie, reciente, base)
+    st.subheader("🚀 Términos emergentes")
+    if emergentes.empty:
+        st.info("Ningún término destaca sobre su nivel habitual.")
+    else:
+        st.dataframe(emergentes, use_container_width=True, hide_index=True, column_config={
+            "term": "Término", "reciente": "Recientes", "base": "Referencia",
+            "crecimiento": "Crecimiento (x)", "puntuacion": "Puntuación",
+        })
+
+    terminos = st.multiselect("Términos a comparar:", options=list(serie.terminos),
+                              default=list(emergentes["term"][:5]))
+    if terminos:
+        relativa = tendencias.frecuencia_relativa(tendencias.ventana_movil(serie, ventana))
+        st.subheader("📈 Frecuencia por cada mil palabras")
+        st.line_chart(tendencias.series(relativa, terminos))
+
+@st.cache_data(max_entries=128, show_spinner="Buscando...")
+def resultados_busqueda(version, filtros, texto, pagina):
+    """Coincidencias por escala y una página de resultados ordenados por relevancia"""
+    init_connection()
+    with base_datos.transaccion() as cursor:
+        busqueda.asegurar_indice(cursor)
+        por_escala = busqueda.coincidencias_por_escala(cursor, texto, **dict(filtros))
+        filas, hay_mas = busqueda.buscar(cursor, texto, pagina, **dict(filtros))
+    columnas = ["id", "fecha", "fuente", "escala", "titular", "enlace", "relevancia"]
+    return pd.Series(por_escala, dtype="int64"), pd.DataFrame(filas, columns=columnas), hay_mas
+
+def mostrar_busqueda(version, filtros):
+    """Pestaña de búsqueda: palabras o "frases", con los filtros de la barra lateral"""
+    texto = st.text_input("🔎 Buscar en los titulares:", placeholder='zaporizhzhia "grain deal"')
+    if not busqueda.consulta_fts(texto):
+        st.caption('Las palabras sueltas encuentran también sus prolongaciones; las frases van entre comillas.')
+        return
+
+    if st.session_state.get("clave_busqueda") != (version, filtros, texto):
+        st.session_state["clave_busqueda"] = (version, filtros, texto)
+        st.session_state["pagina_busqueda"] = 0
+    pagina = st.session_state["pagina_busqueda"]
+    por_escala, resultados, hay_mas = resultados_busqueda(version, filtros, texto, pagina)
+
+    st.subheader(f"🔍 {int(por_escala.sum())} titulares coinciden")
+    if por_escala.empty:
+        return
+    st.bar_chart(por_escala.rename_axis("escala").rename("coincidencias"))
+    st.dataframe(
+        resultados.drop(columns="id"),
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            "fecha": "Fecha", "fuente": "Fuente", "escala": "Escala", "titular": "Titular",
+            "enlace": st.column_config.LinkColumn("Enlace"),
+            "relevancia": st.column_config.NumberColumn("Relevancia", format="%.2f"),
+        }
+    )
+    anterior, posicion, siguiente = st.columns([1, 2, 1])
+    if anterior.button("⬅️ Anterior", key="busqueda_anterior", disabled=pagina == 0):
+        st.session_state["pagina_busqueda"] -= 1
+        st.rerun()
+    posicion.caption(f"Página {pagina + 1}")
+    if siguiente.button("Siguiente ➡️", key="busqueda_siguiente", disabled=not hay_mas):
+        st.session_state["pagina_busqueda"] += 1
+        st.rerun()
+
+@st.cache_data(ttl=300, max_entries=16, show_spinner="Leyendo el archivo Parquet...")
+def conteo_archivo(filtros):
+    """Titulares por mes y escala del almacén Parquet (solo lee esas columnas)"""
+    return almacen_parquet.conteo_por(["mes", "escala"], **dict(filtros))
+
+def mostrar_archivo(filtros):
+    """Pestaña del histórico en Parquet, con los mismos filtros que la vista general"""
+    if not almacen_parquet.existe():
+        st.info("Aún no hay archivo Parquet. Se crea al scrapear o con `python almacen_parquet.py --exportar`.")
+        return
+    conteo = conteo_archivo(filtros)
+    if conteo.empty:
+        st.warning("⚠️ Ningún titular del archivo cumple los filtros")
+        return
+    st.subheader("📦 Titulares por mes y escala")
+    st.bar_chart(conteo.pivot(index="mes", columns="escala", values="titulares").fillna(0))
+
+# Filtros (se aplican en SQL; nunca se carga la tabla completa)
+version = version_datos()
+escalas, fuentes, fecha_min, fecha_max = opciones_filtros(version)
+if not escalas:
+    st.warning("⚠️ No se encontraron datos válidos")
+    st.stop()
 
-# Sidebar para filtros
 with st.sidebar:
     st.header("Filtros")
-    escalas = sorted(df["escala"].unique())
     seleccionadas = st.multiselect(
         "Selecciona escalas:",
         options=escalas,
         default=escalas
     )
-    df_filtrado = df[df["escala"].isin(seleccionadas)]
-
-# Gráfico principal
-st.subheader("📊 Distribución de titulares")
-st.pyplot(generar_grafico_conteo(df_filtrado))
-
-# Tabla de datos
-st.subheader(f"🔍 {len(df_filtrado)} titulares encontrados")
-st.dataframe(
-    df_filtrado,
-    use_container_width=True,
-    height=350,
-    column_config={
-        "escala": "Escala",
-        "titular": "Titular"
-    }
+    fuentes_sel = st.multiselect("Fuentes (vacío = todas):", options=fuentes)
+    metodo = st.radio("Ranking de palabras:", options=list(distintivos.METODOS),
+                      format_func=distintivos.METODOS.get)
+    desde = hasta = None
+    if fecha_min and fecha_max:
+        rango = st.date_input(
+            "Rango de fechas:",
+            value=(pd.Timestamp(str(fecha_min)).date(), pd.Timestamp(str(fecha_max)).date()),
+        )
+        if isinstance(rango, (tuple, list)) and len(rango) == 2:
+            desde, hasta = (d.isoformat() for d in rango)
+
+# Tupla ordenada y hashable: sirve de clave para las cachés
+filtros = (
+    ("escalas", tuple(int(e) for e in seleccionadas)),
+    ("fuentes", tuple(fuentes_sel)),
+    ("desde", desde),
+    ("hasta", hasta),
 )
+tab_general, tab_busqueda, tab_tendencias, tab_archivo = st.tabs(
+    ["📊 General", "🔎 Búsqueda", "📈 Tendencias", "📦 Archivo"])
 
-# Gráficos de palabras
-st.subheader("🔠 Análisis de palabras clave")
-for escala in seleccionadas:
-    fig = generar_grafico_palabras(df_filtrado, escala)
-    if fig:
-        st.pyplot(fig)
-    else:
-        st.warning(f"No se encontraron palabras relevantes para la escala {escala}")
\ No newline at end of file
+# Estas pestañas van primero porque la general puede cortar con st.stop()
+with tab_tendencias:
+    mostrar_tendencias(version, escalas)
+
+with tab_archivo:
+    mostrar_archivo(filtros)
+
+with tab_busqueda:
+    mostrar_busqueda(version, filtros)
+
+with tab_general:
+    if not seleccionadas:
+        st.info("Selecciona al menos una escala.")
+        st.stop()
+
+    # Gráfico principal
+    st.subheader("📊 Distribución de titulares")
+    conteo_escalas = conteo_por_escala(version, filtros)
+    if conteo_escalas.empty:
+        st.warning("⚠️ Ningún titular cumple los filtros")
+        st.stop()
+    fig = generar_grafico_conteo(conteo_escalas)
+    st.pyplot(fig)
+    plt.close(fig)
+
+    # Tabla de datos paginada; la pila guarda el último id de cada página anterior
+    if st.session_state.get("filtros_tabla") != (version, filtros):
+        st.session_state["filtros_tabla"] = (version, filtros)
+        st.session_state["paginas"] = [None]
+    paginas = st.session_state["paginas"]
+    total = int(version[0]) if version[0].isdigit() else 0  # titulares guardados (version_datos)
+    pagina, hay_mas = pagina_titulares(version, filtros, paginas[-1],
+                                       proporcion=conteo_escalas.sum() / total if total else 1.0)
+
+    st.subheader(f"🔍 {int(conteo_escalas.sum())} titulares encontrados")
+    st.dataframe(
+        pagina.drop(columns="id"),
+        use_container_width=True,
+        height=350,
+        column_config={
+            "fecha": "Fecha",
+            "fuente": "Fuente",
+            "escala": "Escala",
+            "titular": "Titular"
+        }
+    )
+    anterior, posicion, siguiente = st.columns([1, 2, 1])
+    if anterior.button("⬅️ Anterior", disabled=len(paginas) == 1):
+        paginas.pop()
+        st.rerun()
+    posicion.caption(f"Página {len(paginas)}")
+    if siguiente.button("Siguiente ➡️", disabled=not hay_mas):
+        paginas.append(int(pagina["id"].iloc[-1]))
+        st.rerun()
+
+    # Gráficos de palabras
+    st.subheader("🔠 Análisis de palabras clave")
+    palabras_escalas = palabras_por_escala(version, filtros, metodo)
+    for escala in seleccionadas:
+        conteo_palabras = palabras_escalas.get(int(escala))
+        if conteo_palabras:
+            st.image(grafico_palabras_png(version, filtros, metodo, int(escala), tuple(conteo_palabras)))
+        else:
+            st.warning(f"No se encontraron palabras relevantes para la escala {escala}")
@@ -0,0 +1,166 @@
+import asyncio
+import logging
+import random
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+
+import aiohttp
+
+import metricas
+
+# Límites del motor de descarga (pensados para cientos de feeds, no solo los 8 actuales)
+MAX_CONEXIONES = 100        # conexiones abiertas en total
+MAX_POR_HOST = 4            # conexiones simultáneas contra un mismo host
+TIMEOUT_CONEXION = 5        # segundos para establecer la conexión
+TIMEOUT_LECTURA = 15        # segundos sin recibir datos antes de abortar
+TIMEOUT_TOTAL = 30          # segundos máximos por petición
+MAX_REINTENTOS = 3
+BACKOFF_BASE = 0.5          # segundos; se dobla en cada reintento
+BACKOFF_MAX = 10
+
+ESTADOS_REINTENTABLES = frozenset({408, 425, 429, 500, 502, 503, 504})
+USER_AGENT = "proyecto-noticias/1.0 (+https://github.com/Martin-d-abloh/proyecto-noticias)"
+
+
+class ErrorDescarga(Exception):
+    """Error HTTP al descargar un feed; `reintentable` indica si merece otro intento"""
+
+    def __init__(self, url, status, reintentable, espera=None):
+        super().__init__(f"HTTP {status} en {url}")
+        self.status = status
+        self.reintentable = reintentable
+        self.espera = espera
+
+
+def segundos_retry_after(valor):
+    """Interpreta la cabecera Retry-After (segundos o fecha HTTP)"""
+    if not valor:
+        return None
+    try:
+        return max(0.0, float(valor))
+    except ValueError:
+        pass
+    try:
+        fecha = parsedate_to_datetime(valor)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (fecha - datetime.now(timezone.utc)).total_seconds())
+
+
+def espera_backoff(intento, base=BACKOFF_BASE, maximo=BACKOFF_MAX):
+    """Backoff exponencial con jitter completo (evita que todos reintenten a la vez)"""
+    return random.uniform(0, min(maximo, base * 2 ** intento))
+
+
+async def _leer_cuerpo(resp, max_bytes=None):
+    """Cuerpo de la respuesta; con `max_bytes` deja de leer al llegar a ese tamaño"""
+    if max_bytes is None:
+        return await resp.read()
+    partes, total = [], 0
+    async for parte in resp.content.iter_chunked(64 * 1024):
+        partes.append(parte)
+        total += len(parte)
+        if total >= max_bytes:
+            break
+    return b"".join(partes)[:max_bytes]
+
+
+async def descargar(session, url, cabeceras=None, reintentos=MAX_REINTENTOS, max_bytes=None):
+    """Descarga una URL con reintentos acotados.
+
+    Devuelve (status, cuerpo, cabeceras) con los nombres de cabecera en
+    minúsculas; un 304 vuelve con el cuerpo vacío. Con `max_bytes` el cuerpo
+    se corta en ese tamaño.
+    """
+    for intento in range(reintentos + 1):
+        try:
+            async with session.get(url, headers=cabeceras) as resp:
+                cabeceras_resp = {k.lower(): v for k, v in resp.headers.items()}
+                if resp.status == 304:
+                    return 304, b"", cabeceras_resp
+                if resp.status >= 400:
+                    raise ErrorDescarga(
+                        url, resp.status,
+                        reintentable=resp.status in ESTADOS_REINTENTABLES,
+                        espera=segundos_retry_after(cabeceras_resp.get("retry-after")),
+                    )
+                return resp.status, await _leer_cuerpo(resp, max_bytes), cabeceras_resp
+        except ErrorDescarga as e:
+            if not e.reintentable or intento == reintentos:
+                raise
+            espera = min(e.espera, BACKOFF_MAX) if e.espera is not None else espera_backoff(intento)
+            logging.warning(f"🔁 {e}; reintento {intento + 1}/{reintentos} en {espera:.1f}s")
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            if intento == reintentos:
+                raise
+            espera = espera_backoff(intento)
+            logging.warning(f"🔁 {type(e).__name__} en {url}; reintento {intento + 1}/{reintentos} en {espera:.1f}s")
+        await asyncio.sleep(espera)
+
+
+def cabeceras_condicionales(estado):
+    """Cabeceras If-None-Match / If-Modified-Since a partir del estado del feed"""
+    cabeceras = {}
+    if estado.get("etag"):
+        cabeceras["If-None-Match"] = estado["etag"]
+    if estado.get("modified"):
+        cabeceras["If-Modified-Since"] = estado["modified"]
+    return cabeceras
+
+
+def crear_sesion(max_conexiones=MAX_CONEXIONES, max_por_host=MAX_POR_HOST):
+    """Sesión HTTP con pool de conexiones, límites por host y timeouts"""
+    conector = aiohttp.TCPConnector(limit=max_conexiones, limit_per_host=max_por_host,
+                                    ttl_dns_cache=300)
+    timeout = aiohttp.ClientTimeout(total=TIMEOUT_TOTAL, connect=TIMEOUT_CONEXION,
+                                    sock_read=TIMEOUT_LECTURA)
+    return aiohttp.ClientSession(connector=conector, timeout=timeout,
+                                 headers={"User-Agent": USER_AGENT})
+
+
+async def leer_medio(session, pool, medio, estado, procesar, reintentos=MAX_REINTENTOS):
+    """Descarga un feed con GET condicional y lo procesa en `pool`.
+
+    Devuelve el resultado de `procesar` ([] si el servidor responde 304), o
+    None si la descarga o el procesado fallan.
+    """
+    logging.info(f"Scrapeando {medio['nombre']}...")
+    try:
+        with metricas.cronometro("descarga", medio=medio["nombre"]):
+            status, cuerpo, cabeceras = await descargar(
+                session, medio["rss"], cabeceras_condicionales(estado), reintentos)
+    except Exception as e:
+        logging.error(f"⚠️ Error al descargar {medio['nombre']}: {e}")
+        metricas.contar("errores_descarga", medio=medio["nombre"])
+        return None
+    if status == 304:
+        logging.info(f"⏭️ {medio['nombre']} sin cambios (304).")
+        metricas.contar("feeds_sin_cambios", medio=medio["nombre"])
+        return []
+    metricas.contar("bytes_descargados", len(cuerpo), medio=medio["nombre"])
+    try:
+        return await asyncio.get_running_loop().run_in_executor(
+            pool, procesar, medio, cuerpo, cabeceras, estado)
+    except Exception as e:
+        logging.error(f"⚠️ Error al procesar {medio['nombre']}: {e}")
+        metricas.contar("errores_parseo", medio=medio["nombre"])
+        return None
+
+
+async def descargar_medios(medios, estados, procesar, *,
+                           max_conexiones=MAX_CONEXIONES, max_por_host=MAX_POR_HOST,
+                           reintentos=MAX_REINTENTOS, max_workers=None):
+    """Descarga todos los feeds en paralelo y los procesa fuera del bucle de eventos.
+
+    `procesar(medio, cuerpo, cabeceras, estado)` se ejecuta en un pool de hilos
+    para que el parseo no bloquee la E/S. Devuelve una lista de resultados en el
+    mismo orden que `medios`; un feed que falla devuelve una lista vacía.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        async with crear_sesion(max_conexiones, max_por_host) as session:
+
+            async def procesar_uno(medio, estado):
+                return await leer_medio(session, pool, medio, estado, procesar, reintentos) or []
+
+            return await asyncio.gather(*(procesar_uno(m, e) for m, e in zip(medios, estados)))
@@ -0,0 +1,303 @@
+"""Detección de titulares casi duplicados con MinHash + LSH.
+
+Los teletipos (la misma pieza de Reuters publicada por otros) y los medios que
+retitulan la misma noticia inflan los recuentos por escala. Cada titular se
+reduce a su conjunto de palabras relevantes (`tokenizador`) y a una firma
+MinHash; las firmas se parten en bandas y cada banda se indexa en
+`lsh_bandas`, de modo que al insertar solo se comparan los titulares que
+comparten alguna banda (coste sublineal, sin recorrer la tabla). Cada banda
+guarda como mucho MAX_POR_CUBETA representantes, uno por historia, así que el
+coste de cada inserción no crece con el archivo.
+
+Cada titular recibe en `historias` un identificador de historia: el hash del
+primer titular de su grupo. Sirve para contar historias en lugar de titulares
+o para comparar cómo cubre cada escala la misma noticia:
+
+    SELECT t.escala, t.titular FROM titulares t
+    JOIN historias h ON h.hash_noticia = t.hash_noticia
+    WHERE h.historia = %s
+
+Las tablas se crean vacías; `python duplicados.py --reconstruir` agrupa los
+titulares ya guardados, por lotes y fuera de la transacción del scraper.
+
+Uso: python duplicados.py [--reconstruir] [--historias 10]
+"""
+import argparse
+import hashlib
+import logging
+import zlib
+from functools import lru_cache
+
+import numpy as np
+
+import base_datos
+from tokenizador import tokenizar
+
+NUM_PERMUTACIONES = 64
+BANDAS = 16                           # 16 bandas de 4 filas: umbral efectivo ~ (1/16)^(1/4) ~ 0.5
+FILAS = NUM_PERMUTACIONES // BANDAS
+UMBRAL = 0.5                          # similitud de Jaccard estimada mínima para agrupar
+TAMANO_LOTE = 5000                    # filas por lote (y por transacción) al reconstruir
+MAX_POR_CUBETA = 16                   # representantes por banda: una cubeta llena deja de crecer
+CLAVES_POR_CONSULTA = 500             # claves por cada IN (...) al buscar candidatos
+
+PRIMO = (1 << 31) - 1
+# Semilla fija: las firmas guardadas deben seguir siendo válidas en la siguiente ejecución
+_rng = np.random.default_rng(20220224)
+COEF_A = _rng.integers(1, PRIMO, NUM_PERMUTACIONES, dtype=np.uint64)
+COEF_B = _rng.integers(0, PRIMO, NUM_PERMUTACIONES, dtype=np.uint64)
+
+ESQUEMA_MYSQL = ["""
+CREATE TABLE IF NOT EXISTS historias (
+    hash_noticia CHAR(40) NOT NULL PRIMARY KEY,
+    historia CHAR(40) NOT NULL,
+    firma VARBINARY(256) NULL,
+    KEY idx_historias_historia (historia)
+)
+""", """
+CREATE TABLE IF NOT EXISTS lsh_bandas (
+    clave BIGINT NOT NULL,
+    hash_noticia CHAR(40) NOT NULL,
+    PRIMARY KEY (clave, hash_noticia)
+)
+"""]
+
+ESQUEMA_SQLITE = ["""
+CREATE TABLE IF NOT EXISTS historias (
+    hash_noticia TEXT NOT NULL PRIMARY KEY,
+    historia TEXT NOT NULL,
+    firma BLOB
+)
+""", """
+CREATE INDEX IF NOT EXISTS idx_historias_historia ON historias (historia)
+""", """
+CREATE TABLE IF NOT EXISTS lsh_bandas (
+    clave INTEGER NOT NULL,
+    hash_noticia TEXT NOT NULL,
+    PRIMARY KEY (clave, hash_noticia)
+)
+"""]
+
+
+@lru_cache(maxsize=200_000)
+def _hash_token(token):
+    return zlib.crc32(token.encode("utf-8"))
+
+
+def firma(titular):
+    """Firma MinHash (array uint32) de un titular, o None si no tiene palabras relevantes"""
+    tokens = set(tokenizar(titular))
+    if not tokens:
+        return None
+    hashes = np.fromiter((_hash_token(t) for t in tokens), dtype=np.uint64, count=len(tokens))
+    # Permutaciones (a·x + b) mod p: a < 2^31 y x < 2^32, así que no desborda uint64
+    return ((COEF_A[:, None] * hashes[None, :] + COEF_B[:, None]) % PRIMO).min(axis=1).astype(np.uint32)
+
+
+def claves_bandas(firma_titular):
+    """Una clave entera por banda; incluye el número de banda para que no se mezclen"""
+    return [
+        int.from_bytes(hashlib.blake2b(
+            bytes([banda]) + firma_titular[banda * FILAS:(banda + 1) * FILAS].tobytes(),
+            digest_size=7).digest(), "big")
+        for banda in range(BANDAS)
+    ]
+
+
+def similitud(a, b):
+    """Jaccard estimada: fracción de posiciones en que coinciden las firmas"""
+    return float(np.count_nonzero(a == b)) / NUM_PERMUTACIONES
+
+
+def asegurar_tablas(cursor):
+    """Crea `historias` y `lsh_bandas` si no existen; devuelve True si las ha creado.
+
+    No agrupa los titulares ya guardados: eso es `reconstruir()`, que trabaja
+    por lotes en sus propias transacciones y no debe ir dentro de la del scrape.
+    """
+    if base_datos.existe_tabla(cursor, "historias"):
+        return False
+    logging.info("🛠️ Creando tablas historias y lsh_bandas...")
+    for sentencia in ESQUEMA_SQLITE if base_datos.es_sqlite() else ESQUEMA_MYSQL:
+        cursor.execute(sentencia)
+    return True
+
+
+def _insertar(cursor, historias, bandas):
+    ignorar = "INSERT OR IGNORE" if base_datos.es_sqlite() else "INSERT IGNORE"
+    for i in range(0, len(historias), TAMANO_LOTE):
+        cursor.executemany(f"{ignorar} INTO historias (hash_noticia, historia, firma) VALUES (%s, %s, %s)",
+                           historias[i:i + TAMANO_LOTE])
+    for i in range(0, len(bandas), TAMANO_LOTE):
+        cursor.executemany(f"{ignorar} INTO lsh_bandas (clave, hash_noticia) VALUES (%s, %s)",
+                           bandas[i:i + TAMANO_LOTE])
+
+
+def _asignar(pendientes, cubetas):
+    """Asigna historia a cada (hash, firma, claves) de `pendientes`.
+
+    `cubetas` (clave -> [(hash, historia, firma)]) contiene los candidatos ya
+    indexados y se amplía con cada titular, así que los de un mismo lote
+    también se agrupan entre sí. Un titular se une a la historia del candidato
+    más parecido si supera UMBRAL; si no, abre una historia nueva.
+
+    Cada cubeta guarda un solo representante por historia y como mucho
+    MAX_POR_CUBETA: las bandas que comparten muchos titulares distintos (las
+    de palabras muy comunes) no discriminan, y sin tope cada inserción
+    compararía con una cubeta que crece con el archivo. Las demás bandas del
+    titular siguen encontrando sus candidatos.
+    """
+    historias, bandas = [], []
+    for hash_titular, firma_titular, claves in pendientes:
+        historia = hash_titular
+        if firma_titular is not None:
+            candidatos = {otro: (su_historia, su_firma)
+                          for clave in claves for otro, su_historia, su_firma in cubetas.get(clave, ())}
+            if candidatos:
+                su_historia, firmas = zip(*candidatos.values())
+                parecidos = np.count_nonzero(np.stack(firmas) == firma_titular, axis=1) / NUM_PERMUTACIONES
+                mejor = int(np.argmax(parecidos))
+                if parecidos[mejor] >= UMBRAL:
+                    historia = su_historia[mejor]
+            for clave in claves:
+                cubeta = cubetas.setdefault(clave, [])
+                if len(cubeta) < MAX_POR_CUBETA and all(h != historia for _, h, _ in cubeta):
+                    cubeta.append((hash_titular, historia, firma_titular))
+                    bandas.append((clave, hash_titular))
+        historias.append((hash_titular, historia,
+                          firma_titular.tobytes() if firma_titular is not None else None))
+    return historias, bandas
+
+
+def _pendientes(filas):
+    """(hash, firma, claves) para filas (hash_noticia, titular)"""
+    pendientes = []
+    for hash_titular, titular in filas:
+        firma_titular = firma(titular)
+        claves = claves_bandas(firma_titular) if firma_titular is not None else []
+        pendientes.append((hash_titular, firma_titular, claves))
+    return pendientes
+
+
+def _cubetas(cursor, claves):
+    """Titulares ya indexados que comparten alguna de las `claves`"""
+    cubetas = {}
+    claves = list(claves)
+    for i in range(0, len(claves), CLAVES_POR_CONSULTA):
+        lote = claves[i:i + CLAVES_POR_CONSULTA]
+        cursor.execute(f"""
+            SELECT b.clave, h.hash_noticia, h.historia, h.firma
+            FROM lsh_bandas b JOIN historias h ON h.hash_noticia = b.hash_noticia
+            WHERE b.clave IN ({', '.join(['%s'] * len(lote))})
+        """, lote)
+        for clave, hash_titular, historia, firma_guardada in cursor.fetchall():
+            cubetas.setdefault(clave, []).append(
+                (hash_titular, historia, np.frombuffer(bytes(firma_guardada), dtype=np.uint32)))
+    return cubetas
+
+
+def _agrupar(cursor, filas):
+    """Asigna y guarda la historia de las filas (hash_noticia, titular); devuelve las historias"""
+    pendientes = _pendientes(filas)
+    cubetas = _cubetas(cursor, {c for _, _, claves in pendientes for c in claves})
+    historias, bandas = _asignar(pendientes, cubetas)
+    _insertar(cursor, historias, bandas)
+    return historias
+
+
+def actualizar(cursor, noticias):
+    """Agrupa los titulares recién insertados (filas [fecha, fuente, escala, titular, enlace, hash]).
+
+    Devuelve cuántos se han unido a una historia ya existente.
+    """
+    historias = _agrupar(cursor, [(fila[5], fila[3]) for fila in noticias])
+    agrupados = sum(1 for hash_titular, historia, _ in historias if historia != hash_titular)
+    if agrupados:
+        logging.info(f"🧩 {agrupados} titulares agrupados con historias ya publicadas.")
+    return agrupados
+
+
+def reconstruir(tamano=TAMANO_LOTE):
+    """Recalcula las historias de todos los titulares, en orden de id.
+
+    Cada lote de `tamano` titulares va en su propia transacción y se agrupa
+    como en una inserción normal (candidatos leídos de lsh_bandas), así que
+    la memoria no crece con el archivo y el scraper puede seguir insertando
+    mientras tanto.
+    """
+    with base_datos.transaccion() as cursor:
+        asegurar_tablas(cursor)
+        cursor.execute("DELETE FROM lsh_bandas")
+        cursor.execute("DELETE FROM historias")
+    ultimo, total = 0, 0
+    while True:
+        with base_datos.transaccion(escritura=True) as cursor:
+            cursor.execute(f"""
+                SELECT id, hash_noticia, titular FROM titulares
+                WHERE id > %s AND hash_noticia IS NOT NULL
+                ORDER BY id
+                LIMIT {int(tamano)}
+            """, (ultimo,))
+            filas = cursor.fetchall()
+            if not filas:
+                break
+            ultimo = filas[-1][0]
+            total += len(_agrupar(cursor, [(h, titular) for _, h, titular in filas]))
+        if total % (tamano * 20) < len(filas):
+            logging.info(f"🧩 {total} titulares agrupados...")
+    logging.info(f"🧩 Historias reconstruidas para {total} titulares.")
+    return total
+
+
+def historias_por_escala(cursor, **filtros):
+    """Diccionario escala -> (titulares, historias distintas), con filtros de base_datos.filtros_sql"""
+    where, params = base_datos.filtros_sql(**filtros, condiciones=("escala IS NOT NULL",))
+    cursor.execute(f"""
+        SELECT escala, COUNT(*), COUNT(DISTINCT historia)
+        FROM titulares t JOIN historias h ON h.hash_noticia = t.hash_noticia{where}
+        GROUP BY escala ORDER BY escala
+    """, params)
+    return {int(e): (int(n), int(distintas)) for e, n, distintas in cursor.fetchall()}
+
+
+def historias_compartidas(cursor, limite=10):
+    """Historias cubiertas por más escalas: lista de (historia, nº escalas, [(escala, fuente, titular)])"""
+    cursor.execute(f"""
+        SELECT historia, COUNT(DISTINCT escala) AS escalas
+        FROM titulares t JOIN historias h ON h.hash_noticia = t.hash_noticia
+        GROUP BY historia
+        HAVING COUNT(DISTINCT escala) > 1
+        ORDER BY escalas DESC, COUNT(*) DESC, historia
+        LIMIT {int(limite)}
+    """)
+    resultado = []
+    for historia, escalas in cursor.fetchall():
+        cursor.execute("""
+            SELECT escala, fuente, titular
+            FROM titulares t JOIN historias h ON h.hash_noticia = t.hash_noticia
+            WHERE h.historia = %s
+            ORDER BY escala
+        """, (historia,))
+        resultado.append((historia, int(escalas), cursor.fetchall()))
+    return resultado
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Historias (titulares casi duplicados) con MinHash + LSH")
+    parser.add_argument("--reconstruir", action="store_true", help="recalcula todas las historias")
+    parser.add_argument("--historias", type=int, default=5, help="historias compartidas a mostrar")
+    args = parser.parse_args()
+
+    with base_datos.transaccion() as cursor:
+        nuevas = asegurar_tablas(cursor)
+    if nuevas or args.reconstruir:
+        reconstruir()
+    with base_datos.transaccion() as cursor:
+        print("\n🧩 Titulares e historias distintas por escala:")
+        for escala, (titulares, distintas) in historias_por_escala(cursor).items():
+            print(f"   ▫ Escala {escala}: {titulares} titulares, {distintas} historias")
+        for historia, escalas, titulares in historias_compartidas(cursor, args.historias):
+            print(f"\n📰 Historia {historia[:10]} ({escalas} escalas):")
+            for escala, fuente, titular in titulares:
+                print(f"   {escala} · {fuente}: {titular}")
@@ -0,0 +1,445 @@
+"""Entradillas de los artículos: descarga cada `enlace` guardado y extrae su resumen.
+
+Etapa opcional que completa los titulares con la entradilla del artículo
+(og:description, meta description o, en su defecto, el primer párrafo con
+texto), extraída con BeautifulSoup. El resultado va a la tabla
+`entradillas(hash_noticia, estado, entradilla, obtenida)`, que se une con
+`titulares` por hash_noticia; `palabras_por_escala` la tokeniza igual que los
+titulares (`python analisis_palabras.py --entradillas`).
+
+Las descargas usan la sesión de descarga_async (reintentos, límite de
+conexiones por host) con un máximo de descargas simultáneas y un intervalo
+mínimo entre peticiones a un mismo dominio. Cada página descargada se guarda
+comprimida en una caché en disco direccionada por contenido, con un tamaño
+máximo: volver a extraer las entradillas (`--reextraer`, p. ej. tras cambiar
+el extractor) no vuelve a descargar ninguna URL.
+
+Uso: python enriquecimiento.py [--limite 500] [--concurrencia 16] [--intervalo 1.0]
+                               [--reintentar] [--reextraer]
+"""
+import argparse
+import asyncio
+import gzip
+import hashlib
+import heapq
+import logging
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import aiohttp
+from bs4 import BeautifulSoup, SoupStrainer
+
+import base_datos
+import metricas
+from descarga_async import ESTADOS_REINTENTABLES, ErrorDescarga, crear_sesion, descargar
+from tokenizador import contar_palabras
+
+CACHE_DIR = os.environ.get("NOTICIAS_CACHE", os.path.join(os.path.dirname(__file__), "cache_articulos"))
+MAX_CACHE_MB = 512          # al superarlo se borran las páginas usadas hace más tiempo
+LIMITE = 500                # titulares por ejecución (los más recientes primero)
+MAX_DESCARGAS = 16          # descargas simultáneas en total
+MAX_POR_DOMINIO = 2         # conexiones simultáneas contra un mismo host
+TAREAS_POR_DESCARGA = 4     # tareas que leen de la cola por cada descarga simultánea
+INTERVALO_DOMINIO = 1.0     # segundos mínimos entre dos peticiones al mismo dominio
+REINTENTOS = 1              # un artículo importa menos que un feed: un solo reintento
+MAX_BYTES_PAGINA = 2 * 2 ** 20  # lo que se lee de cada página; la entradilla está al principio
+TAMANO_LOTE = 200           # entradillas por escritura en la base de datos
+MAX_CARACTERES = 1000       # longitud máxima de la entradilla guardada
+MIN_PARRAFO = 80            # caracteres mínimos para tomar un párrafo como entradilla
+SIN_RED = 0                 # estado guardado cuando la descarga falla sin respuesta HTTP
+
+# Metadatos con el resumen del artículo, por orden de preferencia
+METAS_RESUMEN = [("property", "og:description"), ("name", "description"), ("name", "twitter:description")]
+
+ESQUEMA_MYSQL = """
+CREATE TABLE IF NOT EXISTS entradillas (
+    hash_noticia CHAR(40) NOT NULL PRIMARY KEY,
+    estado SMALLINT NOT NULL,
+    entradilla TEXT NULL,
+    obtenida DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+ESQUEMA_SQLITE = """
+CREATE TABLE IF NOT EXISTS entradillas (
+    hash_noticia TEXT NOT NULL PRIMARY KEY,
+    estado INTEGER NOT NULL,
+    entradilla TEXT,
+    obtenida TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+
+class CacheArticulos:
+    """Caché en disco de páginas descargadas, direccionada por contenido.
+
+    objetos/<aa>/<sha256 del HTML>.gz guarda cada página distinta una sola vez
+    (gzip) y urls/<aa>/<sha256 de la URL> apunta al objeto de esa URL. Leer un
+    objeto actualiza su fecha de modificación; al pasar de `max_bytes` se
+    borran los objetos más antiguos hasta bajar al 90 %. Una URL cuyo objeto
+    se ha borrado cuenta como no cacheada.
+    """
+
+    def __init__(self, directorio=CACHE_DIR, max_bytes=MAX_CACHE_MB * 2 ** 20):
+        self.directorio = directorio
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._tamano = sum(tamano for _, _, tamano in self._objetos())
+
+    def _ruta(self, tipo, digest, extension=""):
+        return os.path.join(self.directorio, tipo, digest[:2], digest + extension)
+
+    def _puntero(self, url):
+        return self._ruta("urls", hashlib.sha256(url.encode("utf-8")).hexdigest())
+
+    def _objetos(self):
+        """Lista de (ruta, última lectura, bytes) de todos los objetos guardados"""
+        objetos = []
+        for raiz, _, ficheros in os.walk(os.path.join(self.directorio, "objetos")):
+            for fichero in ficheros:
+                ruta = os.path.join(raiz, fichero)
+                try:
+                    info = os.stat(ruta)
+                except FileNotFoundError:
+                    continue
+                objetos.append((ruta, info.st_mtime, info.st_size))
+        return objetos
+
+    @staticmethod
+    def _escribir(ruta, datos):
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        tmp = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as file:
+            file.write(datos)
+        os.replace(tmp, ruta)
+
+    def leer(self, url):
+        """Contenido guardado para `url`, o None si no está"""
+        try:
+            with open(self._puntero(url), encoding="ascii") as file:
+                ruta = self._ruta("objetos", file.read().strip(), ".gz")
+            with open(ruta, "rb") as file:
+                comprimido = file.read()
+            os.utime(ruta)
+        except (OSError, ValueError):
+            return None
+        return gzip.decompress(comprimido)
+
+    def guardar(self, url, contenido):
+        """Guarda `contenido` como la página de `url`; devuelve su sha256"""
+        digest = hashlib.sha256(contenido).hexdigest()
+        ruta = self._ruta("objetos", digest, ".gz")
+        if os.path.exists(ruta):
+            os.utime(ruta)
+        else:
+            comprimido = gzip.compress(contenido, compresslevel=6)
+            self._escribir(ruta, comprimido)
+            with self._lock:
+                self._tamano += len(comprimido)
+        self._escribir(self._puntero(url), digest.encode("ascii"))
+        if self._tamano > self.max_bytes:
+            self.purgar()
+        return digest
+
+    def purgar(self):
+        """Borra los objetos leídos hace más tiempo hasta quedar en el 90 % de max_bytes"""
+        with self._lock:
+            objetos = self._objetos()
+            self._tamano = sum(tamano for _, _, tamano in objetos)
+            borrados = 0
+            for ruta, _, tamano in sorted(objetos, key=lambda objeto: objeto[1]):
+                if self._tamano <= self.max_bytes * 0.9:
+                    break
+                try:
+                    os.remove(ruta)
+                except FileNotFoundError:
+                    pass
+                self._tamano -= tamano
+                borrados += 1
+        if borrados:
+            logging.info(f"🧹 Caché de artículos: {borrados} páginas borradas.")
+            metricas.contar("cache_articulos_purgadas", borrados)
+        return borrados
+
+
+class LimiteDominios:
+    """Reparte los turnos de cada dominio con al menos `intervalo` segundos entre peticiones"""
+
+    def __init__(self, intervalo=INTERVALO_DOMINIO):
+        self.intervalo = intervalo
+        self._siguiente = {}
+
+    async def esperar(self, url):
+        if self.intervalo <= 0:
+            return
+        dominio = urlsplit(url).hostname or ""
+        ahora = time.monotonic()
+        turno = max(ahora, self._siguiente.get(dominio, 0.0))
+        self._siguiente[dominio] = turno + self.intervalo
+        if turno > ahora:
+            await asyncio.sleep(turno - ahora)
+
+
+def _recortar(texto, maximo=MAX_CARACTERES):
+    texto = " ".join(texto.split())
+    return texto if len(texto) <= maximo else texto[:maximo].rsplit(" ", 1)[0] + "…"
+
+
+def extraer_entradilla(html):
+    """Resumen del artículo: su metadescripción o, si no tiene, el primer párrafo con texto.
+
+    Cada pasada analiza solo las etiquetas que le interesan (SoupStrainer), sin
+    construir el árbol de toda la página.
+    """
+    metas = BeautifulSoup(html, "html.parser", parse_only=SoupStrainer("meta"))
+    for atributo, valor in METAS_RESUMEN:
+        etiqueta = metas.find("meta", attrs={atributo: valor})
+        if etiqueta and (etiqueta.get("content") or "").strip():
+            return _recortar(etiqueta["content"])
+    for parrafo in BeautifulSoup(html, "html.parser", parse_only=SoupStrainer("p")).find_all("p"):
+        texto = parrafo.get_text(" ", strip=True)
+        if len(texto) >= MIN_PARRAFO:
+            return _recortar(texto)
+    return None
+
+
+def asegurar_tabla(cursor):
+    """Crea `entradillas` si no existe (se rellena al ejecutar la etapa, no de golpe)"""
+    if base_datos.existe_tabla(cursor, "entradillas"):
+        return False
+    logging.info("🛠️ Creando tabla entradillas...")
+    cursor.execute(ESQUEMA_SQLITE if base_datos.es_sqlite() else ESQUEMA_MYSQL)
+    return True
+
+
+def pendientes(cursor, limite=LIMITE, reintentar=False):
+    """Lista de (hash_noticia, enlace) sin entradilla, de los titulares más recientes a los más antiguos.
+
+    Con `reintentar` se incluyen también los que fallaron por un error de red
+    o un estado HTTP reintentable.
+    """
+    condicion = "e.hash_noticia IS NULL"
+    if reintentar:
+        estados = ", ".join(str(e) for e in sorted({SIN_RED, *ESTADOS_REINTENTABLES}))
+        condicion = f"({condicion} OR e.estado IN ({estados}))"
+    cursor.execute(f"""
+        SELECT t.hash_noticia, t.enlace FROM titulares t
+        LEFT JOIN entradillas e ON e.hash_noticia = t.hash_noticia
+        WHERE {condicion} AND t.hash_noticia IS NOT NULL AND t.enlace LIKE %s
+        ORDER BY t.id DESC
+        {f"LIMIT {int(limite)}" if limite else ""}
+    """, ("http%",))
+    return cursor.fetchall()
+
+
+def descargadas(cursor, limite=LIMITE):
+    """Lista de (hash_noticia, enlace) ya descargados con éxito, para volver a extraerlos"""
+    cursor.execute(f"""
+        SELECT t.hash_noticia, t.enlace FROM entradillas e
+        JOIN titulares t ON t.hash_noticia = e.hash_noticia
+        WHERE e.estado = 200
+        ORDER BY t.id DESC
+        {f"LIMIT {int(limite)}" if limite else ""}
+    """)
+    return cursor.fetchall()
+
+
+def guardar(cursor, resultados):
+    """Inserta o sustituye las entradillas [(hash_noticia, estado, entradilla), ...]"""
+    if base_datos.es_sqlite():
+        consulta = """
+            INSERT INTO entradillas (hash_noticia, estado, entradilla) VALUES (%s, %s, %s)
+            ON CONFLICT(hash_noticia) DO UPDATE SET
+                estado = excluded.estado, entradilla = excluded.entradilla, obtenida = CURRENT_TIMESTAMP
+        """
+    else:
+        consulta = """
+            INSERT INTO entradillas (hash_noticia, estado, entradilla) VALUES (%s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+                estado = VALUES(estado), entradilla = VALUES(entradilla), obtenida = CURRENT_TIMESTAMP
+        """
+    cursor.executemany(consulta, resultados)
+
+
+def _desde_cache(cache, enlace):
+    """En el pool de hilos: (está en la caché, entradilla extraída de la copia guardada)"""
+    cuerpo = cache.leer(enlace)
+    if cuerpo is None:
+        return False, None
+    with metricas.cronometro("extraccion_entradilla"):
+        return True, extraer_entradilla(cuerpo)
+
+
+def _guardar_y_extraer(cache, enlace, cuerpo):
+    """En el pool de hilos: guarda la página recién descargada y extrae su entradilla"""
+    cache.guardar(enlace, cuerpo)
+    with metricas.cronometro("extraccion_entradilla"):
+        return extraer_entradilla(cuerpo)
+
+
+async def _enriquecer(filas, cache, concurrencia, intervalo, pool):
+    """Descarga y extrae las entradillas de `filas`; guarda cada TAMANO_LOTE resultados.
+
+    Devuelve un Counter con las páginas descargadas, leídas de la caché,
+    fallidas y sin texto.
+    """
+    loop = asyncio.get_running_loop()
+    limite = LimiteDominios(intervalo)
+    descargas = asyncio.Semaphore(concurrencia)
+    resumen = Counter()
+
+    async with crear_sesion(max_conexiones=concurrencia, max_por_host=MAX_POR_DOMINIO) as session:
+
+        async def descargar_uno(hash_noticia, enlace):
+            # La caché se consulta antes de pedir turno: una URL ya descargada no espera a nadie
+            en_cache, entradilla = await loop.run_in_executor(pool, _desde_cache, cache, enlace)
+            if en_cache:
+                resumen["cache"] += 1
+                return hash_noticia, 200, entradilla
+            async with descargas:
+                # El turno del dominio se pide con la plaza ya tomada: pedido antes, los turnos
+                # vencidos mientras se esperaba plaza saldrían todos juntos al conseguirla
+                await limite.esperar(enlace)
+                try:
+                    with metricas.cronometro("descarga_articulo"):
+                        status, cuerpo, _ = await descargar(session, enlace, reintentos=REINTENTOS,
+                                                            max_bytes=MAX_BYTES_PAGINA)
+                except ErrorDescarga as e:
+                    resumen["errores"] += 1
+                    return hash_noticia, e.status, None
+                except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                    logging.warning(f"⚠️ {type(e).__name__} al descargar {enlace}")
+                    resumen["errores"] += 1
+                    return hash_noticia, SIN_RED, None
+            resumen["descargadas"] += 1
+            metricas.contar("bytes_articulos", len(cuerpo))
+            return hash_noticia, status, await loop.run_in_executor(pool, _guardar_y_extraer, cache, enlace, cuerpo)
+
+        async def uno(hash_noticia, enlace):
+            # Un fallo inesperado en un artículo no debe perder las entradillas aún sin guardar
+            try:
+                return await descargar_uno(hash_noticia, enlace)
+            except Exception:
+                logging.exception(f"💥 Error inesperado con {enlace}")
+                resumen["errores"] += 1
+                return hash_noticia, SIN_RED, None
+
+        lote = []
+
+        def apuntar(resultado):
+            nonlocal lote
+            if resultado[1] == 200 and resultado[2] is None:
+                resumen["sin_texto"] += 1
+            lote.append(resultado)
+            if len(lote) >= TAMANO_LOTE:
+                with base_datos.transaccion() as cursor:
+                    guardar(cursor, lote)
+                lote = []
+
+        async def trabajador():
+            while (fila := await cola.get()) is not None:
+                apuntar(await uno(*fila))
+
+        # Un número fijo de tareas toma las filas de una cola acotada: con --limite 0 no se crea
+        # una corrutina por titular pendiente. Hay más tareas que descargas simultáneas para que
+        # las que esperan el turno de un dominio no dejen sin trabajo a los demás dominios.
+        cola = asyncio.Queue(maxsize=concurrencia * TAREAS_POR_DESCARGA)
+        trabajadores = [asyncio.create_task(trabajador()) for _ in range(concurrencia * TAREAS_POR_DESCARGA)]
+        try:
+            for fila in filas:
+                await cola.put(fila)
+            for _ in trabajadores:
+                await cola.put(None)
+            await asyncio.gather(*trabajadores)
+        finally:
+            for tarea in trabajadores:
+                tarea.cancel()
+        if lote:
+            with base_datos.transaccion() as cursor:
+                guardar(cursor, lote)
+    return resumen
+
+
+def enriquecer(limite=LIMITE, concurrencia=MAX_DESCARGAS, intervalo=INTERVALO_DOMINIO,
+               cache=None, reintentar=False, reextraer=False):
+    """Obtiene las entradillas pendientes (o vuelve a extraer las guardadas, con `reextraer`).
+
+    Devuelve un Counter con las páginas descargadas, leídas de la caché,
+    fallidas y sin texto.
+    """
+    cache = cache or CacheArticulos()
+    with base_datos.transaccion() as cursor:
+        asegurar_tabla(cursor)
+        filas = descargadas(cursor, limite) if reextraer else pendientes(cursor, limite, reintentar)
+    if not filas:
+        logging.info("✅ No hay entradillas pendientes.")
+        return Counter()
+    logging.info(f"📄 Obteniendo {len(filas)} entradillas...")
+    with ThreadPoolExecutor(max_workers=min(concurrencia, os.cpu_count() or 1)) as pool:
+        resumen = asyncio.run(_enriquecer(filas, cache, concurrencia, intervalo, pool))
+    for clave, valor in resumen.items():
+        metricas.contar(f"entradillas_{clave}", valor)
+    return resumen
+
+
+def palabras_por_escala(cursor, limite=10, **filtros):
+    """Palabras más frecuentes de las entradillas por escala y número de entradillas de cada una.
+
+    Devuelve ({escala: [(palabra, veces), ...]}, {escala: entradillas}), como
+    analisis_palabras con titulares. Acepta los filtros de base_datos.filtros_sql.
+    """
+    where, params = base_datos.filtros_sql(**filtros, condiciones=("escala IS NOT NULL",
+                                                                   "entradilla IS NOT NULL"))
+    cursor.execute(f"""
+        SELECT escala, entradilla FROM entradillas e
+        JOIN titulares t ON t.hash_noticia = e.hash_noticia{where}
+    """, params)
+    conteos, entradillas = defaultdict(Counter), Counter()
+    while filas := cursor.fetchmany(5000):
+        por_escala = defaultdict(list)
+        for escala, texto in filas:
+            por_escala[int(escala)].append(texto)
+        for escala, textos in por_escala.items():
+            contar_palabras(textos, conteos[escala])
+            entradillas[escala] += len(textos)
+    palabras = {escala: heapq.nsmallest(limite, conteo.items(), key=lambda par: (-par[1], par[0]))
+                for escala, conteo in conteos.items()}
+    return palabras, dict(entradillas)
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Descarga los artículos y guarda su entradilla")
+    parser.add_argument("--limite", type=int, default=LIMITE,
+                        help=f"titulares por ejecución, los más recientes primero (0 = todos; por defecto {LIMITE})")
+    parser.add_argument("--concurrencia", type=int, default=MAX_DESCARGAS, help="descargas simultáneas")
+    parser.add_argument("--intervalo", type=float, default=INTERVALO_DOMINIO,
+                        help="segundos mínimos entre peticiones a un mismo dominio")
+    parser.add_argument("--cache", default=CACHE_DIR, help="directorio de la caché de páginas")
+    parser.add_argument("--cache-mb", type=int, default=MAX_CACHE_MB, help="tamaño máximo de la caché")
+    parser.add_argument("--reintentar", action="store_true",
+                        help="vuelve a intentar los artículos que fallaron por red o errores temporales")
+    parser.add_argument("--reextraer", action="store_true",
+                        help="vuelve a extraer las entradillas ya obtenidas (desde la caché)")
+    metricas.anadir_argumentos(parser)
+    args = parser.parse_args(argv)
+    metricas.iniciar(args)
+
+    try:
+        resumen = enriquecer(args.limite, args.concurrencia, args.intervalo,
+                             CacheArticulos(args.cache, args.cache_mb * 2 ** 20),
+                             args.reintentar, args.reextraer)
+    except base_datos.ERRORES as err:
+        logging.error(f"🚨 Error de base de datos: {err}")
+        raise SystemExit(1)
+    if resumen:
+        logging.info(f"✅ {resumen['descargadas']} descargadas, {resumen['cache']} desde la caché, "
+                     f"{resumen['errores']} con error, {resumen['sin_texto']} sin texto.")
+
+
+if __name__ == "__main__":
+    main()
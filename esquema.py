@@ -0,0 +1,422 @@
+"""Esquema de `titulares` con migraciones versionadas.
+
+Cada migración se aplica una sola vez y queda anotada en la tabla
+`migraciones`. La primera conexión de cada proceso (base_datos.conexion)
+aplica las pendientes, así que basta con actualizar el código. Las bases de
+datos anteriores a este módulo, sin tabla `migraciones`, pasan por todas: las
+primeras solo cambian lo que aún falte.
+
+Los índices siguen a las consultas del proyecto. Se filtra y agrupa por
+`escala`, `fuente` y rango de `fecha`, y el dashboard descarta los titulares
+cortos. Por eso hay índices compuestos `(escala, fecha, longitud)`,
+`(fuente, fecha, longitud)` y `(fecha, escala, longitud)`, y `longitud` es una
+columna calculada que se guarda con la fila, en lugar de `LENGTH(titular)` en
+cada consulta. Los recuentos por escala o por medio se resuelven solo con el
+índice.
+
+Uso: python esquema.py [--comprobar]
+"""
+import argparse
+import logging
+import re
+
+import base_datos
+from claves_noticia import hash_noticia
+
+ESPERA_BLOQUEO = 300  # segundos que un proceso espera a que otro termine de migrar (MySQL)
+TAMANO_LOTE = 5000    # filas por lote al rellenar columnas de tablas existentes
+
+TABLA_MIGRACIONES = {
+    "mysql": """
+        CREATE TABLE IF NOT EXISTS migraciones (
+            version SMALLINT UNSIGNED NOT NULL PRIMARY KEY,
+            descripcion VARCHAR(200) NOT NULL,
+            aplicada TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """,
+    "sqlite": """
+        CREATE TABLE IF NOT EXISTS migraciones (
+            version INTEGER PRIMARY KEY,
+            descripcion TEXT NOT NULL,
+            aplicada TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """,
+}
+
+TITULARES_MYSQL = """
+CREATE TABLE IF NOT EXISTS titulares (
+    id INT UNSIGNED NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    fecha DATE NULL,
+    fuente VARCHAR(100) NULL,
+    escala TINYINT NULL,
+    titular TEXT NULL,
+    enlace TEXT NULL,
+    hash_noticia CHAR(40) NULL,
+    publicado DATETIME NULL,
+    UNIQUE KEY uq_titulares_hash (hash_noticia)
+) DEFAULT CHARSET = utf8mb4
+"""
+
+TITULARES_SQLITE = """
+CREATE TABLE IF NOT EXISTS titulares (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    fecha TEXT,
+    fuente TEXT,
+    escala INTEGER,
+    titular TEXT,
+    enlace TEXT,
+    hash_noticia TEXT UNIQUE,
+    publicado TEXT
+)
+"""
+
+# Índice -> columnas; `longitud` al final para que el filtro de titulares cortos no lea la fila
+INDICES = {
+    "idx_titulares_escala_fecha": "escala, fecha, longitud",
+    "idx_titulares_fuente_fecha": "fuente, fecha, longitud",
+    "idx_titulares_fecha": "fecha, escala, longitud",
+}
+
+FUENTES_SQLITE = """
+CREATE TABLE IF NOT EXISTS fuentes (
+    id INTEGER PRIMARY KEY,
+    nombre TEXT NOT NULL UNIQUE,
+    escala INTEGER
+)
+"""
+
+# Las fuentes que ya hay en titulares, con la escala de su medio
+RELLENAR_FUENTES = """
+    INSERT INTO fuentes (nombre, escala)
+    SELECT fuente, MIN(escala) FROM titulares
+    WHERE fuente IS NOT NULL
+    GROUP BY fuente
+"""
+
+
+def _crear_titulares(cursor):
+    """Tabla titulares para las bases de datos nuevas"""
+    cursor.execute(TITULARES_SQLITE if base_datos.es_sqlite() else TITULARES_MYSQL)
+
+
+def _hash_noticia(cursor):
+    """Añade la columna `hash_noticia` con índice único si aún no existe.
+
+    Las filas antiguas se rellenan con su hash; las que chocan con otra ya
+    existente son duplicadas y se eliminan. En SQLite la tabla siempre se ha
+    creado con la columna, así que no hay nada que hacer.
+    """
+    if base_datos.es_sqlite() or base_datos.existe_columna(cursor, "titulares", "hash_noticia"):
+        return
+
+    logging.info("🛠️ Creando columna hash_noticia e índice único en titulares...")
+    cursor.execute("ALTER TABLE titulares ADD COLUMN hash_noticia CHAR(40) NULL")
+    # Por lotes de id: cada fila se actualiza por clave primaria, sin buscarla por titular y enlace
+    vistos, ultimo, duplicados = set(), 0, 0
+    while True:
+        cursor.execute(f"SELECT id, titular, enlace FROM titulares WHERE id > %s ORDER BY id LIMIT {TAMANO_LOTE}",
+                       (ultimo,))
+        filas = cursor.fetchall()
+        if not filas:
+            break
+        ultimo = filas[-1][0]
+        hashes, repetidos = [], []
+        for id_fila, titular, enlace in filas:
+            h = hash_noticia(titular, enlace)
+            if h in vistos:
+                repetidos.append(id_fila)  # se queda la fila más antigua de cada hash
+            else:
+                vistos.add(h)
+                hashes.append((h, id_fila))
+        cursor.executemany("UPDATE titulares SET hash_noticia = %s WHERE id = %s", hashes)
+        if repetidos:
+            cursor.execute(f"DELETE FROM titulares WHERE id IN ({', '.join(['%s'] * len(repetidos))})", repetidos)
+            duplicados += len(repetidos)
+    logging.info(f"🧹 {duplicados} titulares duplicados eliminados.")
+    cursor.execute("ALTER TABLE titulares ADD UNIQUE INDEX uq_titulares_hash (hash_noticia)")
+
+
+def _publicado(cursor):
+    """Añade la columna `publicado` (instante UTC) y cambia las fechas "0000-00-00" por NULL.
+
+    Las versiones anteriores guardaban "0000-00-00" cuando no entendían la
+    fecha; MySQL en modo estricto la rechaza y rompe los filtros por rango.
+    """
+    if base_datos.existe_columna(cursor, "titulares", "publicado"):
+        return
+    logging.info("🛠️ Creando columna publicado y limpiando fechas inválidas...")
+    if base_datos.es_sqlite():
+        cursor.execute("ALTER TABLE titulares ADD COLUMN publicado TEXT")
+    else:
+        # Sin NO_ZERO_DATE en esta sesión para poder tocar la columna que aún tiene ceros
+        cursor.execute("SET SESSION sql_mode = REPLACE(REPLACE(@@sql_mode, 'NO_ZERO_IN_DATE', ''), 'NO_ZERO_DATE', '')")
+        cursor.execute("ALTER TABLE titulares ADD COLUMN publicado DATETIME NULL, MODIFY fecha DATE NULL")
+    cursor.execute("UPDATE titulares SET fecha = NULL WHERE CAST(fecha AS CHAR(10)) = '0000-00-00'")
+    logging.info(f"🧹 {cursor.rowcount} titulares con fecha inválida pasan a NULL.")
+    if base_datos.existe_tabla(cursor, "term_counts"):
+        cursor.execute("DELETE FROM term_counts WHERE CAST(fecha AS CHAR(10)) = '0000-00-00'")
+
+
+def _tipos_fuentes_indices(cursor):
+    """Tipos ajustados, tabla `fuentes`, columna `longitud` e índices compuestos.
+
+    En MySQL `titulares.fuente` pasa a ser una clave ajena hacia
+    `fuentes.nombre` (renombrar un medio en `fuentes` lo renombra en todos sus
+    titulares). SQLite no permite añadir claves ajenas a una tabla existente
+    ni las comprueba por defecto: allí `fuentes` es solo el catálogo.
+    """
+    if base_datos.es_sqlite():
+        # En SQLite solo se pueden añadir columnas calculadas VIRTUAL; el índice sí guarda el valor
+        cursor.execute("ALTER TABLE titulares ADD COLUMN longitud INTEGER "
+                       "GENERATED ALWAYS AS (length(titular)) VIRTUAL")
+        for nombre, columnas in INDICES.items():
+            cursor.execute(f"CREATE INDEX {nombre} ON titulares ({columnas})")
+        cursor.execute(FUENTES_SQLITE)
+        cursor.execute(RELLENAR_FUENTES)
+        return
+
+    # Una sola reconstrucción de la tabla para todos los cambios
+    cursor.execute(f"""
+        ALTER TABLE titulares
+        MODIFY fuente VARCHAR(100) NULL,
+        MODIFY escala TINYINT NULL,
+        ADD COLUMN longitud SMALLINT UNSIGNED AS (CHAR_LENGTH(titular)) STORED,
+        {", ".join(f"ADD INDEX {nombre} ({columnas})" for nombre, columnas in INDICES.items())}
+    """)
+    # La clave ajena exige el mismo juego de caracteres y colación que titulares.fuente
+    cursor.execute("""
+        SELECT character_set_name, collation_name FROM information_schema.columns
+        WHERE table_schema = DATABASE() AND table_name = 'titulares' AND column_name = 'fuente'
+    """)
+    juego, colacion = cursor.fetchone()
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS fuentes (
+            id SMALLINT UNSIGNED NOT NULL AUTO_INCREMENT PRIMARY KEY,
+            nombre VARCHAR(100) CHARACTER SET {juego} COLLATE {colacion} NOT NULL,
+            escala TINYINT NULL,
+            UNIQUE KEY uq_fuentes_nombre (nombre)
+        )
+    """)
+    cursor.execute(RELLENAR_FUENTES)
+    cursor.execute("""
+        ALTER TABLE titulares
+        ADD CONSTRAINT fk_titulares_fuente FOREIGN KEY (fuente) REFERENCES fuentes (nombre)
+        ON UPDATE CASCADE
+    """)
+
+
+def _indice_term_counts(cursor):
+    """Índice por fecha de `term_counts` en SQLite, como el que ya tiene en MySQL.
+
+    Las tablas nuevas lo crean con indice_terminos.ESQUEMA_SQLITE; aquí se
+    añade a las que se crearon antes.
+    """
+    if base_datos.es_sqlite() and base_datos.existe_tabla(cursor, "term_counts"):
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_term_counts_fecha ON term_counts (fecha)")
+
+
+# (versión, descripción, función): nunca se modifica una ya publicada, se añade otra
+MIGRACIONES = [
+    (1, "tabla titulares", _crear_titulares),
+    (2, "hash_noticia para deduplicar", _hash_noticia),
+    (3, "columna publicado y fechas nulas", _publicado),
+    (4, "tipos, tabla fuentes, longitud e índices compuestos", _tipos_fuentes_indices),
+    (5, "índice por fecha de term_counts en SQLite", _indice_term_counts),
+]
+ULTIMA_VERSION = MIGRACIONES[-1][0]
+
+
+def version(cursor):
+    """Última migración aplicada (0 si la base de datos aún no tiene la tabla `migraciones`)"""
+    if not base_datos.existe_tabla(cursor, "migraciones"):
+        return 0
+    cursor.execute("SELECT MAX(version) FROM migraciones")
+    return cursor.fetchone()[0] or 0
+
+
+def _bloquear(cursor):
+    """Evita que dos procesos migren a la vez"""
+    if base_datos.es_sqlite():
+        cursor.execute("BEGIN IMMEDIATE")  # los demás escritores esperan al commit
+        return
+    cursor.execute("SELECT GET_LOCK('noticias_migraciones', %s)", (ESPERA_BLOQUEO,))
+    if not cursor.fetchone()[0]:
+        raise RuntimeError("⏳ Otro proceso lleva demasiado tiempo aplicando migraciones")
+
+
+def _desbloquear(cursor):
+    if not base_datos.es_sqlite():
+        cursor.execute("SELECT RELEASE_LOCK('noticias_migraciones')")
+        cursor.fetchall()
+
+
+def migrar(conn):
+    """Aplica con la conexión `conn` las migraciones pendientes; devuelve las versiones aplicadas"""
+    with conn.cursor() as cursor:
+        pendiente = version(cursor) < ULTIMA_VERSION
+        conn.commit()  # cierra la lectura: con el bloqueo puesto se vuelve a mirar la versión
+        if not pendiente:
+            return []
+
+        aplicadas = []
+        _bloquear(cursor)
+        try:
+            cursor.execute(TABLA_MIGRACIONES["sqlite" if base_datos.es_sqlite() else "mysql"])
+            actual = version(cursor)
+            for numero, descripcion, migracion in MIGRACIONES:
+                if numero <= actual:
+                    continue
+                logging.info(f"🛠️ Migración {numero}: {descripcion}...")
+                migracion(cursor)
+                cursor.execute("INSERT INTO migraciones (version, descripcion) VALUES (%s, %s)",
+                               (numero, descripcion))
+                aplicadas.append(numero)
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            _desbloquear(cursor)
+    if aplicadas:
+        logging.info(f"✅ Esquema en la versión {ULTIMA_VERSION} (aplicadas: {aplicadas}).")
+    return aplicadas
+
+
+def registrar_fuentes(cursor, fuentes):
+    """Da de alta en `fuentes` los pares (nombre, escala) que aún no estén.
+
+    Debe llamarse antes de insertar titulares de un medio nuevo: en MySQL la
+    clave ajena rechaza los que no estén dados de alta.
+    """
+    nombres = {nombre: escala for nombre, escala in fuentes if nombre is not None}
+    if not nombres:
+        return
+    cursor.execute(f"SELECT nombre FROM fuentes WHERE nombre IN ({', '.join(['%s'] * len(nombres))})",
+                   list(nombres))
+    for (nombre,) in cursor.fetchall():
+        nombres.pop(nombre, None)
+    if nombres:
+        cursor.executemany("INSERT INTO fuentes (nombre, escala) VALUES (%s, %s)", sorted(nombres.items()))
+
+
+# Consultas habituales del proyecto (con parámetros de ejemplo) que deben usar un índice
+_FILTRO_DASHBOARD = "escala IS NOT NULL AND longitud > 10"  # dashboard.CONDICIONES_TITULAR
+# Búsqueda de texto completo de busqueda.buscar: FTS5 en SQLite, FULLTEXT en MySQL
+if base_datos.es_sqlite():
+    _FTS_DESDE = "titulares_fts JOIN titulares ON titulares.id = titulares_fts.rowid WHERE titulares_fts MATCH %s"
+    _FTS_PUNTUACION, _FTS_PARAMS = "-bm25(titulares_fts)", ('"grain"* AND "deal"*',)
+else:
+    _FTS_DESDE = "titulares WHERE MATCH(titular) AGAINST (%s IN BOOLEAN MODE)"
+    _FTS_PUNTUACION, _FTS_PARAMS = "MATCH(titular) AGAINST (%s IN BOOLEAN MODE)", ("+grain* +deal*",)
+# Tablas pequeñas (unas filas por medio y día, o por medio) que se pueden recorrer enteras
+RECORRIDO_PERMITIDO = {"resumen_titulares", "fuentes"}
+CONSULTAS = {
+    "titulares por medio (analisis_basico, grafico_titulares)":
+        ("SELECT fuente, SUM(titulares) AS total FROM resumen_titulares GROUP BY fuente "
+         "ORDER BY total DESC, fuente", ()),
+    "titulares por escala (analisis_palabras)":
+        ("SELECT escala, SUM(titulares) FROM resumen_titulares WHERE escala IS NOT NULL "
+         "GROUP BY escala ORDER BY escala", ()),
+    "versión de los datos (dashboard)":
+        ("SELECT SUM(titulares), MAX(fecha) FROM resumen_titulares", ()),
+    "escalas disponibles (dashboard)":
+        ("SELECT DISTINCT escala FROM resumen_titulares WHERE escala IS NOT NULL ORDER BY escala", ()),
+    "fuentes disponibles (dashboard)":
+        ("SELECT nombre FROM fuentes ORDER BY nombre", ()),
+    "rango de fechas (dashboard)":
+        ("SELECT MIN(fecha), MAX(fecha) FROM resumen_titulares WHERE fecha IS NOT NULL", ()),
+    "conteo por escala entre fechas (dashboard)":
+        ("SELECT escala, SUM(largos) FROM resumen_titulares WHERE escala IS NOT NULL "
+         "AND fecha >= %s AND fecha <= %s GROUP BY escala ORDER BY escala", ("2025-01-01", "2025-01-31")),
+    "conteo por escala de unos medios (dashboard)":
+        ("SELECT escala, SUM(largos) FROM resumen_titulares WHERE escala IS NOT NULL "
+         "AND fuente IN (%s, %s) GROUP BY escala ORDER BY escala", ("RT", "Reuters")),
+    "página de titulares con filtros estrechos (dashboard)":
+        (f"SELECT id, fecha, fuente, escala, titular FROM titulares WHERE {_FILTRO_DASHBOARD} "
+         "AND escala IN (%s, %s) AND fecha >= %s ORDER BY id DESC LIMIT 51", (1, 2, "2025-01-01")),
+    "página siguiente con filtros amplios, por la clave primaria (dashboard)":
+        (f"SELECT id, fecha, fuente, escala, titular FROM "
+         f"{'titulares NOT INDEXED' if base_datos.es_sqlite() else 'titulares FORCE INDEX (PRIMARY)'} "
+         f"WHERE {_FILTRO_DASHBOARD} AND id < %s AND escala IN (%s, %s) AND fecha >= %s "
+         "ORDER BY id DESC LIMIT 51", (50_000, 1, 2, "2025-01-01")),
+    "palabras más frecuentes de una escala (indice_terminos, dashboard)":
+        ("SELECT term, SUM(count) AS total FROM term_counts WHERE escala IN (%s) AND fecha >= %s AND fecha <= %s "
+         "GROUP BY term ORDER BY total DESC, term LIMIT 10", (1, "2025-01-01", "2025-01-31")),
+    "matriz escalas × términos (distintivos)":
+        ("SELECT escala, term, SUM(count) FROM term_counts WHERE fecha >= %s AND fecha <= %s "
+         "GROUP BY escala, term", ("2025-01-01", "2025-01-31")),
+    "totales por día recientes (tendencias)":
+        ("SELECT fecha, SUM(count) FROM term_counts WHERE fecha >= %s GROUP BY fecha", ("2025-01-01",)),
+    "recuentos de los días cambiados (tendencias)":
+        ("SELECT escala, fecha, term, SUM(count) FROM term_counts WHERE fecha IN (%s, %s) "
+         "GROUP BY escala, fecha, term", ("2025-01-01", "2025-01-02")),
+    "búsqueda de texto (busqueda, dashboard)":
+        (f"SELECT titulares.id, fecha, fuente, escala, titulares.titular, enlace, {_FTS_PUNTUACION} AS puntuacion "
+         f"FROM {_FTS_DESDE} AND escala IN (%s, %s) ORDER BY puntuacion DESC, titulares.id DESC LIMIT 51",
+         _FTS_PARAMS * (1 if base_datos.es_sqlite() else 2) + (1, 2)),
+    "coincidencias por escala (busqueda, dashboard)":
+        (f"SELECT escala, COUNT(*) FROM {_FTS_DESDE} AND escala IN (%s, %s) GROUP BY escala ORDER BY escala",
+         _FTS_PARAMS + (1, 2)),
+    "hashes ya guardados (scraper)":
+        ("SELECT hash_noticia FROM titulares WHERE hash_noticia IN (%s, %s)", ("0" * 40, "f" * 40)),
+    "rango de ids (conteo_paralelo)":
+        ("SELECT fecha, fuente, escala, titular FROM titulares WHERE id BETWEEN %s AND %s", (1, 50_000)),
+}
+
+
+def plan(cursor, consulta, params=()):
+    """Plan de ejecución: lista de (tabla, recorre la tabla entera sin índice, detalle)"""
+    if base_datos.es_sqlite():
+        cursor.execute(f"EXPLAIN QUERY PLAN {consulta}", params)
+        filas = []
+        for *_, detalle in cursor.fetchall():
+            tabla = re.match(r"(?:SCAN|SEARCH) (\w+)", detalle)
+            filas.append((tabla.group(1) if tabla else None, bool(re.fullmatch(r"SCAN \w+", detalle)), detalle))
+        return filas
+    cursor.execute(f"EXPLAIN {consulta}", params)
+    columnas = [c[0] for c in cursor.description]
+    filas = []
+    for fila in cursor.fetchall():
+        fila = dict(zip(columnas, fila))
+        detalle = f"type={fila['type']} key={fila['key']} rows={fila['rows']} {fila.get('Extra') or ''}".strip()
+        filas.append((fila["table"], fila["type"] == "ALL", detalle))
+    return filas
+
+
+def comprobar_indices(cursor, consultas=CONSULTAS):
+    """Diccionario nombre -> (usa índices, plan) para cada consulta de `consultas`"""
+    resultado = {}
+    for nombre, (consulta, params) in consultas.items():
+        pasos = plan(cursor, consulta, params)
+        completa = any(completa and tabla not in RECORRIDO_PERMITIDO for tabla, completa, _ in pasos)
+        resultado[nombre] = (not completa, [d for _, _, d in pasos])
+    return resultado
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Migraciones del esquema de titulares")
+    parser.add_argument("--comprobar", action="store_true",
+                        help="comprueba con EXPLAIN que las consultas habituales usan un índice")
+    args = parser.parse_args()
+
+    import busqueda
+    import indice_terminos
+    import resumen_titulares
+
+    # La conexión ya aplica las migraciones pendientes
+    with base_datos.transaccion() as cursor:
+        resumen_titulares.asegurar_tabla(cursor)
+        if args.comprobar:  # las tablas que leen las consultas de CONSULTAS
+            indice_terminos.asegurar_tabla(cursor)
+            busqueda.asegurar_indice(cursor)
+        cursor.execute("SELECT version, descripcion, aplicada FROM migraciones ORDER BY version")
+        for numero, descripcion, aplicada in cursor.fetchall():
+            print(f"🗂️ {numero}. {descripcion} ({aplicada})")
+        if args.comprobar:
+            sin_indice = 0
+            for nombre, (usa_indice, pasos) in comprobar_indices(cursor).items():
+                sin_indice += not usa_indice
+                print(f"{'✅' if usa_indice else '⚠️'} {nombre}: {' | '.join(pasos)}")
+    if args.comprobar and sin_indice:
+        raise SystemExit(f"🚨 {sin_indice} consultas recorren la tabla entera")
@@ -0,0 +1,98 @@
+"""Fecha de publicación de las entradas de los feeds, siempre en UTC.
+
+feedparser ya interpreta las fechas al parsear el feed y deja
+`published_parsed` / `updated_parsed` como struct_time en UTC: es el camino
+rápido y cubre casi todas las entradas. Solo si faltan se interpreta el texto:
+primero RFC 822 (lo habitual en RSS), después ISO 8601 (Atom) y, por último,
+una lista de formatos de strptime en la que el último que ha funcionado pasa
+delante, porque cada medio repite siempre el mismo. Cada texto se interpreta
+una sola vez.
+
+Una fecha que no se puede interpretar es None (NULL en la base de datos),
+nunca "0000-00-00".
+"""
+import threading
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
+
+# Formatos vistos en feeds que no son ni RFC 822 ni ISO 8601
+FORMATOS = [
+    "%a, %d %b %Y %H:%M:%S %Z",
+    "%d %b %Y %H:%M:%S %z",
+    "%Y-%m-%d %H:%M:%S%z",
+    "%Y-%m-%d %H:%M:%S",
+    "%Y/%m/%d %H:%M:%S",
+    "%d/%m/%Y %H:%M",
+    "%B %d, %Y %H:%M",
+    "%B %d, %Y",
+    "%d.%m.%Y %H:%M",
+]
+ANIO_MINIMO = 1990  # nada anterior es una fecha de publicación real de estos feeds
+
+_formatos_lock = threading.Lock()  # los feeds se parsean en varios hilos
+
+
+def _utc(fecha):
+    """datetime con zona horaria UTC (las fechas sin zona se toman como UTC)"""
+    if fecha.tzinfo is None:
+        return fecha.replace(tzinfo=timezone.utc)
+    return fecha.astimezone(timezone.utc)
+
+
+def _valida(fecha):
+    return fecha if fecha is not None and fecha.year >= ANIO_MINIMO else None
+
+
+def _con_formatos(texto):
+    for formato in list(FORMATOS):
+        try:
+            fecha = datetime.strptime(texto, formato)
+        except ValueError:
+            continue
+        with _formatos_lock:
+            if FORMATOS[0] != formato:
+                FORMATOS.remove(formato)
+                FORMATOS.insert(0, formato)
+        return fecha
+    return None
+
+
+@lru_cache(maxsize=4096)
+def interpretar(texto):
+    """datetime UTC a partir del texto de una fecha, o None si no se entiende"""
+    texto = (texto or "").strip()
+    if not texto:
+        return None
+    try:
+        return _valida(_utc(parsedate_to_datetime(texto)))
+    except (TypeError, ValueError, IndexError):
+        pass
+    try:
+        return _valida(_utc(datetime.fromisoformat(texto.replace("Z", "+00:00"))))
+    except ValueError:
+        pass
+    fecha = _con_formatos(texto)
+    return _valida(_utc(fecha)) if fecha is not None else None
+
+
+def de_entrada(entry):
+    """Fecha de publicación (datetime UTC) de una entrada de feedparser, o None"""
+    for clave in ("published_parsed", "updated_parsed"):
+        partes = entry.get(clave)
+        if partes:
+            try:
+                return _valida(datetime(*partes[:6], tzinfo=timezone.utc))
+            except (TypeError, ValueError):
+                pass
+    return interpretar(entry.get("published") or entry.get("updated"))
+
+
+def dia(fecha):
+    """"AAAA-MM-DD" (día UTC) para la columna `fecha`, o None"""
+    return fecha.date().isoformat() if fecha is not None else None
+
+
+def instante(fecha):
+    """"AAAA-MM-DD HH:MM:SS" en UTC para la columna `publicado`, o None"""
+    return fecha.strftime("%Y-%m-%d %H:%M:%S") if fecha is not None else None
@@ -1,14 +1,16 @@
-import mysql.connector
 import matplotlib.pyplot as plt
-from collections import Counter
-from getpass import getpass
-import re
 import os
+import time
+import argparse
+import heapq
 import logging
+from collections import Counter, defaultdict
 from matplotlib.ticker import MaxNLocator
-
-# Configurar logging
-logging.basicConfig(level=logging.INFO)
+import base_datos  # Conexión compartida (MySQL con pool o SQLite)
+import indice_terminos  # Frecuencias precalculadas en term_counts
+import distintivos  # Ranking de términos característicos (log-odds / TF-IDF)
+import metricas  # Tiempos de consulta, tokenización y renderizado
+from tokenizador import contar_palabras
 
 # Paleta de colores por escala numérica (1 a 8)
 PALETA_COLORES = {
@@ -22,63 +24,47 @@ PALETA_COLORES = {
     8: '#004529'    # Super anti-Rusia
 }
 
-# Stopwords en inglés con contracciones comunes
-STOPWORDS = frozenset({
-    "the", "and", "of", "in", "to", "a", "on", "for", "with", "at",
-    "from", "by", "an", "is", "as", "it", "that", "this", "was", "be",
-    "are", "but", "or", "have", "has", "had", "their", "its", "they",
-    "them", "his", "her", "he", "she", "we", "you", "i", "who", "what",
-    "which", "will", "can", "all", "not", "been", "were", "also", "more",
-    "after", "one", "new", "about", "would", "could", "just", "into",
-    "over", "than", "when", "out", "up", "no", "so", "if", "do", "did",
-    "may", "me", "us", "our", "because", "it's", "they're", "we're", 
-    "that's", "don't", "isn't", "you're", "i'm", "he's", "she's"
-})
-
-def limpiar_texto(texto):
-    """Limpieza optimizada para texto en inglés con manejo de contracciones"""
-    texto = re.sub(r"[^a-zA-Z\s']", '', texto.lower())
-    return re.sub(r"\s+", ' ', texto).strip()
-
-def obtener_datos(conexion):
-    """Obtiene y agrupa textos por escala ideológica"""
+TAMANO_LOTE = 5000  # titulares por lote en el modo directo
+
+def nombre_archivo(ranking="frecuencia"):
+    return "grafico_palabras_escala.png" if ranking == "frecuencia" else f"grafico_palabras_escala_{ranking}.png"
+
+def obtener_datos(ranking="frecuencia"):
+    """Palabras de cada escala según `ranking`, leídas del índice term_counts"""
+    with base_datos.transaccion() as cursor:
+        indice_terminos.asegurar_tabla(cursor)
+        if ranking == "frecuencia":
+            return indice_terminos.top_por_escala(cursor, limite=10)
+        return distintivos.top_por_escala(cursor, ranking, limite=10)
+
+def contar_directo(tamano_lote=TAMANO_LOTE, ranking="frecuencia"):
+    """Cuenta las palabras por escala leyendo `titulares` en lotes.
+
+    Los titulares llegan por un cursor sin buffer y se van sumando a un Counter
+    por escala, así que la memoria depende del vocabulario y no del número de
+    filas (y no hay límite de group_concat_max_len que trunque el texto).
+    """
+    conteos = defaultdict(Counter)
     query = """
-        SELECT escala, GROUP_CONCAT(titular SEPARATOR ' ') AS textos
-        FROM titulares 
+        SELECT escala, titular
+        FROM titulares
         WHERE escala IS NOT NULL AND titular IS NOT NULL
-        GROUP BY escala
     """
-    with conexion.cursor(dictionary=True) as cursor:
-        cursor.execute(query)
-        return cursor.fetchall()
-
-def procesar_textos(texto):
-    """Procesamiento eficiente para inglés con filtro de longitud"""
-    palabras = (p for p in limpiar_texto(texto).split() 
-                if p not in STOPWORDS and len(p) > 3)
-    return Counter(palabras)
-
-try:
-    # Configuración de conexión
-    DB_CONFIG = {
-        "host": "localhost",
-        "user": "root",
-        "database": "proyecto_noticias",
-        "charset": "utf8mb4",
-        "password": getpass("🔐 Enter MySQL password: ")
-    }
-
-    with mysql.connector.connect(**DB_CONFIG) as conexion:
-        datos = obtener_datos(conexion)
-        
-    if not datos:
-        raise ValueError("⚠️ No data found to generate the chart")
-
-    # Procesar datos
-    conteos = {}
-    for grupo in datos:
-        escala = int(grupo['escala'])
-        conteos[escala] = procesar_textos(grupo['textos'])
+    for filas in base_datos.iterar_lotes(query, tamano=tamano_lote):
+        por_escala = defaultdict(list)
+        for escala, titular in filas:
+            por_escala[int(escala)].append(titular)
+        for escala, titulares in por_escala.items():
+            contar_palabras(titulares, conteos[escala])
+    if ranking != "frecuencia":
+        return distintivos.top_distintivos(distintivos.matriz_desde_conteos(conteos), ranking, limite=10)
+    # Mismo desempate que el índice: más frecuentes primero y, a igualdad, por orden alfabético
+    return {escala: heapq.nsmallest(10, conteo.items(), key=lambda par: (-par[1], par[0]))
+            for escala, conteo in conteos.items()}
+
+def dibujar(conteos, ranking="frecuencia"):
+    """Figura con un panel de barras por escala (escala -> [(palabra, valor)])"""
+    es_frecuencia = ranking == "frecuencia"
 
     # Configurar visualización
     num_escalas = len(conteos)
@@ -97,7 +83,7 @@ try:
         color = PALETA_COLORES.get(escala, '#333333')
         
         try:
-            palabras, frecuencias = zip(*conteos[escala].most_common(10))
+            palabras, frecuencias = zip(*conteos[escala])
         except ValueError:
             logging.warning(f"Not enough words for escala {escala}")
             continue
@@ -112,14 +98,15 @@ try:
             width = bar.get_width()
             ax.text(width + max_freq * 0.02,
                     bar.get_y() + bar.get_height()/2,
-                    f'{width:,}',
+                    f'{width:,}' if es_frecuencia else f'{width:.2f}',
                     va='center',
                     ha='left',
                     fontsize=9)
 
         # Configuración estética
         ax.set_title(f"Escala {escala}", fontsize=12, pad=15, loc='left')
-        ax.xaxis.set_major_locator(MaxNLocator(integer=True))
+        if es_frecuencia:
+            ax.xaxis.set_major_locator(MaxNLocator(integer=True))
         ax.spines['top'].set_visible(False)
         ax.spines['right'].set_visible(False)
         ax.grid(axis='x', alpha=0.3)
@@ -129,25 +116,51 @@ try:
             ax.set_xticklabels([])
             ax.set_xlabel('')
         else:
-            ax.set_xlabel("Frecuencia de palabras", labelpad=10)
-
-    # Título general y guardado
-    plt.suptitle("Palabras más frecuentes por escala ideológica\n", 
-                fontsize=14, y=0.98, fontweight='bold')
-    
-    # Guardado en carpeta del proyecto
-    output_path = os.path.join(os.path.dirname(__file__), "grafico_palabras_escala.png")
-    plt.savefig(output_path, dpi=300, bbox_inches='tight')
-    logging.info(f"✅ Gráfico guardado en: {output_path}")
-    plt.close()
-
-except mysql.connector.Error as err:
-    logging.error(f"🚨 Error de MySQL: {err}")
-except ValueError as ve:
-    logging.error(ve)
-except Exception as e:
-    logging.error(f"⚠️ Error inesperado: {str(e)}", exc_info=True)
-finally:
-    if 'conexion' in locals() and conexion.is_connected():
-        conexion.close()
-        logging.info("🔒 Conexión cerrada")
+            ax.set_xlabel("Frecuencia de palabras" if es_frecuencia else distintivos.METODOS[ranking], labelpad=10)
+
+    # Título general
+    titulo = "Palabras más frecuentes" if es_frecuencia else "Palabras distintivas"
+    fig.suptitle(f"{titulo} por escala ideológica\n", 
+                 fontsize=14, y=0.98, fontweight='bold')
+    return fig
+
+def main(argv=None):
+    # Configurar logging
+    logging.basicConfig(level=logging.INFO)
+    plt.switch_backend("Agg")  # solo guarda el PNG: no hace falta pantalla
+
+    args_parser = argparse.ArgumentParser(description="Gráfico de palabras más frecuentes por escala")
+    args_parser.add_argument("--directo", action="store_true",
+                             help="cuenta desde titulares en streaming en lugar de usar term_counts")
+    args_parser.add_argument("--ranking", choices=list(distintivos.METODOS), default="frecuencia",
+                             help="orden de las palabras: frecuencia bruta o términos distintivos")
+    args_parser.add_argument("--salida", help="fichero PNG de salida (por defecto, junto al script)")
+    metricas.anadir_argumentos(args_parser)
+    args = args_parser.parse_args(argv)
+    metricas.iniciar(args)
+
+    try:
+        conteos = contar_directo(ranking=args.ranking) if args.directo else obtener_datos(args.ranking)
+
+        if not conteos:
+            raise ValueError("⚠️ No data found to generate the chart")
+
+        inicio_render = time.perf_counter()
+        fig = dibujar(conteos, args.ranking)
+
+        # Guardado en carpeta del proyecto
+        output_path = args.salida or os.path.join(os.path.dirname(__file__), nombre_archivo(args.ranking))
+        fig.savefig(output_path, dpi=300, bbox_inches='tight')
+        metricas.observar("render", time.perf_counter() - inicio_render, grafico="palabras_escala")
+        logging.info(f"✅ Gráfico guardado en: {output_path}")
+        plt.close(fig)
+
+    except base_datos.ERRORES as err:
+        logging.error(f"🚨 Error de base de datos: {err}")
+    except ValueError as ve:
+        logging.error(ve)
+    except Exception as e:
+        logging.error(f"⚠️ Error inesperado: {str(e)}", exc_info=True)
+
+if __name__ == "__main__":
+    main()
@@ -1,97 +1,105 @@
-import mysql.connector
+import argparse
+import os
+import time
 import matplotlib.pyplot as plt
-from getpass import getpass
-import textwrap  # Para mejor formato de texto
+import base_datos  # Conexión compartida (MySQL con pool o SQLite)
+import metricas  # Tiempo de renderizado
+import resumen_titulares  # Recuentos precalculados por fuente, escala y día
 
-# Configuración de la base de datos (mejor manejo de credenciales)
-DB_CONFIG = {
-    "host": "localhost",
-    "user": "root",
-    "database": "proyecto_noticias",
-    "charset": "utf8mb4",
-    "password": getpass("🔐 Ingresa tu contraseña de MySQL: ")
-}
+NOMBRE_ARCHIVO = "grafico_titulares.png"
 
-try:
-    # Conexión y consulta mejor estructurada
-    with mysql.connector.connect(**DB_CONFIG) as conexion:
-        consulta = textwrap.dedent("""
-            SELECT 
-                fuente, 
-                COUNT(*) as cantidad
-            FROM titulares
-            GROUP BY fuente
-            ORDER BY cantidad DESC;
-        """)
-        
-        with conexion.cursor(dictionary=True) as cursor:  # Usar diccionarios para mayor claridad
-            cursor.execute(consulta)
-            datos = cursor.fetchall()
+def obtener_datos(cursor):
+    """Lista de (fuente, cantidad) ordenada de más a menos titulares"""
+    # Del resumen precalculado (se crea la primera vez), sin recorrer toda la tabla titulares
+    resumen_titulares.asegurar_tabla(cursor)
+    return resumen_titulares.por_fuente(cursor)
 
-    # Verificar si hay datos antes de procesar
-    if not datos:
-        raise ValueError("⚠️ No se encontraron registros en la base de datos")
-    
+def dibujar(datos):
+    """Figura de barras horizontales con los titulares de cada medio"""
     # Separar datos con nombres más descriptivos
-    medios = [registro['fuente'] for registro in datos]
-    cantidades = [registro['cantidad'] for registro in datos]
+    medios = [fuente for fuente, _ in datos]
+    cantidades = [cantidad for _, cantidad in datos]
 
-    # Configuración del gráfico mejorada
-    plt.style.use('ggplot')  # Estilo profesional
-    fig, ax = plt.subplots(figsize=(12, 7))
-    
-    # Crear gráfico con colores y formato mejorado
-    barras = ax.barh(
-        medios, 
-        cantidades, 
-        color='#2c5c8a', 
-        edgecolor='black',
-        height=0.8
-    )
-    
-    # Añadir etiquetas de datos
-    for barra in barras:
-        width = barra.get_width()
-        ax.text(
-            width + (max(cantidades) * 0.01),  # Offset para mejor legibilidad
-            barra.get_y() + barra.get_height()/2,
-            f'{width:,}',  # Formato con separadores de miles
-            va='center',
-            ha='left',
-            fontsize=9
+    # Configuración del gráfico mejorada (estilo profesional solo para esta figura)
+    with plt.style.context('ggplot'):
+        fig, ax = plt.subplots(figsize=(12, 7))
+
+        # Crear gráfico con colores y formato mejorado
+        barras = ax.barh(
+            medios,
+            cantidades,
+            color='#2c5c8a',
+            edgecolor='black',
+            height=0.8
         )
 
-    # Configuración de ejes y títulos
-    ax.set_xlabel("Cantidad de titulares", fontsize=12, labelpad=15)
-    ax.set_ylabel("Medios de comunicación", fontsize=12, labelpad=15)
-    ax.set_title(
-        "Distribución de titulares por medio de comunicación\n",
-        fontsize=14,
-        fontweight='bold',
-        pad=20
-    )
-    
-    # Mejores márgenes y orden
-    ax.invert_yaxis()  # Mayor cantidad arriba
-    plt.xlim(0, max(cantidades) * 1.15)  # Espacio para las etiquetas
-    plt.tight_layout()
-    
-    # Opciones de guardado/mostrado
-    guardar = input("¿Deseas guardar el gráfico? (s/n): ").lower()
-    if guardar == 's':
-        nombre_archivo = input("Nombre del archivo (sin extensión): ")
-        plt.savefig(f"{nombre_archivo}.png", dpi=300, bbox_inches='tight')
-        print(f"✅ Gráfico guardado como {nombre_archivo}.png")
-    else:
-        plt.show()
+        # Añadir etiquetas de datos
+        for barra in barras:
+            width = barra.get_width()
+            ax.text(
+                width + (max(cantidades) * 0.01),  # Offset para mejor legibilidad
+                barra.get_y() + barra.get_height()/2,
+                f'{width:,}',  # Formato con separadores de miles
+                va='center',
+                ha='left',
+                fontsize=9
+            )
+
+        # Configuración de ejes y títulos
+        ax.set_xlabel("Cantidad de titulares", fontsize=12, labelpad=15)
+        ax.set_ylabel("Medios de comunicación", fontsize=12, labelpad=15)
+        ax.set_title(
+            "Distribución de titulares por medio de comunicación\n",
+            fontsize=14,
+            fontweight='bold',
+            pad=20
+        )
+
+        # Mejores márgenes y orden
+        ax.invert_yaxis()  # Mayor cantidad arriba
+        ax.set_xlim(0, max(cantidades) * 1.15)  # Espacio para las etiquetas
+        fig.tight_layout()
+    return fig
+
+def main(argv=None):
+    args_parser = argparse.ArgumentParser(description="Gráfico de titulares por medio de comunicación")
+    args_parser.add_argument("--salida", default=os.path.join(os.path.dirname(__file__), NOMBRE_ARCHIVO),
+                             help=f"fichero PNG de salida (por defecto {NOMBRE_ARCHIVO} junto al script)")
+    args_parser.add_argument("--mostrar", action="store_true",
+                             help="abre el gráfico en una ventana en lugar de guardarlo")
+    metricas.anadir_argumentos(args_parser)
+    args = args_parser.parse_args(argv)
+    metricas.iniciar(args)
+    if not args.mostrar:
+        plt.switch_backend("Agg")  # sin ventana: funciona en cron y sin pantalla
+
+    try:
+        # La conexión vuelve al pool automáticamente al salir del with
+        with base_datos.transaccion() as cursor:
+            datos = obtener_datos(cursor)
+
+        # Verificar si hay datos antes de procesar
+        if not datos:
+            raise ValueError("⚠️ No se encontraron registros en la base de datos")
+
+        inicio_render = time.perf_counter()
+        fig = dibujar(datos)
+        metricas.observar("render", time.perf_counter() - inicio_render, grafico="titulares")
+
+        # Opciones de guardado/mostrado
+        if args.mostrar:
+            plt.show()
+        else:
+            fig.savefig(args.salida, dpi=300, bbox_inches='tight')
+            print(f"✅ Gráfico guardado como {args.salida}")
+        plt.close(fig)
+
+    except base_datos.ERRORES as err:
+        print(f"🚨 Error de base de datos: {err}")
+    except ValueError as ve:
+        print(ve)
+    except Exception as e:
+        print(f"🚨 Error inesperado: {str(e)}")
 
-except mysql.connector.Error as err:
-    print(f"🚨 Error de MySQL: {err}")
-except ValueError as ve:
-    print(ve)
-except Exception as e:
-    print(f"🚨 Error inesperado: {str(e)}")
-finally:
-    if 'conexion' in locals() and conexion.is_connected():
-        conexion.close()
-        print("🔒 Conexión a BD cerrada")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
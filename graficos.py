@@ -0,0 +1,214 @@
+"""Genera todos los gráficos de una vez, sin pantalla ni preguntas (apto para cron).
+
+Los datos se leen una sola vez (titulares por medio, palabras por escala con
+cada ranking y tendencias) y cada gráfico se dibuja con el backend Agg en un
+pool de procesos. Antes de dibujar se calcula un hash del contenido: los datos
+del gráfico más el código que lo dibuja. Si coincide con el de la ejecución
+anterior y el PNG sigue ahí, el gráfico no se vuelve a dibujar.
+
+Uso: python graficos.py [--salida graficos/] [--procesos 4] [--forzar]
+"""
+import argparse
+import hashlib
+import importlib
+import inspect
+import json
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import base_datos
+import distintivos
+import indice_terminos
+import metricas
+import tendencias
+
+SALIDA = os.path.join(os.path.dirname(__file__), "graficos")
+MANIFIESTO = "hashes.json"     # nombre -> hash de los gráficos ya generados en SALIDA
+DPI = 200
+LIMITE_PALABRAS = 10
+TERMINOS_TENDENCIA = 4         # términos emergentes por escala en el gráfico de tendencias
+SEMANAS_TENDENCIA = 26         # semanas que se muestran
+SEMANAS_RECIENTES = 2          # ventana reciente para elegir los términos emergentes
+SEMANAS_BASE = 12              # ventana de referencia
+
+# Gráfico -> (módulo y función que lo dibujan); la función recibe los datos y devuelve una figura
+GRAFICOS = {
+    "titulares_por_medio": ("grafico_titulares", "dibujar"),
+    **{f"palabras_{ranking}": ("grafico_palabras_escala", "dibujar") for ranking in distintivos.METODOS},
+    "tendencias": ("graficos", "dibujar_tendencias"),
+}
+
+
+def dibujar_tendencias(series_por_escala):
+    """Frecuencia semanal (por mil palabras) de los términos emergentes de cada escala"""
+    import matplotlib.pyplot as plt
+
+    escalas = sorted(series_por_escala)
+    fig, axs = plt.subplots(len(escalas), 1, figsize=(12, 2.6 * len(escalas)), sharex=True, squeeze=False)
+    for ax, escala in zip(axs[:, 0], escalas):
+        datos = series_por_escala[escala]
+        for term, valores in datos["series"].items():
+            ax.plot(datos["fechas"], valores, label=term, linewidth=1.6)
+        ax.set_title(f"Escala {escala}", fontsize=11, loc="left")
+        ax.set_ylabel("‰ palabras")
+        ax.grid(alpha=0.3)
+        if datos["series"]:
+            ax.legend(loc="upper left", fontsize=8, ncol=len(datos["series"]), frameon=False)
+    fig.autofmt_xdate()
+    fig.suptitle("Términos emergentes por escala (frecuencia semanal)", fontsize=14, fontweight="bold")
+    fig.tight_layout()
+    return fig
+
+
+def datos_tendencias():
+    """Por escala: fechas y serie semanal de sus términos emergentes (solo tipos básicos)"""
+    datos = tendencias.actualizar_cache()
+    if datos.empty:
+        return {}
+    resultado = {}
+    for escala in sorted(int(e) for e in datos["escala"].unique()):
+        serie = tendencias.matriz_terminos(datos, escala, "W")
+        emergentes = tendencias.terminos_emergentes(serie, SEMANAS_RECIENTES, SEMANAS_BASE,
+                                                    limite=TERMINOS_TENDENCIA)
+        if serie.matriz.shape[0] < 3 or emergentes.empty:
+            continue
+        tabla = tendencias.series(tendencias.frecuencia_relativa(serie), emergentes["term"]).tail(SEMANAS_TENDENCIA)
+        resultado[escala] = {
+            "fechas": [f.date().isoformat() for f in tabla.index],
+            "series": {term: [round(float(v), 4) for v in tabla[term]] for term in tabla.columns},
+        }
+    return resultado
+
+
+def cargar_datos():
+    """Datos de todos los gráficos con una sola lectura de cada fuente"""
+    import grafico_titulares
+
+    with base_datos.transaccion() as cursor:
+        indice_terminos.asegurar_tabla(cursor)
+        por_medio = grafico_titulares.obtener_datos(cursor)
+        # Una sola matriz escalas × términos sirve para los tres rankings
+        matriz = distintivos.matriz_escalas(cursor)
+    datos = {"titulares_por_medio": ((por_medio,), {})}
+    for ranking in distintivos.METODOS:
+        minimo = 1 if ranking == "frecuencia" else distintivos.MINIMO
+        palabras = distintivos.top_distintivos(matriz, ranking, LIMITE_PALABRAS, minimo)
+        datos[f"palabras_{ranking}"] = ((palabras,), {"ranking": ranking})
+    datos["tendencias"] = ((datos_tendencias(),), {})
+    # Sin datos no hay gráfico que dibujar
+    return {nombre: d for nombre, d in datos.items() if d[0][0]}
+
+
+def _codigo(modulo, funcion):
+    return inspect.getsource(getattr(importlib.import_module(modulo), funcion))
+
+
+def huella(nombre, datos):
+    """Hash del contenido de un gráfico: sus datos, el código que lo dibuja y la resolución"""
+    modulo, funcion = GRAFICOS[nombre]
+    contenido = json.dumps([nombre, datos, _codigo(modulo, funcion), DPI], sort_keys=True, default=str)
+    return hashlib.sha256(contenido.encode("utf-8")).hexdigest()
+
+
+def _inicializar():
+    import matplotlib
+    matplotlib.use("Agg")
+
+
+def renderizar(nombre, datos, ruta, dpi=DPI):
+    """Dibuja un gráfico y lo guarda de forma atómica; devuelve los segundos empleados"""
+    import matplotlib.pyplot as plt
+
+    inicio = time.perf_counter()
+    modulo, funcion = GRAFICOS[nombre]
+    args, kwargs = datos
+    fig = getattr(importlib.import_module(modulo), funcion)(*args, **kwargs)
+    tmp = f"{ruta}.{os.getpid()}.tmp"
+    fig.savefig(tmp, dpi=dpi, bbox_inches="tight", format="png")
+    plt.close(fig)
+    os.replace(tmp, ruta)
+    return time.perf_counter() - inicio
+
+
+def _leer_manifiesto(salida):
+    try:
+        with open(os.path.join(salida, MANIFIESTO), encoding="utf-8") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def _guardar_manifiesto(salida, manifiesto):
+    ruta = os.path.join(salida, MANIFIESTO)
+    with open(f"{ruta}.tmp", "w", encoding="utf-8") as file:
+        json.dump(manifiesto, file, indent=2, sort_keys=True)
+    os.replace(f"{ruta}.tmp", ruta)
+
+
+def generar(salida=SALIDA, procesos=None, forzar=False):
+    """Genera los gráficos cuyo contenido ha cambiado; devuelve (generados, sin cambios)"""
+    os.makedirs(salida, exist_ok=True)
+    with metricas.cronometro("carga_graficos"):
+        datos = cargar_datos()
+    manifiesto = _leer_manifiesto(salida)
+
+    pendientes = {}
+    for nombre, datos_grafico in datos.items():
+        ruta = os.path.join(salida, f"{nombre}.png")
+        hash_grafico = huella(nombre, datos_grafico)
+        if not forzar and manifiesto.get(nombre) == hash_grafico and os.path.exists(ruta):
+            logging.info(f"⏭️ {nombre}: sin cambios.")
+            continue
+        pendientes[nombre] = (datos_grafico, ruta, hash_grafico)
+
+    procesos = min(procesos or os.cpu_count() or 1, len(pendientes))
+    if procesos <= 1:
+        _inicializar()
+        for nombre, (datos_grafico, ruta, hash_grafico) in pendientes.items():
+            metricas.observar("render", renderizar(nombre, datos_grafico, ruta), grafico=nombre)
+            manifiesto[nombre] = hash_grafico
+            logging.info(f"🖼️ {nombre}: {ruta}")
+    else:
+        # "spawn": procesos limpios, sin el pool de conexiones ni el estado de matplotlib del padre
+        with ProcessPoolExecutor(max_workers=procesos, mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=_inicializar) as pool:
+            futuros = {pool.submit(renderizar, nombre, datos_grafico, ruta): nombre
+                       for nombre, (datos_grafico, ruta, _) in pendientes.items()}
+            for futuro in as_completed(futuros):
+                nombre = futuros[futuro]
+                try:
+                    metricas.observar("render", futuro.result(), grafico=nombre)
+                except Exception as e:
+                    logging.error(f"⚠️ No se pudo generar {nombre}: {e}")
+                    continue
+                manifiesto[nombre] = pendientes[nombre][2]
+                logging.info(f"🖼️ {nombre}: {pendientes[nombre][1]}")
+
+    _guardar_manifiesto(salida, manifiesto)
+    return len(pendientes), len(datos) - len(pendientes)
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Genera todos los gráficos en lote (sin pantalla)")
+    parser.add_argument("--salida", default=SALIDA, help="directorio de los PNG (por defecto graficos/)")
+    parser.add_argument("--procesos", type=int, help="procesos para dibujar (por defecto, uno por CPU)")
+    parser.add_argument("--forzar", action="store_true", help="vuelve a dibujar aunque nada haya cambiado")
+    metricas.anadir_argumentos(parser)
+    args = parser.parse_args(argv)
+    metricas.iniciar(args)
+
+    try:
+        generados, sin_cambios = generar(args.salida, args.procesos, args.forzar)
+    except base_datos.ERRORES as err:
+        logging.error(f"🚨 Error de base de datos: {err}")
+        raise SystemExit(1)
+    logging.info(f"✅ {generados} gráficos generados, {sin_cambios} sin cambios, en {args.salida}")
+
+
+# Los procesos hijos importan este módulo: solo se ejecuta como script
+if __name__ == "__main__":
+    main()
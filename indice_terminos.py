@@ -0,0 +1,149 @@
+"""Índice precalculado de frecuencias de palabras por escala, fuente y día.
+
+La tabla `term_counts(escala, fuente, fecha, term, count)` se actualiza de forma
+incremental cada vez que el scraper inserta titulares, así que las palabras más
+frecuentes se obtienen con un simple `SUM ... GROUP BY term` en lugar de volver
+a tokenizar toda la tabla `titulares`.
+
+Uso: python indice_terminos.py --reconstruir [--procesos 4]
+"""
+import argparse
+import logging
+from collections import Counter
+
+import base_datos
+import conteo_paralelo
+import metricas
+from tokenizador import tokenizar
+
+TAMANO_LOTE = 5000  # filas por executemany al escribir en term_counts
+
+ESQUEMA_MYSQL = """
+CREATE TABLE IF NOT EXISTS term_counts (
+    escala TINYINT NOT NULL,
+    fuente VARCHAR(100) NOT NULL,
+    fecha DATE NOT NULL,
+    term VARCHAR(100) NOT NULL,
+    count INT UNSIGNED NOT NULL,
+    PRIMARY KEY (escala, fuente, fecha, term),
+    KEY idx_term_counts_fecha (fecha)
+)
+"""
+
+ESQUEMA_SQLITE = [
+    """CREATE TABLE IF NOT EXISTS term_counts (
+        escala INTEGER NOT NULL,
+        fuente TEXT NOT NULL,
+        fecha TEXT NOT NULL,
+        term TEXT NOT NULL,
+        count INTEGER NOT NULL,
+        PRIMARY KEY (escala, fuente, fecha, term)
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_term_counts_fecha ON term_counts (fecha)",
+]
+
+
+def asegurar_tabla(cursor):
+    """Crea `term_counts` si no existe y, en ese caso, la rellena desde `titulares`"""
+    if base_datos.existe_tabla(cursor, "term_counts"):
+        return False
+    logging.info("🛠️ Creando tabla term_counts...")
+    for sentencia in ESQUEMA_SQLITE if base_datos.es_sqlite() else [ESQUEMA_MYSQL]:
+        cursor.execute(sentencia)
+    reconstruir(cursor)
+    return True
+
+
+def _consulta_upsert():
+    columnas = "INSERT INTO term_counts (escala, fuente, fecha, term, count) VALUES (%s, %s, %s, %s, %s)"
+    if base_datos.es_sqlite():
+        return f"{columnas} ON CONFLICT(escala, fuente, fecha, term) DO UPDATE SET count = count + excluded.count"
+    return f"{columnas} ON DUPLICATE KEY UPDATE count = count + VALUES(count)"
+
+
+@metricas.cronometrado("tokenizacion")
+def contar_terminos(noticias):
+    """Counter de (escala, fuente, fecha, term) para filas [fecha, fuente, escala, titular, ...]
+
+    Los titulares sin fecha, escala o fuente no entran en el índice (como al reconstruirlo).
+    """
+    conteo = Counter()
+    for fecha, fuente, escala, titular, *_ in noticias:
+        if fecha is None or fuente is None or escala is None:
+            continue
+        for term in tokenizar(titular):
+            conteo[(escala, fuente, fecha, term)] += 1
+    return conteo
+
+
+def sumar(cursor, conteo):
+    """Suma un Counter de contar_terminos() a la tabla (upsert aditivo por lotes)"""
+    filas = [(*clave, veces) for clave, veces in conteo.items()]
+    for i in range(0, len(filas), TAMANO_LOTE):
+        cursor.executemany(_consulta_upsert(), filas[i:i + TAMANO_LOTE])
+    return len(filas)
+
+
+def actualizar(cursor, noticias):
+    """Añade al índice los titulares recién insertados"""
+    return sumar(cursor, contar_terminos(noticias))
+
+
+def reconstruir(cursor, procesos=1):
+    """Recalcula `term_counts` desde cero (p. ej. tras cambiar el tokenizador).
+
+    Con `procesos` > 1 los titulares se cuentan en paralelo por rangos de id
+    (ver conteo_paralelo); la escritura sigue en la transacción de `cursor`.
+    """
+    cursor.execute("DELETE FROM term_counts")
+    if procesos > 1:
+        conteo = conteo_paralelo.contar(procesos, nivel="indice")
+    else:
+        cursor.execute("""
+            SELECT fecha, fuente, escala, titular FROM titulares
+            WHERE escala IS NOT NULL AND fuente IS NOT NULL AND fecha IS NOT NULL AND titular IS NOT NULL
+        """)
+        conteo = Counter()
+        while filas := cursor.fetchmany(TAMANO_LOTE):
+            conteo.update(contar_terminos(filas))
+    total = sumar(cursor, conteo)
+    logging.info(f"📚 term_counts reconstruida: {total} filas.")
+    return total
+
+
+def top_terminos(cursor, limite=10, **filtros):
+    """Lista de (term, total) más frecuentes con filtros opcionales escalas/fuentes/desde/hasta"""
+    where, params = base_datos.filtros_sql(**filtros)
+    cursor.execute(f"""
+        SELECT term, SUM(count) AS total
+        FROM term_counts{where}
+        GROUP BY term
+        ORDER BY total DESC, term
+        LIMIT {int(limite)}
+    """, params)
+    return [(term, int(total)) for term, total in cursor.fetchall()]
+
+
+def top_por_escala(cursor, limite=10, **filtros):
+    """Diccionario escala -> lista de (term, total), con una consulta por escala"""
+    cursor.execute("SELECT DISTINCT escala FROM term_counts ORDER BY escala")
+    escalas = [int(e) for (e,) in cursor.fetchall()]
+    if filtros.get("escalas"):
+        escalas = [e for e in escalas if e in filtros["escalas"]]
+    filtros = {k: v for k, v in filtros.items() if k != "escalas"}
+    return {e: top_terminos(cursor, limite, escalas=[e], **filtros) for e in escalas}
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Índice de frecuencias de palabras (term_counts)")
+    parser.add_argument("--reconstruir", action="store_true", help="recalcula el índice desde titulares")
+    parser.add_argument("--procesos", type=int, default=1,
+                        help="procesos para contar al reconstruir (map-reduce por rangos de id)")
+    args = parser.parse_args()
+
+    with base_datos.transaccion() as cursor:
+        if not asegurar_tabla(cursor) and args.reconstruir:
+            reconstruir(cursor, args.procesos)
+        for escala, terminos in top_por_escala(cursor, limite=5).items():
+            print(f"🔵 Escala {escala}: " + ", ".join(f"{t} ({n})" for t, n in terminos))
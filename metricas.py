@@ -0,0 +1,186 @@
+"""Instrumentación ligera: contadores y cronómetros en memoria.
+
+Los puntos calientes (descarga y parseo de cada feed, fechas, inserción,
+tokenización, renderizado de gráficos) anotan aquí cuántas veces se ejecutan y
+cuánto tardan. Al terminar, los scripts pueden volcarlo a un fichero para el
+textfile collector de Prometheus (node_exporter) o a JSON, y guardar un perfil
+de cProfile de toda la ejecución:
+
+    python scraper.py --metricas metricas/scraper.prom
+    python analisis_palabras.py --metricas palabras.json --profile palabras.prof
+    python -m pstats palabras.prof
+
+Sin `--metricas` ni `--profile` el coste es solo el de anotar en un diccionario.
+Los procesos hijos de conteo_paralelo no envían sus métricas al padre.
+"""
+import atexit
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+PREFIJO = "noticias"
+LINEAS_PERFIL = 25      # funciones que se muestran al terminar con --profile
+
+_lock = threading.Lock()
+_contadores = {}        # (nombre, etiquetas) -> valor
+_tiempos = {}           # (nombre, etiquetas) -> [veces, segundos, máximo]
+_ruta = None
+
+
+def _clave(nombre, etiquetas):
+    return nombre, tuple(sorted((k, str(v)) for k, v in etiquetas.items()))
+
+
+def contar(nombre, valor=1, **etiquetas):
+    """Suma `valor` al contador `nombre` con esas etiquetas (p. ej. medio="RT")"""
+    clave = _clave(nombre, etiquetas)
+    with _lock:
+        _contadores[clave] = _contadores.get(clave, 0) + valor
+
+
+def observar(nombre, segundos, **etiquetas):
+    """Anota una duración en el cronómetro `nombre`"""
+    clave = _clave(nombre, etiquetas)
+    with _lock:
+        tiempo = _tiempos.get(clave)
+        if tiempo is None:
+            _tiempos[clave] = [1, segundos, segundos]
+        else:
+            tiempo[0] += 1
+            tiempo[1] += segundos
+            tiempo[2] = max(tiempo[2], segundos)
+
+
+@contextmanager
+def cronometro(nombre, **etiquetas):
+    """Mide lo que tarda el bloque `with` (también si termina con una excepción)"""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        observar(nombre, time.perf_counter() - inicio, **etiquetas)
+
+
+def cronometrado(nombre):
+    """Decorador: mide cada llamada a la función (etiqueta `funcion` con su nombre)"""
+    def decorador(funcion):
+        @wraps(funcion)
+        def envoltura(*args, **kwargs):
+            with cronometro(nombre, funcion=funcion.__name__):
+                return funcion(*args, **kwargs)
+        return envoltura
+    return decorador
+
+
+def instantanea():
+    """Diccionario serializable con el estado actual de contadores y cronómetros"""
+    with _lock:
+        return {
+            "instante": time.time(),
+            "contadores": [{"nombre": n, "etiquetas": dict(e), "valor": v}
+                           for (n, e), v in sorted(_contadores.items())],
+            "tiempos": [{"nombre": n, "etiquetas": dict(e), "veces": veces,
+                         "segundos": round(total, 6), "maximo": round(maximo, 6)}
+                        for (n, e), (veces, total, maximo) in sorted(_tiempos.items())],
+        }
+
+
+def _escapar(valor):
+    return valor.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _etiquetas(etiquetas):
+    if not etiquetas:
+        return ""
+    return "{" + ",".join(f'{k}="{_escapar(v)}"' for k, v in etiquetas.items()) + "}"
+
+
+def texto_prometheus(datos=None):
+    """Métricas en el formato de texto de Prometheus.
+
+    Los contadores terminan en `_total`; cada cronómetro es un summary
+    (`_count` y `_sum` en segundos) más un gauge `_max`.
+    """
+    datos = instantanea() if datos is None else datos
+    lineas, declarados = [], set()
+
+    def declarar(nombre, tipo):
+        if nombre not in declarados:
+            declarados.add(nombre)
+            lineas.append(f"# TYPE {nombre} {tipo}")
+
+    for contador in datos["contadores"]:
+        nombre = f"{PREFIJO}_{contador['nombre']}_total"
+        declarar(nombre, "counter")
+        lineas.append(f"{nombre}{_etiquetas(contador['etiquetas'])} {contador['valor']}")
+    for tiempo in datos["tiempos"]:
+        nombre = f"{PREFIJO}_{tiempo['nombre']}_segundos"
+        etiquetas = _etiquetas(tiempo["etiquetas"])
+        declarar(nombre, "summary")
+        lineas.append(f"{nombre}_count{etiquetas} {tiempo['veces']}")
+        lineas.append(f"{nombre}_sum{etiquetas} {tiempo['segundos']}")
+    for tiempo in datos["tiempos"]:
+        nombre = f"{PREFIJO}_{tiempo['nombre']}_segundos_max"
+        declarar(nombre, "gauge")
+        lineas.append(f"{nombre}{_etiquetas(tiempo['etiquetas'])} {tiempo['maximo']}")
+    return "\n".join(lineas) + "\n"
+
+
+def exportar(ruta):
+    """Escribe las métricas en `ruta`: JSON si termina en .json, si no formato Prometheus"""
+    directorio = os.path.dirname(os.path.abspath(ruta))
+    os.makedirs(directorio, exist_ok=True)
+    if ruta.endswith(".json"):
+        contenido = json.dumps(instantanea(), ensure_ascii=False, indent=2)
+    else:
+        contenido = texto_prometheus()
+    # Escritura atómica: el collector de Prometheus nunca lee un fichero a medias
+    tmp = f"{ruta}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as file:
+        file.write(contenido)
+    os.replace(tmp, ruta)
+
+
+def volcar():
+    """Exporta al fichero indicado con --metricas, si lo hay (útil en procesos largos)"""
+    if _ruta:
+        try:
+            exportar(_ruta)
+        except OSError as e:
+            logging.error(f"⚠️ No se pudieron escribir las métricas en {_ruta}: {e}")
+
+
+def anadir_argumentos(parser):
+    """Añade --metricas y --profile a un ArgumentParser"""
+    parser.add_argument("--metricas", metavar="RUTA", default=os.getenv("NOTICIAS_METRICAS"),
+                        help="al terminar, escribe las métricas (.json o formato Prometheus)")
+    parser.add_argument("--profile", metavar="RUTA",
+                        help="perfila la ejecución con cProfile y guarda las estadísticas (pstats)")
+
+
+def iniciar(args):
+    """Activa lo pedido con --metricas / --profile; el volcado se hace al salir del proceso"""
+    global _ruta
+    _ruta = getattr(args, "metricas", None)
+    perfil = None
+    if getattr(args, "profile", None):
+        import cProfile
+        perfil = cProfile.Profile()
+        perfil.enable()
+
+    def terminar():
+        volcar()
+        if perfil is not None:
+            perfil.disable()
+            import pstats
+            perfil.dump_stats(args.profile)
+            print(f"\n⏱️ Perfil guardado en {args.profile}; funciones con más tiempo acumulado:",
+                  file=sys.stderr)
+            pstats.Stats(perfil, stream=sys.stderr).sort_stats("cumulative").print_stats(LINEAS_PERFIL)
+
+    atexit.register(terminar)
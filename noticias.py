@@ -0,0 +1,55 @@
+"""Punto de entrada único para las herramientas del proyecto.
+
+    python noticias.py scrape [--demonio] [--backfill] ...
+    python noticias.py stats [--parquet]
+    python noticias.py words [--procesos 4]
+    python noticias.py charts [--salida graficos/]
+    python noticias.py enrich [--limite 500]
+    python noticias.py dashboard [opciones de streamlit]
+
+Cada comando importa solo su módulo, y cada módulo sus dependencias: `stats`
+no carga pandas, matplotlib, streamlit ni, con SQLite, el conector de MySQL.
+Las opciones que siguen al comando son las del script correspondiente
+(`python noticias.py words --help`).
+"""
+import argparse
+import importlib
+import os
+import subprocess
+import sys
+
+# Comando -> (módulo con main(argv), descripción); el módulo se importa al ejecutar el comando
+COMANDOS = {
+    "scrape": ("scraper", "descarga los titulares nuevos de todos los medios"),
+    "stats": ("analisis_basico", "titulares por medio de comunicación"),
+    "words": ("analisis_palabras", "palabras más usadas por escala ideológica"),
+    "charts": ("graficos", "genera todos los gráficos en lote, sin pantalla"),
+    "enrich": ("enriquecimiento", "descarga los artículos y guarda su entradilla"),
+    "dashboard": (None, "abre el dashboard de Streamlit"),
+}
+DASHBOARD = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dashboard.py")
+
+
+def dashboard(argumentos):
+    """Lanza `streamlit run dashboard.py` con las opciones dadas y devuelve su código de salida"""
+    return subprocess.call([sys.executable, "-m", "streamlit", "run", DASHBOARD, *argumentos])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="noticias", description="Titulares por escala ideológica")
+    comandos = parser.add_subparsers(dest="comando", required=True, metavar="comando")
+    for nombre, (_, descripcion) in COMANDOS.items():
+        # Sin -h propio: la ayuda la da el script del comando
+        comandos.add_parser(nombre, help=descripcion, add_help=False)
+    args, resto = parser.parse_known_args(argv)
+
+    modulo = COMANDOS[args.comando][0]
+    if modulo is None:
+        sys.exit(dashboard(resto))
+    # Que la ayuda y los errores de argparse muestren "noticias <comando>"
+    sys.argv[0] = f"noticias {args.comando}"
+    importlib.import_module(modulo).main(resto)
+
+
+if __name__ == "__main__":
+    main()
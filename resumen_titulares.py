@@ -0,0 +1,135 @@
+"""Recuento precalculado de titulares por fuente, escala y día.
+
+La tabla `resumen_titulares(fuente, escala, fecha, titulares, largos)` se
+actualiza en la misma transacción en la que el scraper inserta titulares. Los
+recuentos por medio o por escala (analisis_basico, grafico_titulares, gráfico
+de barras del dashboard) suman unas pocas filas por medio y día en lugar de
+recorrer toda la tabla `titulares`. `largos` cuenta solo los titulares de más
+de LONGITUD_MINIMA caracteres, los que muestra el dashboard.
+
+Los titulares sin fecha (o sin fuente o escala) también se cuentan, en filas
+con ese campo a NULL, para que los totales coincidan con un COUNT(*) sobre
+`titulares`.
+
+Uso: python resumen_titulares.py [--reconstruir]
+"""
+import argparse
+import logging
+
+import base_datos
+
+LONGITUD_MINIMA = 10  # caracteres; los titulares más cortos no se muestran en el dashboard
+
+ESQUEMA_MYSQL = """
+CREATE TABLE IF NOT EXISTS resumen_titulares (
+    fuente VARCHAR(100) NULL,
+    escala TINYINT NULL,
+    fecha DATE NULL,
+    titulares INT UNSIGNED NOT NULL,
+    largos INT UNSIGNED NOT NULL,
+    KEY idx_resumen_fuente (fuente, escala, fecha),
+    KEY idx_resumen_fecha (fecha)
+)
+"""
+
+ESQUEMA_SQLITE = [
+    """CREATE TABLE IF NOT EXISTS resumen_titulares (
+        fuente TEXT,
+        escala INTEGER,
+        fecha TEXT,
+        titulares INTEGER NOT NULL,
+        largos INTEGER NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_resumen_fuente ON resumen_titulares (fuente, escala, fecha)",
+    "CREATE INDEX IF NOT EXISTS idx_resumen_fecha ON resumen_titulares (fecha)",
+]
+
+
+def asegurar_tabla(cursor):
+    """Crea `resumen_titulares` si no existe y, en ese caso, la rellena desde `titulares`"""
+    if base_datos.existe_tabla(cursor, "resumen_titulares"):
+        return False
+    logging.info("🛠️ Creando tabla resumen_titulares...")
+    for sentencia in ESQUEMA_SQLITE if base_datos.es_sqlite() else [ESQUEMA_MYSQL]:
+        cursor.execute(sentencia)
+    reconstruir(cursor)
+    return True
+
+
+def contar(noticias):
+    """Diccionario (fuente, escala, fecha) -> [titulares, largos] para filas [fecha, fuente, escala, titular, ...]"""
+    conteo = {}
+    for fecha, fuente, escala, titular, *_ in noticias:
+        par = conteo.setdefault((fuente, escala, fecha), [0, 0])
+        par[0] += 1
+        par[1] += len(titular or "") > LONGITUD_MINIMA
+    return conteo
+
+
+def actualizar(cursor, noticias):
+    """Suma a la tabla los titulares recién insertados (una fila por fuente, escala y día).
+
+    Las claves pueden ser NULL, así que no sirve un upsert por clave única:
+    se actualiza la fila con comparaciones que aceptan NULL y, si no existe,
+    se inserta.
+    """
+    igual = "IS" if base_datos.es_sqlite() else "<=>"
+    for (fuente, escala, fecha), (veces, largos) in contar(noticias).items():
+        cursor.execute(f"""
+            UPDATE resumen_titulares SET titulares = titulares + %s, largos = largos + %s
+            WHERE fuente {igual} %s AND escala {igual} %s AND fecha {igual} %s
+        """, (veces, largos, fuente, escala, fecha))
+        if not cursor.rowcount:
+            cursor.execute("""
+                INSERT INTO resumen_titulares (fuente, escala, fecha, titulares, largos)
+                VALUES (%s, %s, %s, %s, %s)
+            """, (fuente, escala, fecha, veces, largos))
+
+
+def reconstruir(cursor):
+    """Recalcula `resumen_titulares` desde cero con una sola consulta sobre `titulares`"""
+    cursor.execute("DELETE FROM resumen_titulares")
+    cursor.execute(f"""
+        INSERT INTO resumen_titulares (fuente, escala, fecha, titulares, largos)
+        SELECT fuente, escala, fecha, COUNT(*), SUM(CASE WHEN longitud > {LONGITUD_MINIMA} THEN 1 ELSE 0 END)
+        FROM titulares
+        GROUP BY fuente, escala, fecha
+    """)
+    cursor.execute("SELECT COUNT(*), COALESCE(SUM(titulares), 0) FROM resumen_titulares")
+    filas, titulares = cursor.fetchone()
+    logging.info(f"🧮 resumen_titulares reconstruida: {filas} filas, {titulares} titulares.")
+    return filas
+
+
+def por_fuente(cursor, **filtros):
+    """Lista de (fuente, titulares) de más a menos, con filtros de base_datos.filtros_sql"""
+    where, params = base_datos.filtros_sql(**filtros)
+    cursor.execute(f"""
+        SELECT fuente, SUM(titulares) AS total
+        FROM resumen_titulares{where}
+        GROUP BY fuente
+        ORDER BY total DESC, fuente
+    """, params)
+    return [(fuente, int(total)) for fuente, total in cursor.fetchall()]
+
+
+def por_escala(cursor, solo_largos=False, **filtros):
+    """Diccionario escala -> titulares (o solo los largos), con filtros de base_datos.filtros_sql"""
+    where, params = base_datos.filtros_sql(**filtros, condiciones=("escala IS NOT NULL",))
+    columna = "largos" if solo_largos else "titulares"
+    cursor.execute(f"SELECT escala, SUM({columna}) FROM resumen_titulares{where} GROUP BY escala ORDER BY escala",
+                   params)
+    return {int(escala): int(total) for escala, total in cursor.fetchall()}
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Recuento de titulares por fuente, escala y día")
+    parser.add_argument("--reconstruir", action="store_true", help="recalcula la tabla desde titulares")
+    args = parser.parse_args()
+
+    with base_datos.transaccion() as cursor:
+        if not asegurar_tabla(cursor) and args.reconstruir:
+            reconstruir(cursor)
+        for fuente, total in por_fuente(cursor):
+            print(f"▪ {str(fuente).ljust(25)}: {total} titulares")
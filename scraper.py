@@ -1,15 +1,36 @@
 import os
 import csv
-import feedparser
+import asyncio
+import calendar
+import argparse
+import json
+import gc
+import random
+import signal
+import threading
+import time
 from concurrent.futures import ThreadPoolExecutor
+import feedparser
+from collections import deque
 import logging
-import mysql.connector
-from dateutil import parser
-
-# Configuración de logging (registrar mensajes durante la ejecución de un programa)
-logging.basicConfig(filename="scraper.log", level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+import base_datos
+import esquema
+import fechas
+import indice_terminos
+import resumen_titulares
+import duplicados
+import busqueda
+import metricas
+try:
+    import almacen_parquet  # Copia columnar del histórico (necesita pyarrow)
+except ImportError:
+    almacen_parquet = None
+from descarga_async import descargar_medios, descargar, crear_sesion, leer_medio
+from claves_noticia import hash_noticia  # clave de deduplicación, compartida con esquema.py
 
-# Definir los medios con sus RSS y nivel en la escala (1-8: desde más pro-ruso a anti-ruso)
+# Definir los medios con sus RSS y nivel en la escala (1-8: desde más pro-ruso a anti-ruso).
+# Claves opcionales: "limite" (máximo de entradas por lectura, None = todas) y
+# "archivo" (plantilla de URL paginada con {pagina} para el modo backfill).
 MEDIOS = [
     {"nombre": "RT", "rss": "https://www.rt.com/rss/", "escala": 1},
     {"nombre": "Sputnik News", "rss": "https://sputnikglobe.com/export/rss2/archive/index.xml", "escala": 2},
@@ -21,70 +42,529 @@ MEDIOS = [
     {"nombre": "Kyiv Independent", "rss": "https://kyivindependent.com/feed/", "escala": 8},
 ]
 
+LIMITE_ENTRADAS = None  # límite por defecto de entradas por medio (None = sin límite)
+TAMANO_LOTE = 500       # filas por lote al insertar durante el backfill
+MAX_PAGINAS = 50        # páginas máximas de archivo por medio en backfill
+
+# Modo demonio: cada medio se lee cada `intervalo` segundos, adaptado a su ritmo de publicación
+INTERVALO_MIN = 120           # nunca más de una lectura cada 2 minutos por medio
+INTERVALO_MAX = 3600          # ni menos de una por hora
+INTERVALO_INICIAL = 600       # hasta conocer el ritmo del medio
+NUEVAS_POR_LECTURA = 2        # titulares nuevos que se esperan en cada lectura
+PESO_TASA = 0.3               # peso de la última lectura en la media móvil de la tasa
+MAX_MEMORIA_MB = 512          # al superarlo se vacían cachés; si sigue por encima, se para
+
 # Ruta para guardar el archivo CSV
 output_path = os.path.join(os.path.dirname(__file__), "noticias_medios.csv")
 
-def procesar_medio(medio):
+# Estado local de cada feed (ETag, Last-Modified e IDs ya vistos) para peticiones condicionales
+estado_path = os.path.join(os.path.dirname(__file__), "estado_feeds.json")
+MAX_IDS_VISTOS = 500  # IDs recordados por medio (suficiente para varias ejecuciones)
+
+def cargar_estado():
+    """Lee el estado de los feeds guardado en la ejecución anterior"""
     try:
-        logging.info(f"Scrapeando {medio['nombre']}...")
-        feed = feedparser.parse(medio["rss"])
-        if not feed.entries:
-            logging.warning(f"⚠️ No se encontraron noticias en {medio['nombre']}.")
-            return []
-
-        noticias = []
-        for entry in feed.entries[:10]:  # Limitamos a 10 titulares por medio
-            fecha_raw = entry.get("published", "")
-            try:
-                fecha = parser.parse(fecha_raw).date().isoformat()
-            except Exception:
-                fecha = "0000-00-00"  # Fecha por defecto en caso de error
-
-            titular = entry.get("title", "Sin título")
-            enlace = entry.get("link", "Sin enlace")
-            noticias.append([fecha, medio["nombre"], medio["escala"], titular, enlace])
-
-        return noticias
-    except Exception as e:
-        logging.error(f"⚠️ Error al procesar {medio['nombre']}: {e}")
+        with open(estado_path, encoding="utf-8") as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logging.warning(f"⚠️ Estado de feeds ilegible, se descarga todo de nuevo: {e}")
+        return {}
+
+def guardar_estado(estado):
+    """Guarda el estado de forma atómica para no dejar el JSON a medias"""
+    tmp_path = f"{estado_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump(estado, file, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, estado_path)
+
+def id_entrada(entry):
+    """Identificador estable de una entrada del feed"""
+    return entry.get("id") or entry.get("link") or entry.get("title", "")
+
+def fila_noticia(medio, entry):
+    """Fila [fecha, fuente, escala, titular, enlace, publicado] para una entrada del feed.
+
+    `fecha` es el día y `publicado` el instante de publicación, ambos en UTC;
+    si la entrada no trae una fecha válida, los dos son None (NULL).
+    """
+    inicio = time.perf_counter()
+    publicado = fechas.de_entrada(entry)
+    if publicado is None:
+        metricas.contar("fechas_invalidas", medio=medio["nombre"])
+    metricas.observar("fechas", time.perf_counter() - inicio, medio=medio["nombre"])
+
+    titular = entry.get("title", "Sin título")
+    enlace = entry.get("link", "Sin enlace")
+    return [fechas.dia(publicado), medio["nombre"], medio["escala"], titular, enlace,
+            fechas.instante(publicado)]
+
+def extraer_noticias(medio, feed, estado, etag=None, modified=None):
+    """Convierte un feed ya parseado en filas, saltando las entradas ya vistas.
+
+    `estado` es el diccionario de este medio dentro del estado de feeds; se
+    actualiza en el sitio con el nuevo ETag/Last-Modified y los IDs vistos.
+    """
+    if not feed.entries:
+        logging.warning(f"⚠️ No se encontraron noticias en {medio['nombre']}.")
         return []
 
-def insertar_en_mysql(noticias):
+    vistos = estado.get("vistos", [])
+    vistos_set = set(vistos)
+    nuevos_ids = []
+
+    noticias = []
+    for entry in feed.entries[:medio.get("limite", LIMITE_ENTRADAS)]:
+        entry_id = id_entrada(entry)
+        if entry_id in vistos_set:
+            continue
+        nuevos_ids.append(entry_id)
+        noticias.append(fila_noticia(medio, entry))
+
+    # Solo se actualiza el estado cuando el feed se ha leído entero
+    estado["vistos"] = (nuevos_ids + vistos)[:MAX_IDS_VISTOS]
+    if etag:
+        estado["etag"] = etag
+    if modified:
+        estado["modified"] = modified
+    if not noticias:
+        logging.info(f"⏭️ {medio['nombre']} sin entradas nuevas.")
+    return noticias
+
+def tasa_publicacion(entries):
+    """Titulares por hora según las fechas de las entradas del feed, o None si no hay suficientes"""
+    instantes = sorted(calendar.timegm(t) for t in
+                       (e.get("published_parsed") or e.get("updated_parsed") for e in entries) if t)
+    if len(instantes) < 2 or instantes[-1] <= instantes[0]:
+        return None
+    return (len(instantes) - 1) * 3600 / (instantes[-1] - instantes[0])
+
+def parsear_medio(medio, contenido, cabeceras, estado):
+    """Parsea un feed ya descargado por el motor asíncrono (sin E/S de red)"""
+    with metricas.cronometro("parseo", medio=medio["nombre"]):
+        feed = feedparser.parse(contenido, response_headers=cabeceras)
+    metricas.contar("entradas_leidas", len(feed.entries), medio=medio["nombre"])
+    if estado.get("tasa") is None:
+        # Primera estimación del ritmo del medio para el modo demonio
+        tasa = tasa_publicacion(feed.entries)
+        if tasa is not None:
+            estado["tasa"] = tasa
+    return extraer_noticias(medio, feed, estado,
+                            etag=cabeceras.get("etag"),
+                            modified=cabeceras.get("last-modified"))
+
+# Hashes de noticias ya insertadas en este proceso (evita ir a MySQL con duplicados obvios)
+MAX_HASHES_RECIENTES = 50_000
+_hashes_recientes = set()
+_orden_hashes = deque()
+_esquema_listo = False
+_esquema_lock = threading.Lock()
+
+def recordar_hashes(hashes):
+    """Añade hashes al conjunto reciente descartando los más antiguos"""
+    for h in hashes:
+        _hashes_recientes.add(h)
+        _orden_hashes.append(h)
+    while len(_orden_hashes) > MAX_HASHES_RECIENTES:
+        _hashes_recientes.discard(_orden_hashes.popleft())
+
+def asegurar_esquema():
+    """Prepara los índices derivados (palabras, recuentos, historias, texto) una sola vez por proceso.
+
+    Va en su propia transacción, antes de la del scrape: en MySQL un CREATE
+    TABLE haría commit implícito de lo ya insertado, y en SQLite un rollback
+    posterior desharía las tablas. El proceso solo las da por creadas tras el commit.
+    """
+    global _esquema_listo
+    with _esquema_lock:
+        if _esquema_listo:
+            return
+        with base_datos.transaccion(escritura=True) as cursor:
+            indice_terminos.asegurar_tabla(cursor)
+            resumen_titulares.asegurar_tabla(cursor)
+            if duplicados.asegurar_tablas(cursor):
+                cursor.execute("SELECT 1 FROM titulares LIMIT 1")
+                if cursor.fetchall():
+                    # Agrupar el archivo es largo: no se hace dentro de la transacción del scrape
+                    logging.warning("🧩 Historias sin calcular para los titulares ya guardados: "
+                                    "ejecuta `python duplicados.py --reconstruir`.")
+            busqueda.asegurar_indice(cursor)
+        _esquema_listo = True
+
+def consulta_insercion():
+    """INSERT que ignora los hashes repetidos, según el backend"""
+    columnas = ("INSERT INTO titulares (fecha, fuente, escala, titular, enlace, hash_noticia, publicado) "
+                "VALUES (%s, %s, %s, %s, %s, %s, %s)")
+    if base_datos.es_sqlite():
+        return f"{columnas} ON CONFLICT(hash_noticia) DO NOTHING"
+    return f"{columnas} ON DUPLICATE KEY UPDATE hash_noticia = hash_noticia"
+
+def _hashes_en(cursor, hashes):
+    marcadores = ", ".join(["%s"] * len(hashes))
+    cursor.execute(f"SELECT hash_noticia FROM titulares WHERE hash_noticia IN ({marcadores})",
+                   list(hashes))
+    return {h for (h,) in cursor.fetchall()}
+
+def _guardar(cursor, filas):
+    """Inserta las filas cuyo hash aún no está guardado y actualiza term_counts, resumen_titulares e historias.
+
+    La consulta previa solo descarta las ya guardadas; otro proceso puede
+    insertar el mismo hash entre ella y el INSERT. Por eso cada fila se inserta
+    por separado y solo cuenta como nueva si el INSERT la ha escrito de verdad
+    (rowcount 1: sin FOUND_ROWS, un duplicado deja 0).
+    """
+    existentes = _hashes_en(cursor, [f[5] for f in filas])
+    candidatas = [f for f in filas if f[5] not in existentes]
+    nuevas = []
+    if candidatas:
+        esquema.registrar_fuentes(cursor, {(f[1], f[2]) for f in candidatas})
+        consulta = consulta_insercion()
+        for fila in candidatas:
+            cursor.execute(consulta, fila)
+            if cursor.rowcount == 1:
+                nuevas.append(fila)
+    if nuevas:
+        indice_terminos.actualizar(cursor, nuevas)
+        resumen_titulares.actualizar(cursor, nuevas)
+        duplicados.actualizar(cursor, nuevas)
+    return nuevas
+
+def insertar_en_mysql(noticias, cursor=None, insertadas=None):
+    """Inserta las noticias ignorando las ya guardadas.
+
+    Sin `cursor` se usa una transacción propia; con el cursor de la transacción
+    del scrape (abierta tras asegurar_esquema()), un savepoint aísla este lote
+    para que un fallo no afecte al resto de medios. Si se pasa la lista
+    `insertadas`, se le añaden las filas realmente insertadas. Devuelve una tupla (nuevas, omitidas), o None si falla.
+    """
+    filas = []
+    hashes_lote = set()
+    for fecha, fuente, escala, titular, enlace, publicado in noticias:
+        h = hash_noticia(titular, enlace)
+        if h in _hashes_recientes or h in hashes_lote:
+            continue
+        hashes_lote.add(h)
+        filas.append((fecha, fuente, escala, titular, enlace, h, publicado))
+
+    omitidas_memoria = len(noticias) - len(filas)
+    if not filas:
+        logging.info(f"⏭️ {omitidas_memoria} noticias ya conocidas, nada que insertar.")
+        if noticias:
+            metricas.contar("titulares_omitidos", omitidas_memoria, fuente=noticias[0][1])
+        return 0, omitidas_memoria
+
+    fuente = filas[0][1]
+    try:
+        with metricas.cronometro("insercion", fuente=fuente):
+            if cursor is None:
+                asegurar_esquema()
+                with base_datos.transaccion(escritura=True) as cur:
+                    guardadas = _guardar(cur, filas)
+            else:
+                # El esquema ya está preparado (scrapear lo hace antes de abrir la transacción)
+                cursor.execute("SAVEPOINT lote_medio")
+                try:
+                    guardadas = _guardar(cursor, filas)
+                except base_datos.ERRORES:
+                    cursor.execute("ROLLBACK TO SAVEPOINT lote_medio")
+                    raise
+                cursor.execute("RELEASE SAVEPOINT lote_medio")
+    except base_datos.ERRORES as err:
+        logging.error(f"❌ Error al insertar en la base de datos: {err}")
+        metricas.contar("errores_insercion", fuente=fuente)
+        return None
+
+    recordar_hashes(hashes_lote)
+    if insertadas is not None:
+        insertadas.extend(guardadas)
+    nuevas = len(guardadas)
+    omitidas = len(noticias) - nuevas
+    metricas.contar("titulares_nuevos", nuevas, fuente=fuente)
+    metricas.contar("titulares_omitidos", omitidas, fuente=fuente)
+    logging.info(f"✅ Noticias guardadas: {nuevas} nuevas, {omitidas} omitidas por duplicadas.")
+    return nuevas, omitidas
+
+def archivar(filas):
+    """Añade al almacén Parquet las filas ya confirmadas en la base de datos"""
+    if almacen_parquet is None or not filas:
+        return
+    try:
+        almacen_parquet.anadir(filas)
+    except (OSError, ValueError) as e:
+        # El Parquet es una copia: un fallo aquí no debe tumbar el scrape
+        logging.error(f"⚠️ No se pudo añadir al almacén Parquet: {e}")
+
+def insertar_y_archivar(noticias):
+    """insertar_en_mysql con transacción propia y, tras el commit, copia al almacén Parquet"""
+    insertadas = []
+    resultado = insertar_en_mysql(noticias, insertadas=insertadas)
+    archivar(insertadas)
+    return resultado
+
+def hashes_guardados(hashes):
+    """Devuelve cuáles de los hashes ya están en la tabla `titulares`"""
+    if not hashes:
+        return set()
+    asegurar_esquema()
+    with base_datos.transaccion() as cursor:
+        return _hashes_en(cursor, hashes)
+
+def siguiente_pagina(medio, feed, pagina):
+    """URL de la siguiente página de archivo, o None si el feed no pagina.
+
+    Se sigue primero el enlace rel="next" (RFC 5005); si no existe, se usa la
+    plantilla "archivo" del medio.
+    """
+    for link in feed.feed.get("links", []):
+        if link.get("rel") == "next" and link.get("href"):
+            return link["href"]
+    if medio.get("archivo"):
+        return medio["archivo"].format(pagina=pagina + 1)
+    return None
+
+async def backfill_medio(session, medio, max_paginas=MAX_PAGINAS, tamano_lote=TAMANO_LOTE):
+    """Recorre el archivo paginado de un medio hasta llegar a noticias ya guardadas.
+
+    Las filas se insertan en lotes de `tamano_lote` a medida que se leen, así que
+    la memoria no crece con la profundidad del archivo. Devuelve las filas nuevas.
+    """
+    url, pagina, visitadas = medio["rss"], 1, set()
+    lote, total = [], 0
+    while url and url not in visitadas and pagina <= max_paginas:
+        visitadas.add(url)
+        try:
+            _, cuerpo, cabeceras = await descargar(session, url)
+        except Exception as e:
+            logging.error(f"⚠️ Backfill de {medio['nombre']} interrumpido en la página {pagina}: {e}")
+            break
+        feed = await asyncio.to_thread(feedparser.parse, cuerpo, response_headers=cabeceras)
+        if not feed.entries:
+            break
+
+        filas = [fila_noticia(medio, entry) for entry in feed.entries]
+        try:
+            ya_guardados = await asyncio.to_thread(
+                hashes_guardados, {hash_noticia(f[3], f[4]) for f in filas})
+        except base_datos.ERRORES as err:
+            logging.error(f"❌ Backfill de {medio['nombre']} detenido, error de base de datos: {err}")
+            break
+        lote.extend(f for f in filas if hash_noticia(f[3], f[4]) not in ya_guardados)
+
+        while len(lote) >= tamano_lote:
+            resultado = await asyncio.to_thread(insertar_y_archivar, lote[:tamano_lote])
+            total += resultado[0] if resultado else 0
+            del lote[:tamano_lote]
+
+        if ya_guardados:
+            logging.info(f"🛑 {medio['nombre']}: alcanzadas noticias ya guardadas en la página {pagina}.")
+            break
+        url = siguiente_pagina(medio, feed, pagina)
+        pagina += 1
+
+    if lote:
+        resultado = await asyncio.to_thread(insertar_y_archivar, lote)
+        total += resultado[0] if resultado else 0
+    logging.info(f"📚 Backfill de {medio['nombre']}: {total} titulares nuevos en {len(visitadas)} páginas.")
+    return total
+
+async def backfill(medios, max_paginas=MAX_PAGINAS):
+    """Backfill de todos los medios en paralelo (un recorrido secuencial por medio)"""
+    async with crear_sesion() as session:
+        return await asyncio.gather(*(backfill_medio(session, m, max_paginas) for m in medios))
+
+def intervalo_adaptado(tasa):
+    """Segundos hasta la próxima lectura para un medio que publica `tasa` titulares por hora"""
+    if not tasa:
+        return INTERVALO_MAX
+    return min(INTERVALO_MAX, max(INTERVALO_MIN, NUEVAS_POR_LECTURA * 3600 / tasa))
+
+def actualizar_tasa(estado, nuevas, ahora):
+    """Media móvil de titulares nuevos por hora desde la lectura anterior; devuelve el intervalo"""
+    anterior = estado.get("ultima_lectura")
+    if anterior is not None and ahora > anterior:
+        observada = nuevas * 3600 / (ahora - anterior)
+        tasa = estado.get("tasa")
+        estado["tasa"] = observada if tasa is None else PESO_TASA * observada + (1 - PESO_TASA) * tasa
+    estado["ultima_lectura"] = ahora
+    if "tasa" not in estado:
+        return INTERVALO_INICIAL
+    return intervalo_adaptado(estado["tasa"])
+
+def memoria_mb():
+    """Memoria residente actual del proceso en MB (pico de uso si no hay /proc)"""
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, IndexError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def memoria_controlada(maximo_mb):
+    """False si el proceso sigue por encima de `maximo_mb` tras vaciar cachés"""
+    if memoria_mb() <= maximo_mb:
+        return True
+    _hashes_recientes.clear()
+    _orden_hashes.clear()
+    gc.collect()
+    usada = memoria_mb()
+    if usada <= maximo_mb:
+        logging.warning(f"🧹 Memoria por encima de {maximo_mb} MB: cachés vaciadas ({usada:.0f} MB).")
+        return True
+    logging.error(f"🛑 {usada:.0f} MB en uso tras vaciar cachés (máximo {maximo_mb} MB).")
+    return False
+
+async def vigilar_medio(session, pool, medio, estado_feeds, parar, guardar):
+    """Bucle de un medio en modo demonio: lee, inserta y espera según su ritmo hasta `parar`"""
+    nombre = medio["nombre"]
+    # Desfase inicial para que los medios no se lean todos a la vez
+    espera = random.uniform(0, 30)
+    fallos = 0
+    while not parar.is_set():
+        try:
+            await asyncio.wait_for(parar.wait(), timeout=espera)
+            break
+        except asyncio.TimeoutError:
+            pass
+
+        # Se trabaja sobre una copia: solo se da por buena si la inserción sale bien
+        estado = json.loads(json.dumps(estado_feeds.get(nombre, {})))
+        resultado = None
+        try:
+            noticias = await leer_medio(session, pool, medio, estado, parsear_medio)
+            if noticias is not None:
+                resultado = (await asyncio.to_thread(insertar_y_archivar, noticias)
+                             if noticias else (0, 0))
+        except Exception:
+            # Un error inesperado no puede dejar parado este medio sin que se note: cuenta como fallo
+            logging.exception(f"💥 {nombre}: error inesperado en la lectura")
+        if resultado is None:
+            fallos += 1
+            espera = min(INTERVALO_MAX, INTERVALO_MIN * 2 ** fallos)
+            logging.warning(f"🔁 {nombre}: lectura fallida, siguiente intento en {espera:.0f}s")
+            continue
+
+        fallos = 0
+        espera = actualizar_tasa(estado, resultado[0], time.time())
+        estado_feeds[nombre] = estado
+        guardar()
+        logging.info(f"⏱️ {nombre}: {resultado[0]} nuevos, "
+                     f"{estado.get('tasa', 0):.1f}/h, próxima lectura en {espera:.0f}s")
+
+async def demonio(medios, max_memoria_mb=MAX_MEMORIA_MB):
+    """Lee cada medio en su propio bucle hasta recibir SIGINT o SIGTERM.
+
+    La sesión HTTP, el pool de hilos y el pool de la base de datos se crean una
+    vez y se reutilizan entre lecturas. Al parar, cada medio termina la
+    lectura en curso y el estado queda guardado.
+    """
+    parar = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for senal in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(senal, parar.set)
+        except (NotImplementedError, RuntimeError):  # Windows: Ctrl+C llega como KeyboardInterrupt
+            pass
+
+    estado_feeds = cargar_estado()
+    await asyncio.to_thread(base_datos.comprobar_conexion)  # abre el pool antes de la primera lectura
+    logging.info(f"🛰️ Demonio iniciado con {len(medios)} medios.")
+
     try:
-        conexion = mysql.connector.connect(
-            host="localhost",
-            user="root",
-            password="MYSQL420",
-            database="proyecto_noticias"
-        )
-        cursor = conexion.cursor()
-        query = """
-        INSERT INTO titulares (fecha, fuente, escala, titular, enlace)
-        VALUES (%s, %s, %s, %s, %s)
-        """
-        cursor.executemany(query, noticias)
-        conexion.commit()
-        cursor.close()
-        conexion.close()
-        logging.info("✅ Noticias guardadas en MySQL.")
-    except mysql.connector.Error as err:
-        logging.error(f"❌ Error al insertar en MySQL: {err}")
-
-# Procesar medios en paralelo
-with ThreadPoolExecutor() as executor:
-    resultados = list(executor.map(procesar_medio, MEDIOS))
-
-# Escribir resultados en el CSV
-with open(output_path, "w", newline="", encoding="utf-8") as file:
-    writer = csv.writer(file)
-    writer.writerow(["Fecha", "Fuente", "Escala", "Titular", "Enlace"])
-    for noticias in resultados:
-        writer.writerows(noticias)
-
-logging.info(f"📌 Noticias guardadas en: {output_path}")
-
-# Insertar resultados en la base de datos
-for noticias in resultados:
-    if noticias:
-        insertar_en_mysql(noticias)
+        with ThreadPoolExecutor(max_workers=len(medios)) as pool:
+            async with crear_sesion() as session:
+                def guardar():
+                    guardar_estado(estado_feeds)
+
+                tareas = [asyncio.create_task(vigilar_medio(session, pool, m, estado_feeds, parar, guardar))
+                          for m in medios]
+                try:
+                    while not parar.is_set():
+                        try:
+                            await asyncio.wait_for(parar.wait(), timeout=60)
+                        except asyncio.TimeoutError:
+                            metricas.volcar()  # el fichero de métricas se mantiene al día
+                            if not memoria_controlada(max_memoria_mb):
+                                parar.set()
+                finally:
+                    parar.set()
+                    logging.info("🛑 Parando: esperando a que terminen las lecturas en curso...")
+                    resultados = await asyncio.gather(*tareas, return_exceptions=True)
+                    for medio, resultado in zip(medios, resultados):
+                        if isinstance(resultado, Exception):
+                            logging.error(f"🚨 {medio['nombre']}: el bucle terminó con {resultado!r}")
+    finally:
+        guardar_estado(estado_feeds)
+        logging.info("👋 Demonio detenido.")
+
+def scrapear(medios):
+    """Una lectura de todos los medios: CSV, base de datos (una transacción) y Parquet"""
+    # Descargar medios de forma asíncrona (cada tarea solo toca el estado de su medio)
+    estado_feeds = cargar_estado()
+    estado_previo = json.loads(json.dumps(estado_feeds))  # copia para deshacer si falla la inserción
+    estados_medios = [estado_feeds.setdefault(medio["nombre"], {}) for medio in medios]
+    resultados = asyncio.run(descargar_medios(medios, estados_medios, parsear_medio))
+
+    # Escribir resultados en el CSV
+    with open(output_path, "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(["Fecha", "Fuente", "Escala", "Titular", "Enlace", "Publicado"])
+        for noticias in resultados:
+            writer.writerows(noticias)
+
+    logging.info(f"📌 Noticias guardadas en: {output_path}")
+
+    # Insertar resultados en la base de datos, todo el scrape en una única transacción
+    total_nuevas = total_omitidas = 0
+    insertadas = []
+    try:
+        asegurar_esquema()
+        with base_datos.transaccion(escritura=True) as cursor:
+            for medio, noticias in zip(medios, resultados):
+                if not noticias:
+                    continue
+                resultado = insertar_en_mysql(noticias, cursor, insertadas)
+                if resultado is None:
+                    # Sin insertar no se pueden dar por vistas: se repetirá la descarga completa
+                    estado_feeds[medio["nombre"]] = estado_previo.get(medio["nombre"], {})
+                    continue
+                total_nuevas += resultado[0]
+                total_omitidas += resultado[1]
+        logging.info(f"📊 Total: {total_nuevas} titulares nuevos, {total_omitidas} omitidos.")
+        # Solo tras el commit: el Parquet nunca tiene filas que la base de datos no tenga
+        archivar(insertadas)
+    except base_datos.ERRORES as err:
+        logging.error(f"❌ Error en la transacción del scrape, no se ha guardado nada: {err}")
+        estado_feeds = estado_previo
+        _hashes_recientes.clear()
+        _orden_hashes.clear()
+
+    guardar_estado(estado_feeds)
+
+def main(argv=None):
+    # Configuración de logging (registrar mensajes durante la ejecución de un programa)
+    logging.basicConfig(filename="scraper.log", level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    args_parser = argparse.ArgumentParser(description="Scraper de titulares por escala ideológica")
+    args_parser.add_argument("--backfill", action="store_true",
+                             help="recorre los archivos paginados hasta alcanzar noticias ya guardadas")
+    args_parser.add_argument("--max-paginas", type=int, default=MAX_PAGINAS,
+                             help=f"páginas máximas por medio en backfill (por defecto {MAX_PAGINAS})")
+    args_parser.add_argument("--demonio", action="store_true",
+                             help="sigue leyendo cada medio a intervalos adaptados a su ritmo de publicación")
+    args_parser.add_argument("--max-memoria", type=int, default=MAX_MEMORIA_MB,
+                             help=f"MB máximos en modo demonio (por defecto {MAX_MEMORIA_MB})")
+    metricas.anadir_argumentos(args_parser)
+    args = args_parser.parse_args(argv)
+    metricas.iniciar(args)
+
+    if args.backfill:
+        totales = asyncio.run(backfill(MEDIOS, args.max_paginas))
+        logging.info(f"📊 Backfill terminado: {sum(totales)} titulares nuevos.")
+    elif args.demonio:
+        asyncio.run(demonio(MEDIOS, args.max_memoria))
+    else:
+        scrapear(MEDIOS)
 
+if __name__ == "__main__":
+    main()
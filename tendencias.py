@@ -0,0 +1,243 @@
+"""Tendencias: frecuencia de palabras a lo largo del tiempo por escala.
+
+Los recuentos diarios salen del índice `term_counts` (escala, fuente, fecha,
+term, count). Aquí se convierten en matrices dispersas periodos × términos
+(diarias o semanales), sobre las que se calculan ventanas móviles y los
+términos que crecen de golpe respecto a su nivel habitual.
+
+Los recuentos por día se guardan en una caché local, una por base de datos; en
+cada actualización solo se miran los días desde poco antes del último de la
+caché (DIAS_REVISADOS) y se piden a la base de datos los nuevos o cuyo total ha
+cambiado (el día en curso o los que rellena un backfill reciente). Tras un
+backfill de fechas antiguas, `--revisar-todo` compara todos los días.
+
+Uso: python tendencias.py --escala 3 --frecuencia D --reciente 7 --base 28 [--revisar-todo]
+"""
+import argparse
+import logging
+import os
+import pickle
+from collections import namedtuple
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+import base_datos
+import indice_terminos
+
+CACHE_DIR = os.path.dirname(os.path.abspath(__file__))
+COLUMNAS = ["escala", "fecha", "term", "count"]
+DIAS_POR_CONSULTA = 200  # fechas por cada IN (...) al pedir días cambiados
+DIAS_REVISADOS = 14      # días anteriores al último de la caché cuyo total se vuelve a comprobar
+
+FRECUENCIAS = {"D": "Diaria", "W": "Semanal"}
+
+# Matriz dispersa `matriz` (una fila por periodo de `fechas`, una columna por término)
+SerieTerminos = namedtuple("SerieTerminos", "fechas terminos matriz")
+
+
+def _cache_vacia():
+    return {"totales": {}, "datos": pd.DataFrame(columns=COLUMNAS)}
+
+
+def ruta_cache():
+    """Caché de la base de datos configurada: otro backend u otra base de datos usa otro fichero"""
+    return os.path.join(CACHE_DIR, f"tendencias_cache_{base_datos.huella()}.pkl")
+
+
+def _leer_cache(path):
+    try:
+        with open(path, "rb") as f:
+            return pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        return _cache_vacia()
+
+
+def _guardar_cache(cache, path):
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump(cache, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+
+
+def _totales_por_dia(cursor, desde=None):
+    """Huella de cada día (desde `desde`, si se indica): suma de recuentos en term_counts"""
+    if desde is None:
+        cursor.execute("SELECT fecha, SUM(count) FROM term_counts GROUP BY fecha")
+    else:
+        cursor.execute("SELECT fecha, SUM(count) FROM term_counts WHERE fecha >= %s GROUP BY fecha", (desde,))
+    return {str(fecha): int(total) for fecha, total in cursor.fetchall()}
+
+
+def _inicio_revision(totales):
+    """Primer día a comprobar: DIAS_REVISADOS antes del último de la caché (None = todos)"""
+    try:
+        ultimo = date.fromisoformat(max(totales))
+    except ValueError:  # caché vacía o con fechas que no son días
+        return None
+    return (ultimo - timedelta(days=DIAS_REVISADOS)).isoformat()
+
+
+def _recuentos(cursor, fechas=None):
+    """Recuentos (escala, fecha, term, count) sumando fuentes; todos los días o solo `fechas`"""
+    consulta = "SELECT escala, fecha, term, SUM(count) FROM term_counts{where} GROUP BY escala, fecha, term"
+    if fechas is None:
+        cursor.execute(consulta.format(where=""))
+        filas = cursor.fetchall()
+    else:
+        filas = []
+        for i in range(0, len(fechas), DIAS_POR_CONSULTA):
+            lote = fechas[i:i + DIAS_POR_CONSULTA]
+            cursor.execute(consulta.format(where=f" WHERE fecha IN ({', '.join(['%s'] * len(lote))})"), lote)
+            filas.extend(cursor.fetchall())
+    datos = pd.DataFrame(filas, columns=COLUMNAS)
+    datos["fecha"] = datos["fecha"].map(str)
+    return datos
+
+
+def actualizar_cache(path=None, revisar_todo=False):
+    """Recuentos diarios por escala y término, al día con term_counts.
+
+    Solo se consultan los días que faltan en la caché o cuyo total ha cambiado,
+    mirando desde DIAS_REVISADOS antes del último día guardado (o todos, con
+    `revisar_todo`). Devuelve un DataFrame largo con columnas escala, fecha
+    (datetime), term y count.
+    """
+    path = path or ruta_cache()
+    cache = _leer_cache(path)
+    desde = None if revisar_todo else _inicio_revision(cache["totales"])
+    with base_datos.transaccion() as cursor:
+        indice_terminos.asegurar_tabla(cursor)
+        recientes = _totales_por_dia(cursor, desde)
+        # Los días anteriores a `desde` se dan por buenos tal como están en la caché
+        totales = {f: t for f, t in cache["totales"].items() if desde is not None and f < desde}
+        totales.update(recientes)
+        cambiados = [f for f, total in recientes.items() if cache["totales"].get(f) != total]
+        borrados = set(cache["totales"]) - set(totales)
+        if not cambiados and not borrados:
+            return _preparar(cache["datos"])
+
+        # Si casi todo ha cambiado (p. ej. tras reconstruir el índice), una sola consulta
+        completo = len(cambiados) > len(totales) // 2
+        nuevos = _recuentos(cursor, None if completo else cambiados)
+
+    if completo:
+        datos = nuevos
+    else:
+        viejos = cache["datos"]
+        descartar = set(cambiados) | borrados
+        viejos = viejos[~viejos["fecha"].isin(descartar)]
+        datos = pd.concat([viejos.astype({"term": object}), nuevos], ignore_index=True)
+    logging.info(f"📈 Tendencias: {len(cambiados)} días actualizados.")
+
+    datos = datos.astype({"escala": "int16", "count": "int32", "term": "category"})
+    cache = {"totales": totales, "datos": datos}
+    _guardar_cache(cache, path)
+    return _preparar(datos)
+
+
+def _preparar(datos):
+    """Copia con la fecha como datetime y sin días inválidos"""
+    datos = datos.assign(fecha=pd.to_datetime(datos["fecha"], errors="coerce"))
+    return datos.dropna(subset=["fecha"])
+
+
+def matriz_terminos(datos, escala=None, frecuencia="D"):
+    """SerieTerminos de una escala (o de todas) agregada por día ("D") o semana ("W").
+
+    Incluye los periodos sin titulares, para que las ventanas móviles cuenten
+    periodos reales y no solo los que tienen datos.
+    """
+    if escala is not None:
+        datos = datos[datos["escala"] == escala]
+    if datos.empty:
+        return SerieTerminos(pd.DatetimeIndex([]), pd.Index([]), sparse.csr_matrix((0, 0)))
+
+    periodos = datos["fecha"].dt.to_period(frecuencia)
+    fechas = pd.period_range(periodos.min(), periodos.max(), freq=frecuencia).to_timestamp()
+    ordinales = periodos.array.asi8
+    inicio = ordinales.min()
+    columnas, terminos = pd.factorize(datos["term"].astype(object), sort=True)
+    # coo -> csr suma los duplicados (fuentes, escalas o días de la misma semana)
+    matriz = sparse.coo_matrix(
+        (datos["count"].to_numpy(dtype=np.int64), (ordinales - inicio, columnas)),
+        shape=(len(fechas), len(terminos)),
+    ).tocsr()
+    return SerieTerminos(fechas, pd.Index(terminos), matriz)
+
+
+def ventana_movil(serie, periodos):
+    """Suma móvil de `periodos` filas (el periodo actual y los anteriores), sin densificar"""
+    n = serie.matriz.shape[0]
+    desfases = range(min(periodos, n))
+    banda = sparse.diags([np.ones(n - k) for k in desfases], [-k for k in desfases],
+                         shape=(n, n), format="csr")
+    return serie._replace(matriz=banda @ serie.matriz)
+
+
+def frecuencia_relativa(serie, por=1000):
+    """Recuentos divididos por el total de palabras de cada periodo (por mil por defecto)"""
+    totales = np.asarray(serie.matriz.sum(axis=1)).ravel().astype(float)
+    inversos = np.divide(por, totales, out=np.zeros_like(totales), where=totales > 0)
+    return serie._replace(matriz=sparse.diags(inversos) @ serie.matriz)
+
+
+def series(serie, terminos):
+    """DataFrame denso periodos × términos pedidos (para graficar unos pocos)"""
+    terminos = [t for t in terminos if t in serie.terminos]
+    columnas = serie.terminos.get_indexer(terminos)
+    return pd.DataFrame(serie.matriz[:, columnas].toarray(), index=serie.fechas, columns=terminos)
+
+
+def terminos_emergentes(serie, reciente=7, base=28, minimo=5, limite=20):
+    """Términos cuya frecuencia en los últimos `reciente` periodos supera su nivel habitual.
+
+    El nivel habitual es la frecuencia en los `base` periodos anteriores. La
+    puntuación es un z-score de Poisson: (observado - esperado) / sqrt(esperado),
+    con el esperado suavizado para que los términos nuevos no dividan por cero.
+    """
+    n = serie.matriz.shape[0]
+    if n <= reciente:
+        return pd.DataFrame(columns=["term", "reciente", "base", "crecimiento", "puntuacion"])
+    observado = np.asarray(serie.matriz[n - reciente:].sum(axis=0)).ravel().astype(float)
+    habitual = np.asarray(serie.matriz[max(0, n - reciente - base):n - reciente].sum(axis=0)).ravel().astype(float)
+
+    suavizado = 0.5
+    tasa_base = (habitual + suavizado) / (habitual.sum() + suavizado * len(habitual))
+    esperado = tasa_base * observado.sum()
+    puntuacion = (observado - esperado) / np.sqrt(esperado)
+    puntuacion[observado < minimo] = -np.inf
+
+    candidatos = np.flatnonzero(puntuacion > 0)
+    if len(candidatos) > limite:
+        candidatos = candidatos[np.argpartition(-puntuacion[candidatos], limite)[:limite]]
+    candidatos = candidatos[np.argsort(-puntuacion[candidatos], kind="stable")]
+    return pd.DataFrame({
+        "term": serie.terminos[candidatos],
+        "reciente": observado[candidatos].astype(int),
+        "base": habitual[candidatos].astype(int),
+        "crecimiento": (observado[candidatos] / esperado[candidatos]).round(2),
+        "puntuacion": puntuacion[candidatos].round(2),
+    })
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Términos emergentes por escala")
+    parser.add_argument("--escala", type=int, help="escala ideológica (por defecto, todas)")
+    parser.add_argument("--frecuencia", choices=sorted(FRECUENCIAS), default="D")
+    parser.add_argument("--reciente", type=int, default=7, help="periodos de la ventana reciente")
+    parser.add_argument("--base", type=int, default=28, help="periodos de la ventana de referencia")
+    parser.add_argument("--limite", type=int, default=15)
+    parser.add_argument("--revisar-todo", action="store_true",
+                        help="compara el total de todos los días con la caché (tras un backfill antiguo)")
+    args = parser.parse_args()
+
+    serie = matriz_terminos(actualizar_cache(revisar_todo=args.revisar_todo), args.escala, args.frecuencia)
+    emergentes = terminos_emergentes(serie, args.reciente, args.base, limite=args.limite)
+    titulo = f"escala {args.escala}" if args.escala else "todas las escalas"
+    print(f"\n📈 Términos emergentes ({titulo}, {FRECUENCIAS[args.frecuencia].lower()}):")
+    for fila in emergentes.itertuples():
+        print(f"   ▫ {fila.term.ljust(18)} → {fila.reciente} vs {fila.base} (x{fila.crecimiento})")
@@ -0,0 +1,161 @@
+"""Normalización y tokenización de titulares compartida por análisis, gráficos y dashboard.
+
+El texto se limpia en una sola pasada con una tabla de traducción de bytes que
+pasa a minúsculas y convierte signos y dígitos en espacios; antes, los pocos
+tramos no ASCII se pliegan (acentos fuera, apóstrofos unificados) con una tabla
+que se memoriza carácter a carácter. Cada palabra distinta se limpia una sola
+vez y su resultado se memoriza. Las stopwords se normalizan igual, así que
+siempre coinciden con los tokens que produce `tokenizar`.
+
+Benchmark: python bench_tokenizador.py
+"""
+import re
+import unicodedata
+from collections import Counter
+
+import metricas
+
+LONGITUD_MINIMA = 3  # "war", "gas" o "nato" son relevantes; los artículos caen por stopwords
+
+STOPWORDS_ES = frozenset({
+    "el", "la", "los", "las", "de", "del", "en", "y", "un", "una", "unos", "unas",
+    "con", "por", "para", "a", "al", "que", "es", "más", "su", "sus",
+    "como", "se", "ha", "han", "no", "lo", "o", "este", "esta", "estos", "estas", "sin",
+    "sobre", "entre", "tras", "hasta", "desde", "pero", "muy", "ya", "le", "les",
+    "fue", "son", "ser", "está", "están", "según", "cuando", "donde", "qué", "porque",
+})
+
+STOPWORDS_EN = frozenset({
+    "the", "and", "of", "in", "to", "a", "on", "for", "with", "at",
+    "from", "by", "an", "is", "as", "it", "that", "this", "was", "be",
+    "are", "but", "or", "have", "has", "had", "their", "its", "they",
+    "them", "his", "her", "he", "she", "we", "you", "i", "who", "what",
+    "which", "will", "can", "all", "not", "been", "were", "also", "more",
+    "after", "one", "new", "about", "would", "could", "just", "into",
+    "over", "than", "when", "out", "up", "no", "so", "if", "do", "did",
+    "may", "me", "us", "our", "because", "it's", "they're", "we're",
+    "that's", "don't", "isn't", "you're", "i'm", "he's", "she's",
+    "says", "said", "how", "why", "amid", "off", "there", "here", "now",
+})
+
+APOSTROFOS = "'‘’ʼ´`"
+# Letras que NFKD no descompone
+LIGADURAS = {"æ": "ae", "ø": "o", "œ": "oe", "ß": "ss", "ł": "l", "đ": "d", "ð": "d", "þ": "th"}
+
+
+def _plegar(caracter):
+    """Traducción de un carácter: letra ASCII sin acento, apóstrofo o espacio"""
+    if caracter in APOSTROFOS:
+        return "'"
+    if caracter.lower() in LIGADURAS:
+        return LIGADURAS[caracter.lower()]
+    plegado = unicodedata.normalize("NFKD", caracter).encode("ascii", "ignore").decode("ascii")
+    plegado = "".join(c for c in plegado.lower() if "a" <= c <= "z")
+    return plegado or " "
+
+
+class _TablaTraduccion(dict):
+    """Tabla para `str.translate` que calcula (y recuerda) los caracteres no vistos"""
+
+    def __missing__(self, codigo):
+        valor = _plegar(chr(codigo))
+        self[codigo] = valor
+        return valor
+
+
+# Caracteres no ASCII: precalculada para Latin-1, Latin Extended y la puntuación
+# tipográfica habitual; el resto se añade la primera vez que aparece.
+TABLA = _TablaTraduccion()
+for _codigo in [*range(0x80, 0x250), *range(0x2000, 0x2070)]:
+    TABLA[_codigo]
+del _codigo
+
+# Caracteres ASCII: letras a minúsculas, el apóstrofo se mantiene y el resto pasa a espacio
+TABLA_ASCII = bytes(
+    c + 32 if 65 <= c <= 90 else c if 97 <= c <= 122 or c == 39 else 32
+    for c in range(256)
+)
+
+RE_NO_ASCII = re.compile(r"[^\x00-\x7f]+")
+
+
+def _plegar_tramo(match):
+    return match.group().translate(TABLA)
+
+
+def limpiar_texto(texto):
+    """Texto en minúsculas, sin acentos, signos ni dígitos (palabras separadas por espacios)"""
+    if not texto.isascii():
+        texto = RE_NO_ASCII.sub(_plegar_tramo, texto)
+    return texto.encode("ascii").translate(TABLA_ASCII).decode("ascii")
+
+
+STOPWORDS = frozenset(
+    t.strip("'") for palabra in STOPWORDS_ES | STOPWORDS_EN for t in limpiar_texto(palabra).split()
+)
+
+
+def _normalizar_token(token):
+    """Quita apóstrofos sueltos y el posesivo inglés ("russia's" -> "russia")"""
+    token = token.strip("'")
+    if token.endswith("'s") and token not in STOPWORDS:
+        token = token[:-2]
+    return token
+
+
+def _relevante(token):
+    """Token normalizado si cuenta como palabra, o None si se descarta"""
+    if "'" in token:
+        token = _normalizar_token(token)
+    if len(token) >= LONGITUD_MINIMA and token not in STOPWORDS:
+        return token
+    return None
+
+
+# Palabra "cruda" (separada por espacios, ya en minúsculas) -> tokens relevantes.
+# El vocabulario de los titulares se repite muchísimo, así que limpiar cada palabra
+# distinta una sola vez es mucho más barato que limpiar todo el texto.
+MAX_CACHE = 500_000
+_cache_palabras = {}
+
+
+def _tokens_de(crudo):
+    try:
+        return _cache_palabras[crudo]
+    except KeyError:
+        tokens = tuple(t for t in map(_relevante, limpiar_texto(crudo).split()) if t)
+        if len(_cache_palabras) < MAX_CACHE:
+            _cache_palabras[crudo] = tokens
+        return tokens
+
+
+def tokenizar(texto):
+    """Lista de palabras relevantes de un titular"""
+    if not isinstance(texto, str):
+        return []
+    tokens = []
+    for crudo in texto.lower().split():
+        tokens.extend(_tokens_de(crudo))
+    return tokens
+
+
+@metricas.cronometrado("tokenizacion")
+def tokenizar_lote(textos):
+    """Tokeniza una lista o Series de titulares; devuelve una lista de listas"""
+    return [tokenizar(texto) for texto in textos]
+
+
+@metricas.cronometrado("tokenizacion")
+def contar_palabras(textos, contador=None):
+    """Cuenta las palabras de muchos titulares de una vez.
+
+    Los textos se unen, se parten y se cuentan en C; la limpieza y el filtrado
+    se hacen solo sobre las palabras distintas. Si se pasa `contador`, se
+    actualiza en el sitio (útil para procesar por lotes).
+    """
+    contador = Counter() if contador is None else contador
+    crudos = Counter("\n".join(t for t in textos if isinstance(t, str)).lower().split())
+    for crudo, veces in crudos.items():
+        for token in _tokens_de(crudo):
+            contador[token] += veces
+    return contador